@@ -1,3 +1,10 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import University
+
+
+@admin.register(University)
+class UniversityAdmin(admin.ModelAdmin):
+    list_display = ('name', 'country', 'alpha_two_code')
+    list_filter = ('country',)
+    search_fields = ('name', 'domain_set__domain')
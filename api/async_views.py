@@ -0,0 +1,243 @@
+"""
+Async API Views Module
+
+This module contains native async versions of the endpoints in views.py. They are
+routed instead of the sync views when the project is served under ASGI (see
+API_ASYNC_VIEWS in settings), so a single worker process can keep hundreds of
+upstream calls in flight instead of blocking one thread per request.
+
+Each view performs the same query validation, returns the same response shapes
+and maps upstream failures to the same 503 error bodies as its sync counterpart.
+DRF's @api_view does not support coroutines, so these are plain Django async
+views. Their bodies are rendered with DRF's JSONRenderer all the same, so both
+view sets return identical bytes (and the response cache identical ETags).
+"""
+
+import json
+
+import requests
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from .services.dog_api import dog_api_async, dog_buffer
+from .services.country_data import country_data_async
+from .services.cat_api import cat_image_async, cat_buffer
+from .services.advice_api import advice_api_async, advice_buffer
+from .services.joke_api import joke_api_async, joke_buffer
+from .services.age_prediction_api import age_prediction_api_async, age_prediction_bulk_async
+from .services.bored_api import find_activities_async
+from .services.country_universities_api import country_universities_api_async, universities_source_async
+from .services.quotes_api import quote_pool
+from .serializers import CountryQuerySerializer, AgeQuerySerializer, AgeBulkSerializer, UniversitiesPageQuerySerializer, BoredQuerySerializer, QuotesQuerySerializer, BatchRequestSerializer
+from .payloads import country_fields, country_detail_payload, cat_image_payload, joke_payload, advice_payload, age_prediction_payload, age_bulk_payload, universities_payload, university_row, university_rows, bored_payload, quotes_payload
+from . import batch
+from . import pagination
+from .response_cache import cache_response
+
+
+_renderer = JSONRenderer()
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    """
+    Returns data rendered exactly as a DRF Response with the default settings
+    would be (compact separators, unescaped unicode).
+    """
+    return HttpResponse(_renderer.render(data), content_type=_renderer.media_type, status=status)
+
+
+def validation_error(query):
+    """
+    Builds the 400 response DRF would return for an invalid query serializer.
+    """
+    return json_response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+def parse_json_body(request):
+    """
+    Decodes a JSON request body, or returns the 400 response DRF would send.
+    """
+    try:
+        return json.loads(request.body)
+    except ValueError as exc:
+        return json_response({'detail': f'JSON parse error - {exc}'}, status=status.HTTP_400_BAD_REQUEST)
+
+
+@require_GET
+async def random_dog(request):
+    try:
+        image_url = await dog_buffer.aget(dog_api_async)
+        return json_response({'image_url':image_url}, status=status.HTTP_200_OK)
+    except Exception:
+        return json_response({'error':'Failed to fetch Dog'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+@cache_response(ttl=3600, normalize=('name',), unordered=('fields',))
+@require_GET
+async def get_country_data(request):
+    query = CountryQuerySerializer(data=request.GET)
+    if not query.is_valid():
+        return validation_error(query)
+
+    country_name = query.validated_data['name']
+    fields = query.validated_data.get('fields', ())
+
+    try:
+        country_info = await country_data_async(country_name, country_fields(fields))
+        return json_response(country_detail_payload(country_info, fields), status=status.HTTP_200_OK)
+    except Exception:
+        return json_response({'error':'Failed to fetch data'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+@require_GET
+async def get_cat_image(request):
+    try:
+        image_data = cat_image_payload(await cat_buffer.aget(cat_image_async))
+        return json_response(image_data, status=status.HTTP_200_OK)
+    except requests.exceptions.RequestException:
+        return json_response({'errror':'Error fetching url'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+@require_GET
+async def get_random_joke(request):
+    try:
+        joke_data = joke_payload(await joke_buffer.aget(joke_api_async))
+        return json_response(joke_data, status=status.HTTP_200_OK)
+    except requests.exceptions.RequestException:
+        return json_response({'error':'Error fetching joke'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+@require_GET
+async def get_random_advice(request):
+    try:
+        advice_data = advice_payload(await advice_buffer.aget(advice_api_async))
+        return json_response(advice_data, status=status.HTTP_200_OK)
+    except requests.exceptions.RequestException:
+        return json_response({'error':'Failed to fetch advice'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+@require_GET
+async def get_age_prediction(request):
+    query = AgeQuerySerializer(data=request.GET)
+    if not query.is_valid():
+        return validation_error(query)
+    name = query.validated_data['name']
+
+    try:
+        age_prediction_data = age_prediction_payload(await age_prediction_api_async(name))
+        return json_response(age_prediction_data, status=status.HTTP_200_OK)
+    except requests.exceptions.RequestException:
+        return json_response({'error':'Fetching age data failed.'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+@csrf_exempt
+@require_POST
+async def get_bulk_age_prediction(request):
+    body = parse_json_body(request)
+    if isinstance(body, HttpResponse):
+        return body
+
+    payload = AgeBulkSerializer(data=body)
+    if not payload.is_valid():
+        return validation_error(payload)
+
+    try:
+        predictions = await age_prediction_bulk_async(payload.validated_data['names'])
+        data = age_bulk_payload(predictions)
+        return json_response(data, status=status.HTTP_200_OK)
+    except requests.exceptions.RequestException:
+        return json_response({'error':'Fetching age data failed.'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+@cache_response(ttl=3600, normalize=('country',))
+@require_GET
+async def get_country_universities(request):
+    query = UniversitiesPageQuerySerializer(data=request.GET)
+    if not query.is_valid():
+        return validation_error(query)
+    options = query.validated_data
+    country = options['country']
+
+    try:
+        if options.get('stream'):
+            source = await universities_source_async(country)
+            return pagination.streaming_response(source, options, university_row, country, asynchronous=True)
+        if pagination.is_paginated(options):
+            source = await universities_source_async(country)
+            data = await pagination.apaginated_payload(source, options, university_rows, country)
+        else:
+            data = universities_payload(await country_universities_api_async(country=country))
+
+        return json_response(data, status=status.HTTP_200_OK)
+    except requests.exceptions.RequestException:
+        return json_response({'error':'Failed to fetch data'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+@cache_response(ttl=3600, normalize=('country',))
+@require_GET
+async def get_pro_country_universities(request):
+    query = UniversitiesPageQuerySerializer(data=request.GET)
+    if not query.is_valid():
+        return validation_error(query)
+    options = query.validated_data
+    country = options['country']
+
+    try:
+        if options.get('stream'):
+            source = await universities_source_async(country)
+            return pagination.streaming_response(source, options, university_row, country, asynchronous=True)
+        if pagination.is_paginated(options):
+            source = await universities_source_async(country)
+            data = await pagination.apaginated_payload(source, options, university_rows, country)
+        else:
+            data = universities_payload(await country_universities_api_async(country=country))
+
+        return json_response(data, status=status.HTTP_200_OK)
+    except requests.exceptions.RequestException:
+        return json_response({'error':'Failed to fetch data'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+@require_GET
+async def get_boredom_advice(request):
+    query = BoredQuerySerializer(data=request.GET)
+    if not query.is_valid():
+        return validation_error(query)
+
+    try:
+        boredom_advice = await find_activities_async(**query.validated_data)
+        return json_response(bored_payload(boredom_advice), status=status.HTTP_200_OK)
+    except requests.exceptions.RequestException:
+        return json_response({'error':'Failed to fetch advice'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+@require_GET
+async def get_quotes(request):
+    query = QuotesQuerySerializer(data=request.GET)
+    if not query.is_valid():
+        return validation_error(query)
+
+    try:
+        quotes = await quote_pool.aget(query.validated_data['count'])
+        return json_response(quotes_payload(quotes), status=status.HTTP_200_OK)
+    except requests.exceptions.RequestException:
+        return json_response({'error':'Service failure'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+@csrf_exempt
+@require_POST
+async def batch_requests(request):
+    body = parse_json_body(request)
+    if isinstance(body, HttpResponse):
+        return body
+
+    payload = BatchRequestSerializer(data=body)
+    if not payload.is_valid():
+        return validation_error(payload)
+
+    results = await batch.arun_batch(
+        payload.validated_data['requests'],
+        timeout=payload.validated_data.get('timeout'),
+    )
+    return json_response({'results': results}, status=status.HTTP_200_OK)
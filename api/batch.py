@@ -0,0 +1,272 @@
+"""
+Batch Module
+
+This module runs several endpoint lookups in one request for /api/batch/. Each
+sub-request names an endpoint and its query parameters; all sub-requests run
+concurrently under one global deadline, so the caller pays the slowest upstream
+latency instead of the sum of all of them. The batch deadline also becomes the
+request deadline of its sub-requests (see api/services/deadline.py), so their
+upstream calls stop waiting when the batch gives up on them.
+
+Every sub-request is validated with the same query serializer and shaped with
+the same payload helper as the single endpoint, so each item has the same body
+and status code the single endpoint would return. A failing upstream only fails
+its own item.
+
+The batch endpoint is configured through the API_BATCH setting:
+    - MAX_ITEMS (int): Maximum sub-requests per batch (default 20)
+    - MAX_WORKERS (int): Threads used by the sync path (default 16)
+    - TIMEOUT (float): Default global deadline in seconds (default 5)
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from rest_framework import status
+from .services import deadline as request_deadline
+from .services.dog_api import dog_api_async, dog_buffer
+from .services.country_data import country_data, country_data_async
+from .services.cat_api import cat_image_async, cat_buffer
+from .services.advice_api import advice_api_async, advice_buffer
+from .services.joke_api import joke_api_async, joke_buffer
+from .services.age_prediction_api import age_prediction_api, age_prediction_api_async
+from .services.bored_api import find_activities, find_activities_async
+from .services.country_universities_api import country_universities_api, country_universities_api_async
+from .services.quotes_api import quote_pool
+from .serializers import CountryQuerySerializer, AgeQuerySerializer, CountryUniversitiesQuerySerializer, BoredQuerySerializer, QuotesQuerySerializer
+from .payloads import country_fields, country_detail_payload, cat_image_payload, joke_payload, advice_payload, age_prediction_payload, universities_payload, bored_payload, quotes_payload
+
+DEFAULTS = {
+    'MAX_ITEMS': 20,
+    'MAX_WORKERS': 16,
+    'TIMEOUT': 5,
+}
+
+def _country(query):
+    # Pairs the records with the requested extras for country_detail_payload.
+    fields = query.get('fields', ())
+    return country_data(query['name'], country_fields(fields)), fields
+
+
+async def _acountry(query):
+    fields = query.get('fields', ())
+    return await country_data_async(query['name'], country_fields(fields)), fields
+
+
+# query: query serializer class (or None), fetch/afetch: sync/async service call
+# taking the validated query, shape: payload builder, error: 503 body.
+Endpoint = namedtuple('Endpoint', ['query', 'fetch', 'afetch', 'shape', 'error'])
+
+ENDPOINTS = {
+    'dog': Endpoint(
+        None, lambda q: dog_buffer.get(), lambda q: dog_buffer.aget(dog_api_async),
+        lambda image_url: {'image_url':image_url},
+        {'error':'Failed to fetch Dog'},
+    ),
+    'cat': Endpoint(
+        None, lambda q: cat_buffer.get(), lambda q: cat_buffer.aget(cat_image_async),
+        cat_image_payload,
+        {'errror':'Error fetching url'},
+    ),
+    'joke': Endpoint(
+        None, lambda q: joke_buffer.get(), lambda q: joke_buffer.aget(joke_api_async),
+        joke_payload,
+        {'error':'Error fetching joke'},
+    ),
+    'advice': Endpoint(
+        None, lambda q: advice_buffer.get(), lambda q: advice_buffer.aget(advice_api_async),
+        advice_payload,
+        {'error':'Failed to fetch advice'},
+    ),
+    'age': Endpoint(
+        AgeQuerySerializer,
+        lambda q: age_prediction_api(q['name']),
+        lambda q: age_prediction_api_async(q['name']),
+        age_prediction_payload,
+        {'error':'Fetching age data failed.'},
+    ),
+    'country': Endpoint(
+        CountryQuerySerializer,
+        _country,
+        _acountry,
+        lambda fetched: country_detail_payload(*fetched),
+        {'error':'Failed to fetch data'},
+    ),
+    'universities': Endpoint(
+        CountryUniversitiesQuerySerializer,
+        lambda q: country_universities_api(country=q['country']),
+        lambda q: country_universities_api_async(country=q['country']),
+        universities_payload,
+        {'error':'Failed to fetch data'},
+    ),
+    'universities/pro': Endpoint(
+        CountryUniversitiesQuerySerializer,
+        lambda q: country_universities_api(country=q['country']),
+        lambda q: country_universities_api_async(country=q['country']),
+        universities_payload,
+        {'error':'Failed to fetch data'},
+    ),
+    'bored': Endpoint(
+        BoredQuerySerializer,
+        lambda q: find_activities(**q),
+        lambda q: find_activities_async(**q),
+        bored_payload,
+        {'error':'Failed to fetch advice'},
+    ),
+    'quotes': Endpoint(
+        QuotesQuerySerializer,
+        lambda q: quote_pool.get(q['count']),
+        lambda q: quote_pool.aget(q['count']),
+        quotes_payload,
+        {'error':'Service failure'},
+    ),
+}
+
+DEADLINE_ERROR = {'error':'Deadline exceeded'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_config():
+    """
+    Returns DEFAULTS updated with the values from settings.API_BATCH.
+    """
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'API_BATCH', {}))
+    return config
+
+
+def get_executor():
+    """
+    Returns the thread pool shared by all sync batch requests of this worker.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=get_config()['MAX_WORKERS'],
+                    thread_name_prefix='api-batch',
+                )
+    return _executor
+
+
+def result(endpoint, status_code, data):
+    return {'endpoint': endpoint, 'status': status_code, 'data': data}
+
+
+def validate_item(item):
+    """
+    Validates one sub-request's params with its endpoint's query serializer.
+
+    Returns:
+        tuple: (validated query dict, None) or (None, 400 result item).
+    """
+    endpoint = ENDPOINTS[item['endpoint']]
+    if endpoint.query is None:
+        return {}, None
+    query = endpoint.query(data=item['params'])
+    if not query.is_valid():
+        return None, result(item['endpoint'], status.HTTP_400_BAD_REQUEST, query.errors)
+    return query.validated_data, None
+
+
+def run_item(name, query):
+    endpoint = ENDPOINTS[name]
+    try:
+        return result(name, status.HTTP_200_OK, endpoint.shape(endpoint.fetch(query)))
+    except Exception:
+        return result(name, status.HTTP_503_SERVICE_UNAVAILABLE, endpoint.error)
+
+
+async def arun_item(name, query):
+    endpoint = ENDPOINTS[name]
+    try:
+        return result(name, status.HTTP_200_OK, endpoint.shape(await endpoint.afetch(query)))
+    except Exception:
+        return result(name, status.HTTP_503_SERVICE_UNAVAILABLE, endpoint.error)
+
+
+def _item_budget(timeout):
+    # The batch deadline, or the request's own if that comes first.
+    left = request_deadline.remaining()
+    return timeout if left is None else min(timeout, left)
+
+
+def run_batch(items, timeout=None):
+    """
+    Runs sub-requests concurrently on the batch thread pool.
+
+    Args:
+        items (list): Validated sub-requests, each {'endpoint': str, 'params': dict}.
+        timeout (float, optional): Global deadline in seconds for the whole batch.
+
+    Returns:
+        list: One {'endpoint', 'status', 'data'} item per sub-request, in request
+              order. Items still running at the deadline get status 504.
+    """
+    if timeout is None:
+        timeout = get_config()['TIMEOUT']
+    deadline = time.monotonic() + timeout
+
+    results = [None] * len(items)
+    futures = {}
+    token = request_deadline.start(_item_budget(timeout))
+    try:
+        for index, item in enumerate(items):
+            query, error = validate_item(item)
+            if error is not None:
+                results[index] = error
+            else:
+                # Each item runs in a copy of the request context (deadline, timings).
+                context = contextvars.copy_context()
+                futures[get_executor().submit(context.run, run_item, item['endpoint'], query)] = index
+    finally:
+        request_deadline.stop(token)
+
+    done, not_done = wait(futures, timeout=max(0, deadline - time.monotonic()))
+    for future in done:
+        results[futures[future]] = future.result()
+    for future in not_done:
+        future.cancel()
+        index = futures[future]
+        results[index] = result(items[index]['endpoint'], status.HTTP_504_GATEWAY_TIMEOUT, DEADLINE_ERROR)
+    return results
+
+
+async def arun_batch(items, timeout=None):
+    """
+    Async counterpart of run_batch() using the *_async services.
+    """
+    if timeout is None:
+        timeout = get_config()['TIMEOUT']
+
+    results = [None] * len(items)
+    tasks = {}
+    token = request_deadline.start(_item_budget(timeout))
+    try:
+        for index, item in enumerate(items):
+            query, error = validate_item(item)
+            if error is not None:
+                results[index] = error
+            else:
+                # Tasks copy the current context, including the deadline.
+                tasks[asyncio.ensure_future(arun_item(item['endpoint'], query))] = index
+    finally:
+        request_deadline.stop(token)
+
+    if tasks:
+        done, not_done = await asyncio.wait(tasks, timeout=timeout)
+        for task in done:
+            results[tasks[task]] = task.result()
+        for task in not_done:
+            task.cancel()
+            index = tasks[task]
+            results[index] = result(items[index]['endpoint'], status.HTTP_504_GATEWAY_TIMEOUT, DEADLINE_ERROR)
+    return results
@@ -0,0 +1,132 @@
+"""
+Benchmark Serializers Command
+
+Compares the DRF serializers with the precompiled projections of
+api/payloads.py on synthetic upstream records, and checks that both produce
+identical JSON.
+
+Usage:
+    python manage.py benchmark_serializers
+    python manage.py benchmark_serializers --rows 10 1000 10000 --runs 20 --json
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.payloads import country_detail_payload, universities_payload, bored_payload, quotes_payload
+from api.serializers import CountryDetailSerializer, CountryUniversitiesSerializer, BoredSerialier, QuotesSerializer
+
+from .benchmark_universities import measure
+
+
+def university_records(rows):
+    return [
+        {
+            'name': f'University {i}',
+            'country': 'United States',
+            'alpha_two_code': 'US',
+            'domains': [f'u{i}.edu'],
+            'web_pages': [f'http://www.u{i}.edu/'],
+            'state-province': None,
+        }
+        for i in range(rows)
+    ]
+
+
+def bored_records(rows):
+    return [
+        {'activity': f'Activity {i}', 'type': 'recreational', 'participants': i % 4 + 1,
+         'price': 0.1, 'key': str(1000000 + i)}
+        for i in range(rows)
+    ]
+
+
+def quote_records(rows):
+    return [{'q': f'Quote number {i}.', 'a': f'Author {i}', 'h': f'<blockquote>{i}</blockquote>'} for i in range(rows)]
+
+
+def country_records(rows):
+    return [
+        [{'name': {'common': f'Country {i}', 'official': f'Republic of {i}'}, 'capital': [f'City {i}'],
+          'population': 1000 * i, 'flag': '🏳', 'region': 'Africa'}]
+        for i in range(rows)
+    ]
+
+
+def serializer_country_detail(country_info):
+    data = {
+        'name': country_info[0]['name']['common'],
+        'capital': country_info[0]['capital'][0],
+        'population': country_info[0]['population'],
+        'flag': country_info[0]['flag'],
+        'region': country_info[0]['region'],
+    }
+    serializer = CountryDetailSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    return serializer.data
+
+
+# name: (build records, serializer path, projection path). Country details are
+# one record per response, so that case shapes `rows` separate responses.
+CASES = {
+    'universities': (
+        university_records,
+        lambda records: CountryUniversitiesSerializer(instance=records).data,
+        universities_payload,
+    ),
+    'bored': (
+        bored_records,
+        lambda records: BoredSerialier(instance=records, many=True).data,
+        bored_payload,
+    ),
+    'quotes': (
+        quote_records,
+        lambda records: QuotesSerializer(instance=records, many=True).data,
+        quotes_payload,
+    ),
+    'country': (
+        country_records,
+        lambda records: [serializer_country_detail(record) for record in records],
+        lambda records: [country_detail_payload(record) for record in records],
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark DRF serializers against the precompiled payload projections.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10, 1000, 10000], help='Row counts to test (default 10 1000 10000).')
+        parser.add_argument('--runs', type=int, default=20, help='Timed runs per case (default 20).')
+        parser.add_argument('--case', choices=sorted(CASES), action='append', help='Only run these cases (repeatable).')
+        parser.add_argument('--json', action='store_true', help='Print machine-readable JSON.')
+
+    def handle(self, *args, **options):
+        report = []
+        for name in options['case'] or CASES:
+            build, serializer, projection = CASES[name]
+            for rows in options['rows']:
+                records = build(rows)
+                if json.dumps(serializer(records)) != json.dumps(projection(records)):
+                    raise CommandError(f'{name}: projection output differs from the serializer at {rows} rows')
+
+                _, slow = measure(lambda: serializer(records), options['runs'])
+                _, fast = measure(lambda: projection(records), options['runs'])
+                report.append({
+                    'case': name,
+                    'rows': rows,
+                    'serializer': slow,
+                    'projection': fast,
+                    'speedup_p50': round(slow['p50_ms'] / max(fast['p50_ms'], 1e-6), 1),
+                })
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        for entry in report:
+            self.stdout.write(
+                f"{entry['case']:>12} {entry['rows']:>6} rows: serializer p50 {entry['serializer']['p50_ms']} ms, "
+                f"projection p50 {entry['projection']['p50_ms']} ms ({entry['speedup_p50']}x)"
+            )
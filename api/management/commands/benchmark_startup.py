@@ -0,0 +1,165 @@
+"""
+Benchmark Startup Command
+
+Compares worker boot time and per-request overhead of settings profiles,
+by default the full weather_api.settings against the API-only
+weather_api.settings_api. Each run starts a fresh interpreter that:
+    1. Imports Django and builds the WSGI handler (settings, apps, middleware)
+    2. Serves one request through it, which imports the URLconf, views and
+       services on first use
+    3. Serves --requests more requests in-process, timing each one
+
+Nothing listens on a socket and no upstream is called: the timed endpoints
+(/api/stats/ through DRF and /metrics as a plain Django view) only read
+in-process state, so differences between profiles are import, middleware
+and DRF overhead. Each child gets a one-off API_ADMIN_TOKEN and sends it, so
+/api/stats/ and /metrics answer 200 under both profiles.
+
+Usage:
+    python manage.py benchmark_startup --runs 10
+    python manage.py benchmark_startup --settings-module weather_api.settings weather_api.settings_api --json
+"""
+
+import json
+import os
+import secrets
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from .benchmark_universities import summarize
+
+PATHS = ('/api/stats/', '/metrics')
+
+# Runs in the child interpreter: argv is the request count, then the paths.
+CHILD = '''
+import io
+import json
+import os
+import sys
+import time
+
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+
+application = get_wsgi_application()
+booted = time.perf_counter()
+
+
+def call(path):
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '',
+        'SERVER_NAME': '127.0.0.1', 'SERVER_PORT': '80', 'HTTP_HOST': '127.0.0.1',
+        'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr, 'wsgi.multithread': True, 'wsgi.multiprocess': True,
+        'wsgi.run_once': False, 'wsgi.version': (1, 0),
+        'HTTP_X_ADMIN_TOKEN': os.environ['API_ADMIN_TOKEN'],
+    }
+    statuses = []
+    response = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    b''.join(response)
+    response.close()
+    return statuses[0]
+
+
+requests, paths = int(sys.argv[1]), sys.argv[2:]
+status = call(paths[0])
+first = time.perf_counter()
+samples = {}
+for path in paths:
+    samples[path] = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        call(path)
+        samples[path].append((time.perf_counter() - start) * 1000)
+
+print(json.dumps({
+    'boot_ms': (booted - started) * 1000,
+    'first_request_ms': (first - booted) * 1000,
+    'first_status': status,
+    'modules': len(sys.modules),
+    'requests': samples,
+}))
+'''
+
+
+def run_child(module, requests):
+    """
+    Runs one fresh interpreter with the given settings module.
+
+    Returns:
+        dict: The child's measurements plus 'process_ms', the wall time of the
+            whole process including interpreter startup.
+    """
+    env = dict(
+        os.environ,
+        DJANGO_SETTINGS_MODULE=module,
+        API_TIMING_LOG_LEVEL='WARNING',
+        API_ADMIN_TOKEN=secrets.token_hex(16),
+        PYTHONDONTWRITEBYTECODE='1',
+    )
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-c', CHILD, str(requests), *PATHS],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    elapsed = (time.perf_counter() - start) * 1000
+    if completed.returncode != 0:
+        raise CommandError(f'{module} failed:\n{completed.stderr.strip()}')
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result['process_ms'] = elapsed
+    return result
+
+
+def profile(module, runs, requests):
+    """
+    Runs the child `runs` times and summarizes every measurement.
+    """
+    results = [run_child(module, requests) for _ in range(runs)]
+    report = {
+        'modules': results[-1]['modules'],
+        'first_status': results[-1]['first_status'],
+    }
+    for key in ('process_ms', 'boot_ms', 'first_request_ms'):
+        report[key[:-3]] = summarize([result[key] for result in results])
+    report['cold_start'] = summarize([result['boot_ms'] + result['first_request_ms'] for result in results])
+    report['requests'] = {
+        path: summarize([sample for result in results for sample in result['requests'][path]])
+        for path in PATHS
+    }
+    return report
+
+
+class Command(BaseCommand):
+    help = 'Compare worker boot time and per-request overhead of settings profiles.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--settings-module', nargs='+', default=['weather_api.settings', 'weather_api.settings_api'],
+                            help='Settings modules to compare (default weather_api.settings weather_api.settings_api).')
+        parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per profile (default 5).')
+        parser.add_argument('--requests', type=int, default=500, help='Timed requests per path and run (default 500).')
+        parser.add_argument('--json', action='store_true', help='Print machine-readable JSON.')
+
+    def handle(self, *args, **options):
+        report = {
+            'python': sys.version.split()[0],
+            'runs': options['runs'],
+            'profiles': {
+                module: profile(module, options['runs'], options['requests'])
+                for module in options['settings_module']
+            },
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        for module, stats in report['profiles'].items():
+            self.stdout.write(f"{module} ({stats['modules']} modules loaded)")
+            for key in ('process', 'boot', 'first_request', 'cold_start'):
+                self.stdout.write(f"  {key:>14}: p50 {stats[key]['p50_ms']} ms, mean {stats[key]['mean_ms']} ms")
+            for path, timing in stats['requests'].items():
+                self.stdout.write(f"  {path:>14}: p50 {timing['p50_ms']} ms, p95 {timing['p95_ms']} ms per request")
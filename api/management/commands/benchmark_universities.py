@@ -0,0 +1,85 @@
+"""
+Benchmark Universities Command
+
+Compares answering a universities lookup from the local database against
+fetching it from the Hipolabs upstream. Both paths bypass the in-process cache.
+
+Usage:
+    python manage.py benchmark_universities --country "United States" --runs 20
+    python manage.py benchmark_universities --country Japan --skip-live --json
+"""
+
+import json
+import statistics
+import time
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from api.services.country_universities_api import local_queryset, fetch_live
+
+
+def summarize(samples):
+    """
+    Summarizes timing samples in milliseconds.
+    """
+    ordered = sorted(samples)
+    return {
+        'runs': len(ordered),
+        'min_ms': round(ordered[0], 3),
+        'p50_ms': round(statistics.median(ordered), 3),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        'mean_ms': round(statistics.fmean(ordered), 3),
+    }
+
+
+def measure(fn, runs):
+    samples = []
+    size = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        size = len(fn())
+        samples.append((time.perf_counter() - start) * 1000)
+    return size, summarize(samples)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark local university queries against the live Hipolabs upstream.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--country', default='United States', help='Country to look up (default "United States").')
+        parser.add_argument('--runs', type=int, default=20, help='Timed runs per path (default 20).')
+        parser.add_argument('--skip-live', action='store_true', help='Only time the local query.')
+        parser.add_argument('--json', action='store_true', help='Print machine-readable JSON.')
+
+    def handle(self, *args, **options):
+        country = options['country']
+        runs = options['runs']
+        report = {'country': country}
+
+        rows, report['local'] = measure(lambda: list(local_queryset(country)), runs)
+        report['local']['rows'] = rows
+        if not rows:
+            raise CommandError(f'No local universities for {country!r}; run sync_universities first.')
+
+        if not options['skip_live']:
+            try:
+                rows, report['live'] = measure(lambda: fetch_live(country), runs)
+            except requests.exceptions.RequestException as exc:
+                raise CommandError(f'Live upstream failed: {exc}') from exc
+            report['live']['rows'] = rows
+            report['speedup_p50'] = round(report['live']['p50_ms'] / max(report['local']['p50_ms'], 1e-6), 1)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        for path in ('local', 'live'):
+            if path in report:
+                stats = report[path]
+                self.stdout.write(
+                    f"{path:>5}: {stats['rows']} rows, p50 {stats['p50_ms']} ms, "
+                    f"p95 {stats['p95_ms']} ms, mean {stats['mean_ms']} ms over {stats['runs']} runs"
+                )
+        if 'speedup_p50' in report:
+            self.stdout.write(self.style.SUCCESS(f"Local is {report['speedup_p50']}x faster at p50"))
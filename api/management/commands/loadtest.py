@@ -0,0 +1,281 @@
+"""
+Load Test Command
+
+Measures throughput and latency of the API endpoints without network access.
+The command starts the stub upstreams (see api/stub_upstreams.py), launches
+the project under WSGI (gunicorn, or runserver when gunicorn is not installed)
+or ASGI (uvicorn) with every upstream call routed to the stubs, then drives each endpoint with a fixed number of
+concurrent keep-alive clients for a fixed time and reports requests/second and
+p50/p95/p99 latency as JSON.
+
+Run it before and after a change, or once per server mode, and diff the
+reports:
+    python manage.py loadtest --server wsgi --output before.json
+    python manage.py loadtest --server asgi --concurrency 1 10 100 --output asgi.json
+    python manage.py loadtest --endpoint universities --universities 5000 --error-rate 0.05
+
+--server external drives an already running server (--base-url); start it
+with API_UPSTREAM_BASE_URL pointing at `python manage.py stub_upstreams`.
+
+A launched server keeps its shared cache, rate-limit buckets and metrics
+snapshots in a temporary directory, so stub data never reaches the files the
+real workers on the node share. It also skips the local University table and
+activity snapshot, so /api/universities/ and /api/bored/ go to the stubs and
+the --universities and --activities sizes apply.
+"""
+
+import http.client
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from .stub_upstreams import add_stub_arguments, build_stubs
+
+# Request paths per endpoint; workers cycle through them.
+ENDPOINTS = {
+    'dog': ['/api/dog/'],
+    'cat': ['/api/cat/'],
+    'joke': ['/api/joke/'],
+    'advice': ['/api/advice/'],
+    'quotes': ['/api/quotes/', '/api/quotes/?count=5'],
+    'age': ['/api/age/?name=Amina', '/api/age/?name=Michael', '/api/age/?name=Chen'],
+    'country': ['/api/country/?name=Nigeria', '/api/country/?name=France', '/api/country/?name=Japan'],
+    'universities': ['/api/universities/?country=Nigeria', '/api/universities/?country=Japan'],
+    'universities/pro': ['/api/universities/pro/?country=Nigeria', '/api/universities/pro/?country=Japan'],
+    'bored': ['/api/bored/?type=education', '/api/bored/?type=music'],
+}
+
+# Plain Django view, cheap to poll. It needs a token, so a 403 counts as ready
+# too: the request got through Django either way.
+READY_PATH = '/metrics'
+READY_STATUSES = (200, 403)
+
+
+def percentile(ordered, q):
+    """
+    Returns the q-th percentile (0-100) of an ascending list, nearest-rank.
+    """
+    if not ordered:
+        return None
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+class Worker(threading.Thread):
+    """
+    Closed-loop client: sends the next request as soon as the previous one
+    completed, over one keep-alive connection.
+    """
+
+    def __init__(self, base_url, paths, offset, start_at, stop_at):
+        super().__init__(daemon=True)
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.paths = paths
+        self.offset = offset
+        self.start_at = start_at
+        self.stop_at = stop_at
+        self.latencies = []
+        self.statuses = Counter()
+        self.errors = 0
+
+    def run(self):
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        i = self.offset
+        while True:
+            sent = time.perf_counter()
+            if sent >= self.stop_at:
+                break
+            path = self.paths[i % len(self.paths)]
+            i += 1
+            try:
+                connection.request('GET', path)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+                status = None
+            done = time.perf_counter()
+            if sent < self.start_at:
+                continue
+            if status is None:
+                self.errors += 1
+            else:
+                self.statuses[status] += 1
+            self.latencies.append((done - sent) * 1000)
+        connection.close()
+
+
+def drive(base_url, paths, concurrency, warmup, duration):
+    """
+    Runs one endpoint at one concurrency level and summarizes the results.
+    """
+    start_at = time.perf_counter() + warmup
+    stop_at = start_at + duration
+    workers = [Worker(base_url, paths, offset, start_at, stop_at) for offset in range(concurrency)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    latencies = sorted(latency for worker in workers for latency in worker.latencies)
+    statuses = Counter()
+    for worker in workers:
+        statuses.update(worker.statuses)
+    completed = sum(statuses.values())
+    return {
+        'concurrency': concurrency,
+        'requests': completed,
+        'connection_errors': sum(worker.errors for worker in workers),
+        'statuses': {str(code): count for code, count in sorted(statuses.items())},
+        'throughput_rps': round(completed / duration, 1),
+        'mean_ms': round(sum(latencies) / len(latencies), 3) if latencies else None,
+        'p50_ms': round(percentile(latencies, 50), 3) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95), 3) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99), 3) if latencies else None,
+    }
+
+
+def wait_ready(base_url, process, timeout):
+    parts = urlsplit(base_url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise CommandError(f'Server exited with status {process.returncode} before becoming ready.')
+        try:
+            connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=2)
+            connection.request('GET', READY_PATH)
+            if connection.getresponse().status in READY_STATUSES:
+                return
+        except (OSError, http.client.HTTPException):
+            pass
+        time.sleep(0.2)
+    raise CommandError(f'Server at {base_url} did not become ready within {timeout}s.')
+
+
+class Command(BaseCommand):
+    help = 'Load-test the API endpoints against local stub upstreams and report throughput and latency percentiles.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', choices=['wsgi', 'asgi', 'external'], default='wsgi',
+                            help='wsgi (gunicorn, or runserver without it), asgi (uvicorn) or an already running server (default wsgi).')
+        parser.add_argument('--workers', type=int, default=1, help='Worker processes of gunicorn or uvicorn (default 1).')
+        parser.add_argument('--threads', type=int, default=8, help='Threads per gunicorn worker (default 8).')
+        parser.add_argument('--base-url', default=None, help='URL of the server for --server external.')
+        parser.add_argument('--port', type=int, default=8099, help='Port for the launched server (default 8099).')
+        parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), action='append', help='Endpoints to drive (repeatable; default all).')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50], help='Concurrent clients (default 1 10 50).')
+        parser.add_argument('--duration', type=float, default=10, help='Measured seconds per level (default 10).')
+        parser.add_argument('--warmup', type=float, default=2, help='Unmeasured seconds before each level (default 2).')
+        parser.add_argument('--ready-timeout', type=float, default=30, help='Seconds to wait for the server (default 30).')
+        parser.add_argument('--label', default='', help='Free-form label stored in the report.')
+        parser.add_argument('--output', default=None, help='Write the JSON report to this file instead of stdout.')
+        add_stub_arguments(parser)
+
+    def launch(self, options, upstream_base_url, state_dir):
+        env = dict(
+            os.environ,
+            API_UPSTREAM_BASE_URL=upstream_base_url,
+            API_SHARED_CACHE_PATH=os.path.join(state_dir, 'shared_cache.sqlite3'),
+            API_RATE_LIMIT_PATH=os.path.join(state_dir, 'rate_limits.sqlite3'),
+            API_METRICS_DIR=os.path.join(state_dir, 'metrics'),
+            API_WARMUP_ON_START='0',
+            API_UNIVERSITIES_LOCAL='0',
+            API_ACTIVITY_DATASET='',
+        )
+        port = str(options['port'])
+        if options['server'] == 'wsgi':
+            env['API_ASYNC_VIEWS'] = '0'
+            if importlib.util.find_spec('gunicorn') is not None:
+                self.program = 'gunicorn'
+                command = [sys.executable, '-m', 'gunicorn', 'weather_api.wsgi:application',
+                           '--bind', f'127.0.0.1:{port}', '--workers', str(options['workers']),
+                           '--threads', str(options['threads'])]
+            else:
+                self.stderr.write('gunicorn is not installed; measuring runserver instead')
+                self.program = 'runserver'
+                command = [sys.executable, 'manage.py', 'runserver', '--noreload', f'127.0.0.1:{port}']
+        else:
+            if importlib.util.find_spec('uvicorn') is None:
+                raise CommandError('--server asgi needs uvicorn: pip install uvicorn')
+            env['API_ASYNC_VIEWS'] = '1'
+            self.program = 'uvicorn'
+            command = [sys.executable, '-m', 'uvicorn', 'weather_api.asgi:application',
+                       '--host', '127.0.0.1', '--port', port, '--workers', str(options['workers']),
+                       '--no-access-log']
+        return subprocess.Popen(
+            command, cwd=settings.BASE_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+
+    def handle(self, *args, **options):
+        if options['server'] == 'external' and not options['base_url']:
+            raise CommandError('--server external requires --base-url.')
+
+        stubs = None
+        process = None
+        state_dir = None
+        self.program = None
+        try:
+            if options['server'] == 'external':
+                base_url = options['base_url'].rstrip('/')
+            else:
+                stubs = build_stubs(options).start()
+                state_dir = tempfile.mkdtemp(prefix='loadtest-')
+                process = self.launch(options, stubs.base_url, state_dir)
+                base_url = f"http://127.0.0.1:{options['port']}"
+            wait_ready(base_url, process, options['ready_timeout'])
+
+            results = []
+            for name in options['endpoint'] or ENDPOINTS:
+                for concurrency in options['concurrency']:
+                    self.stderr.write(f'{name} @ {concurrency} clients...')
+                    result = drive(base_url, ENDPOINTS[name], concurrency, options['warmup'], options['duration'])
+                    results.append(dict(result, endpoint=name))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=10)
+            if stubs is not None:
+                stubs.stop()
+            if state_dir is not None:
+                shutil.rmtree(state_dir, ignore_errors=True)
+
+        report = {
+            'label': options['label'],
+            'server': options['server'],
+            'program': self.program,
+            'workers': None if self.program in (None, 'runserver') else options['workers'],
+            'python': sys.version.split()[0],
+            'duration': options['duration'],
+            'warmup': options['warmup'],
+            'upstream': None if stubs is None else {
+                'latency_ms': options['latency_ms'],
+                'jitter_ms': options['jitter_ms'],
+                'error_rate': options['error_rate'],
+                'universities': options['universities'],
+                'calls': stubs.stats(),
+            },
+            'results': results,
+        }
+        encoded = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(encoded + '\n')
+            self.stderr.write(f"Report written to {options['output']}")
+        else:
+            self.stdout.write(encoded)
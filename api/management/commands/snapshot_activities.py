@@ -0,0 +1,81 @@
+"""
+Snapshot Activities Command
+
+Downloads every activity type from the Bored API and writes them to the
+compact local snapshot used by api/services/activity_catalog.py, so
+/api/bored/ can answer without a network round trip.
+
+Usage:
+    python manage.py snapshot_activities
+    python manage.py snapshot_activities --output /srv/data/activities.json.gz
+"""
+
+import gzip
+import json
+import os
+from datetime import datetime, timezone
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.services import http_client
+from api.services.activity_catalog import ACTIVITY_TYPES, SNAPSHOT_FIELDS, reset_catalog
+from api.services.bored_api import URL, check_reply
+
+
+class Command(BaseCommand):
+    help = 'Snapshot the Bored API activities to the local activity catalog file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default=None,
+            help='Snapshot path (defaults to the API_ACTIVITY_DATASET setting).',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=30,
+            help='Upstream timeout in seconds (default 30).',
+        )
+
+    def handle(self, *args, **options):
+        path = options['output'] or getattr(settings, 'API_ACTIVITY_DATASET', None)
+        if not path:
+            raise CommandError('No output path: pass --output or set API_ACTIVITY_DATASET.')
+
+        activities = {}
+        for activity_type in ACTIVITY_TYPES:
+            try:
+                response = http_client.get(URL, params={'type': activity_type}, timeout=options['timeout'])
+                records = check_reply(response.json())
+            except requests.exceptions.RequestException as exc:
+                # The upstream answers 404 for a type without activities.
+                if getattr(exc.response, 'status_code', None) == 404:
+                    self.stderr.write(f'No activities of type {activity_type!r}; skipped')
+                    continue
+                raise CommandError(f'Failed to fetch {activity_type!r} activities: {exc}') from exc
+            for record in records:
+                activities.setdefault(record.get('key') or record['activity'], {
+                    field: record[field] for field in SNAPSHOT_FIELDS if field in record
+                })
+
+        if not activities:
+            raise CommandError('The upstream returned no activities; the snapshot was not written.')
+
+        snapshot = {
+            'source': URL,
+            'fetched_at': datetime.now(timezone.utc).isoformat(),
+            # Upstream order within each type, so local and live results match
+            'activities': list(activities.values()),
+        }
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as output:
+            json.dump(snapshot, output, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+        reset_catalog()
+
+        self.stdout.write(self.style.SUCCESS(f'Wrote {len(activities)} activities to {path}'))
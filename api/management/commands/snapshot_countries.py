@@ -0,0 +1,70 @@
+"""
+Snapshot Countries Command
+
+Downloads the full REST Countries dataset and writes it to the compact local
+snapshot used by api/services/country_index.py, so /api/country/ can answer
+without a network round trip.
+
+Usage:
+    python manage.py snapshot_countries
+    python manage.py snapshot_countries --output /srv/data/countries.json.gz
+"""
+
+import gzip
+import json
+import os
+from datetime import datetime, timezone
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.services import http_client
+from api.services.country_index import SNAPSHOT_FIELDS, reset_index
+
+# REST Countries endpoint returning every country; it requires a fields filter
+URL = 'https://restcountries.com/v3.1/all'
+
+
+class Command(BaseCommand):
+    help = 'Snapshot the REST Countries dataset to the local country index file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default=None,
+            help='Snapshot path (defaults to the API_COUNTRY_DATASET setting).',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=30,
+            help='Upstream timeout in seconds (default 30).',
+        )
+
+    def handle(self, *args, **options):
+        path = options['output'] or getattr(settings, 'API_COUNTRY_DATASET', None)
+        if not path:
+            raise CommandError('No output path: pass --output or set API_COUNTRY_DATASET.')
+
+        try:
+            response = http_client.get(URL, params={'fields': ','.join(SNAPSHOT_FIELDS)}, timeout=options['timeout'])
+            countries = response.json()
+        except requests.exceptions.RequestException as exc:
+            raise CommandError(f'Failed to fetch countries: {exc}') from exc
+
+        countries.sort(key=lambda country: country['name']['common'])
+        snapshot = {
+            'source': URL,
+            'fetched_at': datetime.now(timezone.utc).isoformat(),
+            'countries': countries,
+        }
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as output:
+            json.dump(snapshot, output, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+        reset_index()
+
+        self.stdout.write(self.style.SUCCESS(f'Wrote {len(countries)} countries to {path}'))
@@ -0,0 +1,56 @@
+"""
+Stub Upstreams Command
+
+Runs the local stand-ins for every upstream API (see api/stub_upstreams.py)
+until interrupted, e.g. to load-test a server started by hand.
+
+Usage:
+    python manage.py stub_upstreams --port 8765 --latency-ms 50 --universities 5000
+    API_UPSTREAM_BASE_URL=http://127.0.0.1:8765 gunicorn weather_api.wsgi
+"""
+
+from django.core.management.base import BaseCommand
+
+from api.stub_upstreams import StubUpstreams
+
+
+def add_stub_arguments(parser):
+    """
+    Adds the stub tuning options shared with the loadtest command.
+    """
+    parser.add_argument('--latency-ms', type=float, default=50, help='Upstream latency in ms (default 50).')
+    parser.add_argument('--jitter-ms', type=float, default=10, help='Extra random latency in ms (default 10).')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of upstream calls answered with 503 (default 0).')
+    parser.add_argument('--universities', type=int, default=5000, help='Universities per country (default 5000).')
+    parser.add_argument('--activities', type=int, default=10, help='Activities per bored type (default 10).')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default 0).')
+
+
+def build_stubs(options, port=0):
+    return StubUpstreams(
+        port=port,
+        latency=options['latency_ms'] / 1000,
+        jitter=options['jitter_ms'] / 1000,
+        error_rate=options['error_rate'],
+        universities=options['universities'],
+        activities=options['activities'],
+        seed=options['seed'],
+    )
+
+
+class Command(BaseCommand):
+    help = 'Serve local stand-ins for every upstream API until interrupted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8765, help='Port to listen on (default 8765).')
+        add_stub_arguments(parser)
+
+    def handle(self, *args, **options):
+        stubs = build_stubs(options, port=options['port']).start()
+        self.stdout.write(f'Stub upstreams listening; set API_UPSTREAM_BASE_URL={stubs.base_url}')
+        try:
+            stubs.join()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stubs.stop()
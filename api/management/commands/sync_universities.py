@@ -0,0 +1,116 @@
+"""
+Sync Universities Command
+
+Loads the Hipolabs universities dataset into the local University tables so the
+universities endpoints can answer from SQLite. All writes of one run happen in
+a single transaction with batched inserts. Every row stores its index in the
+upstream reply, so an incremental sync that adds universities keeps them in
+upstream order rather than appending them.
+
+Usage:
+    python manage.py sync_universities                  # incremental sync
+    python manage.py sync_universities --full           # drop and reload everything
+    python manage.py sync_universities --country Japan  # sync one country
+"""
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.models import University, UniversityDomain
+from api.services import http_client
+from api.services.cache import normalize_key
+from api.services.country_universities_api import URL
+
+UPDATE_FIELDS = ['country', 'country_key', 'alpha_two_code', 'domains', 'web_pages', 'position']
+
+
+def to_university(record, position):
+    """
+    Builds an unsaved University from one upstream record and its index in
+    the reply.
+    """
+    return University(
+        name=record['name'],
+        country=record['country'],
+        country_key=normalize_key(record['country']),
+        alpha_two_code=record.get('alpha_two_code') or '',
+        domains=record.get('domains') or [],
+        web_pages=record.get('web_pages') or [],
+        position=position,
+    )
+
+
+def domain_rows(universities):
+    return [
+        UniversityDomain(university=university, domain=domain)
+        for university in universities
+        for domain in university.domains
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Load or incrementally sync the Hipolabs universities dataset into the local database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Delete local rows and reload everything.')
+        parser.add_argument('--country', default=None, help='Only sync this country.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per INSERT/UPDATE batch (default 1000).')
+        parser.add_argument('--timeout', type=float, default=60, help='Upstream timeout in seconds (default 60).')
+
+    def fetch(self, country, timeout):
+        params = {'country': country} if country else None
+        try:
+            records = http_client.get(URL, params=params, timeout=timeout).json()
+        except requests.exceptions.RequestException as exc:
+            raise CommandError(f'Failed to fetch universities: {exc}') from exc
+
+        # The upstream lists a few universities twice; keep the first occurrence.
+        unique = {}
+        for record in records:
+            unique.setdefault((normalize_key(record['country']), record['name']), record)
+        return list(unique.values())
+
+    def handle(self, *args, **options):
+        records = self.fetch(options['country'], options['timeout'])
+        batch_size = options['batch_size']
+
+        queryset = University.objects.all()
+        if options['country']:
+            queryset = queryset.filter(country_key=normalize_key(options['country']))
+
+        with transaction.atomic():
+            if options['full']:
+                queryset.delete()
+                existing = {}
+            else:
+                existing = {(u.country_key, u.name): u for u in queryset}
+
+            to_create = []
+            to_update = []
+            for position, record in enumerate(records):
+                incoming = to_university(record, position)
+                current = existing.pop((incoming.country_key, incoming.name), None)
+                if current is None:
+                    to_create.append(incoming)
+                elif any(getattr(current, field) != getattr(incoming, field) for field in UPDATE_FIELDS):
+                    for field in UPDATE_FIELDS:
+                        setattr(current, field, getattr(incoming, field))
+                    to_update.append(current)
+
+            stale_ids = [university.pk for university in existing.values()]
+            for start in range(0, len(stale_ids), batch_size):
+                University.objects.filter(pk__in=stale_ids[start:start + batch_size]).delete()
+
+            University.objects.bulk_create(to_create, batch_size=batch_size)
+            University.objects.bulk_update(to_update, UPDATE_FIELDS, batch_size=batch_size)
+
+            updated_ids = [university.pk for university in to_update]
+            for start in range(0, len(updated_ids), batch_size):
+                UniversityDomain.objects.filter(university_id__in=updated_ids[start:start + batch_size]).delete()
+            UniversityDomain.objects.bulk_create(domain_rows(to_create + to_update), batch_size=batch_size)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Synced {len(records)} universities: {len(to_create)} created, '
+            f'{len(to_update)} updated, {len(stale_ids)} deleted'
+        ))
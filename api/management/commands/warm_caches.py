@@ -0,0 +1,60 @@
+"""
+Warm Caches Command
+
+Loads the hot key set of the response caches (configured API_WARMUP keys plus
+the most requested keys of all workers, see api/services/warmup.py). Run it
+before a deploy takes traffic: entries land in the node-local shared tier, so
+every new worker answers them without calling the upstream.
+
+Usage:
+    python manage.py warm_caches
+    python manage.py warm_caches --cache country_universities_api --concurrency 8
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.services import warmup
+
+
+class Command(BaseCommand):
+    help = 'Prefetch the most requested response cache entries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cache',
+            action='append',
+            default=None,
+            help='Only warm this cache (repeatable; default: every cache with a refresher).',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=None,
+            help='Keys loaded at the same time (defaults to API_WARMUP CONCURRENCY).',
+        )
+        parser.add_argument('--json', action='store_true', help='Print the summary as JSON.')
+
+    def handle(self, *args, **options):
+        names = options['cache']
+        known = [cache.name for cache in warmup.refreshable_caches()]
+        unknown = sorted(set(names or ()) - set(known))
+        if unknown:
+            raise CommandError(f'Unknown caches: {", ".join(unknown)}. Available: {", ".join(known)}')
+
+        summary = warmup.warm_up(names, concurrency=options['concurrency'])
+        if options['json']:
+            self.stdout.write(json.dumps(summary, indent=2))
+            return
+
+        for name, counts in summary.items():
+            self.stdout.write(
+                f'{name}: {counts["keys"]} keys, {counts["loaded"]} loaded, '
+                f'{counts["cached"]} already cached, {counts["failed"]} failed'
+            )
+        failed = sum(counts['failed'] for counts in summary.values())
+        if failed:
+            self.stdout.write(self.style.WARNING(f'{failed} keys could not be loaded'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Caches warmed'))
@@ -0,0 +1,305 @@
+"""
+Middleware Module
+
+This module contains the project middleware of the api app.
+
+Middleware included:
+- MetricsMiddleware: Records request counts, latency and in-flight requests per
+  endpoint (see api/services/metrics.py)
+- ServerTimingMiddleware: Reports each request's phase breakdown in a
+  Server-Timing header and a log line (see api/services/timing.py), and
+  profiles sampled requests
+- DeadlineMiddleware: Starts each request's deadline, which caps the timeouts
+  of its upstream calls (see api/services/deadline.py)
+
+Profiling is configured through the API_PROFILING setting:
+    - SAMPLE_EVERY (int): Profile every Nth request of a worker; 0 disables
+      sampling (default 0)
+    - HEADER (str): Request header that triggers a profile when its value
+      equals TOKEN (default 'X-Profile')
+    - TOKEN (str): Secret for header-triggered profiles; None disables them
+      (default None)
+    - ENGINE (str): 'cprofile' (.prof files for pstats/snakeviz) or
+      'pyinstrument' (.txt call trees, needs pyinstrument) (default 'cprofile')
+    - OUTPUT_DIR (str): Where profiles are written (default 'profiles')
+"""
+
+import cProfile
+import hmac
+import importlib.util
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .services import deadline
+from .services import metrics
+from .services import timing
+
+logger = logging.getLogger('api.timing')
+
+PROFILING_DEFAULTS = {
+    'SAMPLE_EVERY': 0,
+    'HEADER': 'X-Profile',
+    'TOKEN': None,
+    'ENGINE': 'cprofile',
+    'OUTPUT_DIR': 'profiles',
+}
+
+
+def endpoint_of(request):
+    """
+    Returns the URL route that served a request (e.g. 'api/country/'), so
+    metrics are labelled per endpoint rather than per query string.
+    """
+    match = getattr(request, 'resolver_match', None)
+    return match.route if match is not None else 'unmatched'
+
+
+class MetricsMiddleware:
+    """
+    Times every request and counts it by endpoint, method and status.
+
+    Works under WSGI and ASGI: Django calls the async path when the rest of the
+    stack is async, so no thread hop is added.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _start(self):
+        metrics.add_gauge('api_requests_in_flight')
+        return time.perf_counter()
+
+    def _finish(self, request, response, start):
+        metrics.add_gauge('api_requests_in_flight', value=-1)
+        endpoint = (('endpoint', endpoint_of(request)),)
+        metrics.observe('api_request_duration_seconds', endpoint, time.perf_counter() - start)
+        status = response.status_code if response is not None else 500
+        metrics.inc('api_requests_total', endpoint + (('method', request.method), ('status', str(status))))
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not metrics.enabled():
+            return self.get_response(request)
+        start = self._start()
+        response = None
+        try:
+            response = self.get_response(request)
+        finally:
+            self._finish(request, response, start)
+        return response
+
+    async def __acall__(self, request):
+        if not metrics.enabled():
+            return await self.get_response(request)
+        start = self._start()
+        response = None
+        try:
+            response = await self.get_response(request)
+        finally:
+            self._finish(request, response, start)
+        return response
+
+
+def get_profiling_config():
+    """
+    Returns the profiling configuration merged over PROFILING_DEFAULTS.
+    """
+    config = dict(PROFILING_DEFAULTS)
+    config.update(getattr(settings, 'API_PROFILING', {}))
+    return config
+
+
+class RequestProfiler:
+    """
+    Profiles one request with cProfile or pyinstrument and writes the result
+    to OUTPUT_DIR.
+
+    Only one request per process is profiled at a time (the interpreter allows
+    a single active profiler); requests selected while another profile runs
+    are served unprofiled. Under ASGI the profile also contains whatever
+    else the event loop ran meanwhile.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, config):
+        self.config = config
+        self.engine = config['ENGINE']
+        if self.engine == 'pyinstrument' and importlib.util.find_spec('pyinstrument') is None:
+            self.engine = 'cprofile'
+        self._profiler = None
+
+    def start(self, asynchronous=False):
+        """
+        Starts profiling; returns False if another profile is running.
+        """
+        if not self._lock.acquire(blocking=False):
+            return False
+        if self.engine == 'pyinstrument':
+            from pyinstrument import Profiler
+
+            self._profiler = Profiler(async_mode='enabled' if asynchronous else 'disabled')
+            self._profiler.start()
+        else:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return True
+
+    def stop(self, request):
+        """
+        Stops profiling and returns the path of the written profile.
+        """
+        try:
+            if self.engine == 'pyinstrument':
+                self._profiler.stop()
+            else:
+                self._profiler.disable()
+        finally:
+            self._lock.release()
+
+        os.makedirs(self.config['OUTPUT_DIR'], exist_ok=True)
+        slug = request.path.strip('/').replace('/', '-') or 'root'
+        name = f'{int(time.time() * 1000)}-{os.getpid()}-{slug}'
+        if self.engine == 'pyinstrument':
+            path = os.path.join(self.config['OUTPUT_DIR'], f'{name}.txt')
+            with open(path, 'w') as f:
+                f.write(self._profiler.output_text(unicode=True))
+        else:
+            path = os.path.join(self.config['OUTPUT_DIR'], f'{name}.prof')
+            self._profiler.dump_stats(path)
+        return path
+
+
+class ServerTimingMiddleware:
+    """
+    Splits each request's wall time into validate/upstream/shape/render/app
+    phases and reports them in a Server-Timing header and one JSON log line
+    on the 'api.timing' logger. Selected requests are also profiled (see
+    API_PROFILING).
+
+    Example header:
+        Server-Timing: validate;dur=0.21, upstream;dur=118.4, shape;dur=3.02,
+                       render;dur=6.7, app;dur=1.1, total;dur=129.43
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self._requests = itertools.count(1)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _should_profile(self, request, config):
+        every = config['SAMPLE_EVERY']
+        if every and next(self._requests) % every == 0:
+            return True
+        token = config['TOKEN']
+        supplied = request.headers.get(config['HEADER']) if token else None
+        return supplied is not None and hmac.compare_digest(supplied, token)
+
+    def _profiler(self, request, asynchronous):
+        config = get_profiling_config()
+        if not self._should_profile(request, config):
+            return None
+        profiler = RequestProfiler(config)
+        return profiler if profiler.start(asynchronous) else None
+
+    def process_template_response(self, request, response):
+        # Runs just before DRF renders the body; the callback fires after.
+        timings = timing.current()
+        if timings is not None:
+            started = time.perf_counter()
+            response.add_post_render_callback(lambda rendered: timings.add('render', time.perf_counter() - started))
+        return response
+
+    def _report(self, request, response, timings, profile_path):
+        breakdown = timings.breakdown()
+        response['Server-Timing'] = ', '.join(f'{name};dur={ms}' for name, ms in breakdown.items())
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        entry = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            **{f'{name}_ms': ms for name, ms in breakdown.items()},
+        }
+        if profile_path:
+            entry['profile'] = profile_path
+        logger.info(json.dumps(entry))
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings, token = timing.start()
+        profiler = self._profiler(request, asynchronous=False)
+        profile_path = None
+        try:
+            response = self.get_response(request)
+        finally:
+            if profiler is not None:
+                profile_path = profiler.stop(request)
+            timing.stop(token)
+        self._report(request, response, timings, profile_path)
+        return response
+
+    async def __acall__(self, request):
+        timings, token = timing.start()
+        profiler = self._profiler(request, asynchronous=True)
+        profile_path = None
+        try:
+            response = await self.get_response(request)
+        finally:
+            if profiler is not None:
+                profile_path = profiler.stop(request)
+            timing.stop(token)
+        self._report(request, response, timings, profile_path)
+        return response
+
+
+class DeadlineMiddleware:
+    """
+    Gives each request a deadline of API_REQUEST_DEADLINE['SECONDS'], or the
+    shorter budget the client sent in the deadline header, e.g.:
+
+        X-Request-Timeout: 2.5
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _start(self, request):
+        config = deadline.get_config()
+        return deadline.start(deadline.budget(request.headers.get(config['HEADER']), config))
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = self._start(request)
+        try:
+            return self.get_response(request)
+        finally:
+            deadline.stop(token)
+
+    async def __acall__(self, request):
+        token = self._start(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            deadline.stop(token)
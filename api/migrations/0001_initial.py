@@ -0,0 +1,40 @@
+# Generated by Django 6.0
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='University',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('country', models.CharField(max_length=100)),
+                ('country_key', models.CharField(max_length=100)),
+                ('alpha_two_code', models.CharField(blank=True, default='', max_length=2)),
+                ('domains', models.JSONField(default=list)),
+                ('web_pages', models.JSONField(default=list)),
+            ],
+            options={
+                'verbose_name_plural': 'universities',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['country_key'], name='university_country_key_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='UniversityDomain',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('domain', models.CharField(db_index=True, max_length=255)),
+                ('university', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='domain_set', to='api.university')),
+            ],
+        ),
+    ]
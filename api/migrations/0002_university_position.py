@@ -0,0 +1,30 @@
+# Generated by Django 5.2
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='university',
+            options={'ordering': ['position', 'id'], 'verbose_name_plural': 'universities'},
+        ),
+        migrations.RemoveIndex(
+            model_name='university',
+            name='university_country_key_idx',
+        ),
+        migrations.AddField(
+            model_name='university',
+            name='position',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='university',
+            index=models.Index(fields=['country_key', 'position'], name='university_country_pos_idx'),
+        ),
+    ]
@@ -1,3 +1,66 @@
+"""
+Models Module
+
+This module contains the database models backing the local copy of the Hipolabs
+universities dataset. The data is loaded by the sync_universities management
+command and read by api/services/country_universities_api.py, so university
+lookups are answered from SQLite instead of the upstream API.
+
+Models included:
+- University: One university with its country, codes and web addresses
+- UniversityDomain: One academic domain of a university, indexed for lookups
+"""
+
 from django.db import models
 
-# Create your models here.
+
+class University(models.Model):
+    """
+    A university from the Hipolabs Universities dataset.
+
+    Fields:
+        - name (str): University name
+        - country (str): Country name as reported by the upstream
+        - country_key (str): Normalized country name used for case-insensitive
+          lookups (see api.services.cache.normalize_key), indexed
+        - alpha_two_code (str): ISO 3166-1 alpha-2 country code
+        - domains (list): Academic domain names
+        - web_pages (list): University website URLs, primary first
+        - position (int): Index of the university in the upstream reply of
+          its last sync
+
+    Rows are ordered by position, so local and live results list
+    universities in the same order even after incremental syncs inserted
+    new universities between existing ones.
+    """
+    name = models.CharField(max_length=255)
+    country = models.CharField(max_length=100)
+    country_key = models.CharField(max_length=100)
+    alpha_two_code = models.CharField(max_length=2, blank=True, default='')
+    domains = models.JSONField(default=list)
+    web_pages = models.JSONField(default=list)
+    position = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['position', 'id']
+        indexes = [
+            models.Index(fields=['country_key', 'position'], name='university_country_pos_idx'),
+        ]
+        verbose_name_plural = 'universities'
+
+    def __str__(self):
+        return f'{self.name} ({self.country})'
+
+
+class UniversityDomain(models.Model):
+    """
+    One academic domain of a university (e.g. 'mit.edu').
+
+    Domains live in their own table so they can be indexed; University.domains
+    keeps the full list in upstream order for responses.
+    """
+    university = models.ForeignKey(University, on_delete=models.CASCADE, related_name='domain_set')
+    domain = models.CharField(max_length=255, db_index=True)
+
+    def __str__(self):
+        return self.domain
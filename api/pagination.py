@@ -0,0 +1,214 @@
+"""
+Pagination Module
+
+This module provides cursor/limit pagination and streaming output for the
+universities endpoints, whose upstream payloads can hold thousands of entries
+(e.g. 'United States').
+
+Pagination:
+    ?limit=N returns at most N universities plus a 'next' cursor; passing
+    ?cursor=<next> returns the following page. Cursors are opaque strings.
+
+Streaming:
+    ?stream=json emits the usual {"country": ..., "universities": [...]}
+    document incrementally; ?stream=ndjson emits one university per line.
+    Rows are encoded in chunks of STREAM_CHUNK_ROWS, so the full JSON document
+    is never built in memory and the first bytes leave immediately.
+
+Sources are either a list (the cached upstream result) or a lazy QuerySet of
+the local universities table. A QuerySet page is read with LIMIT/OFFSET and
+a stream with a server-side iterator, so neither loads the whole country.
+Offsets count rows in upstream order in both, so cursors stay valid when a
+country moves between them.
+"""
+
+import base64
+import binascii
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+
+from .services.timing import timed
+
+STREAM_CHUNK_ROWS = 200
+
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def encode_cursor(offset):
+    """
+    Encodes a list offset as an opaque cursor string.
+    """
+    return base64.urlsafe_b64encode(f'o={offset}'.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor produced by encode_cursor().
+
+    Returns:
+        int: The list offset.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        prefix, _, offset = base64.urlsafe_b64decode(padded.encode()).decode().partition('=')
+    except (binascii.Error, UnicodeDecodeError) as exc:
+        raise ValueError('Invalid cursor') from exc
+    if prefix != 'o' or not offset.isdigit():
+        raise ValueError('Invalid cursor')
+    return int(offset)
+
+
+def is_paginated(options):
+    """
+    Returns True when the validated query asks for a page (limit or cursor).
+    """
+    return options.get('limit') is not None or options.get('cursor') is not None
+
+
+def paginate(items, options):
+    """
+    Slices items according to the validated 'cursor' and 'limit' options.
+
+    Args:
+        items (list or QuerySet): The full result list or local QuerySet.
+        options (dict): Validated query data; 'cursor' is already decoded to an
+            offset by the query serializer.
+
+    Returns:
+        tuple: (page, next cursor string or None on the last page). Without a
+               limit the page of a QuerySet is still lazy; with one it is a
+               list read with a single LIMIT/OFFSET query.
+    """
+    offset = options.get('cursor') or 0
+    limit = options.get('limit')
+    if limit is None:
+        return items[offset:], None
+    end = offset + limit
+    # One row past the page tells whether there is a next one, without a COUNT.
+    page = list(items[offset:end + 1])
+    next_cursor = encode_cursor(end) if len(page) > limit else None
+    return page[:limit], next_cursor
+
+
+def country_of(universities, default):
+    """
+    Returns the country name reported by the upstream, or default for no results.
+    """
+    for university in universities[:1]:
+        return university['country']
+    return default
+
+
+@timed('shape')
+def paginated_payload(universities, options, rows, default_country):
+    """
+    Builds one page of a universities response.
+
+    Args:
+        universities (list or QuerySet): The full result list or local QuerySet.
+        options (dict): Validated query data with 'cursor' and 'limit'.
+        rows (callable): Shapes a list of upstream records into response rows.
+        default_country (str): Country name used when there are no results.
+
+    Returns:
+        dict: {'country': str, 'universities': list, 'next': str or None}
+    """
+    page, next_cursor = paginate(universities, options)
+    return {
+        'country': country_of(universities, default_country),
+        'universities': rows(page),
+        'next': next_cursor,
+    }
+
+
+async def apaginated_payload(universities, options, rows, default_country):
+    """
+    Async wrapper around paginated_payload(); QuerySet pages are read in a
+    worker thread, as the ORM is sync-only.
+    """
+    if isinstance(universities, QuerySet):
+        return await sync_to_async(paginated_payload)(universities, options, rows, default_country)
+    return paginated_payload(universities, options, rows, default_country)
+
+
+def iter_chunks(universities, options, row, default_country):
+    """
+    Yields the encoded response body in chunks of STREAM_CHUNK_ROWS rows.
+
+    Args:
+        universities (list or QuerySet): The full result list or local QuerySet.
+        options (dict): Validated query data with 'stream', 'cursor' and 'limit'.
+        row (callable): Shapes one upstream record into a response row.
+        default_country (str): Country name used when there are no results.
+
+    Yields:
+        bytes: Consecutive pieces of the JSON or NDJSON document.
+    """
+    page, next_cursor = paginate(universities, options)
+    ndjson = options['stream'] == 'ndjson'
+
+    if not ndjson:
+        country = json.dumps(country_of(universities, default_country), ensure_ascii=False)
+        yield f'{{"country":{country},"universities":['.encode()
+
+    items = page.iterator(chunk_size=STREAM_CHUNK_ROWS) if isinstance(page, QuerySet) else iter(page)
+    first = True
+    while True:
+        chunk = list(islice(items, STREAM_CHUNK_ROWS))
+        if not chunk:
+            break
+        encoded = [json.dumps(row(item), ensure_ascii=False) for item in chunk]
+        if ndjson:
+            yield ('\n'.join(encoded) + '\n').encode()
+        else:
+            yield (('' if first else ',') + ','.join(encoded)).encode()
+        first = False
+
+    if not ndjson:
+        tail = f',"next":{json.dumps(next_cursor)}' if is_paginated(options) else ''
+        yield f']{tail}}}'.encode()
+
+
+async def aiter_chunks(universities, options, row, default_country):
+    """
+    Async wrapper around iter_chunks() so ASGI streams without buffering.
+    Chunks of a QuerySet are read in a worker thread, as the ORM is sync-only.
+    """
+    chunks = iter_chunks(universities, options, row, default_country)
+    if not isinstance(universities, QuerySet):
+        for chunk in chunks:
+            yield chunk
+        return
+    next_chunk = sync_to_async(next)
+    while True:
+        chunk = await next_chunk(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def streaming_response(universities, options, row, default_country, asynchronous=False):
+    """
+    Builds a StreamingHttpResponse for ?stream=json or ?stream=ndjson.
+
+    Args:
+        asynchronous (bool): Use an async iterator (for ASGI views).
+
+    Returns:
+        StreamingHttpResponse: The streamed universities document.
+    """
+    chunks = aiter_chunks if asynchronous else iter_chunks
+    return StreamingHttpResponse(
+        chunks(universities, options, row, default_country),
+        content_type=CONTENT_TYPES[options['stream']],
+    )
@@ -0,0 +1,314 @@
+"""
+Payloads Module
+
+This module contains the functions that shape raw upstream data into the JSON
+response bodies of the API endpoints. They are shared by the sync views, the
+async views and the batch endpoint so every path returns identical shapes. Each
+public helper is timed as the request's 'shape' phase (see
+api/services/timing.py).
+
+The hot list-shaped bodies (universities, bored activities, quotes, country
+details) are built with precompiled Projections instead of DRF serializers: a
+Projection resolves its field paths once at import time and then builds plain
+dicts, producing the same JSON as the matching serializer without creating
+field objects or OrderedDicts per row. Compare them with
+`python manage.py benchmark_serializers`.
+"""
+
+import functools
+import re
+from operator import itemgetter
+
+from .services.timing import timed
+
+
+class Field:
+    """
+    One output field of a Projection.
+
+    Args:
+        *path: Keys/indexes leading from the record to the value, e.g.
+            Field('web_pages', 0) reads record['web_pages'][0].
+        cast (callable, optional): Applied to non-None values, matching the
+            to_representation() of the DRF field it replaces (str for
+            CharField, int for IntegerField).
+        optional (bool): Return None instead of raising when the path is
+            missing from a record.
+        validate (callable, optional): Applied to every value, None included,
+            for bodies that used to be built with serializer(data=...); it
+            converts the value like the DRF field's to_internal_value() and
+            raises ValueError where is_valid() would have failed.
+    """
+
+    def __init__(self, *path, cast=None, optional=False, validate=None):
+        self.path = path
+        self.cast = cast
+        self.optional = optional
+        self.validate = validate
+
+    def compile(self):
+        getter = itemgetter(self.path[0])
+        for step in self.path[1:]:
+            getter = _chain(getter, itemgetter(step))
+        if self.cast is not None:
+            getter = _cast(getter, self.cast)
+        if self.validate is not None:
+            getter = _chain(getter, self.validate)
+        if self.optional:
+            getter = _optional(getter)
+        return getter
+
+
+def _cast(getter, cast):
+    def get(record):
+        value = getter(record)
+        return None if value is None else cast(value)
+    return get
+
+
+def _optional(getter):
+    def get(record):
+        try:
+            return getter(record)
+        except (KeyError, IndexError):
+            return None
+    return get
+
+
+def _chain(first, then):
+    return lambda record: then(first(record))
+
+
+_SURROGATES = re.compile('[\ud800-\udfff]')
+_DECIMAL_ZEROS = re.compile(r'\.0*\s*$')
+
+
+def char_value(value):
+    """
+    Validates a value the way a default serializers.CharField does: no None,
+    booleans or containers, NUL or surrogate characters; whitespace trimmed;
+    not blank.
+    """
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise ValueError(f'Not a valid string: {value!r}')
+    value = str(value)
+    if '\x00' in value or _SURROGATES.search(value):
+        raise ValueError(f'Invalid characters in {value!r}')
+    value = value.strip()
+    if not value:
+        raise ValueError('Blank string')
+    return value
+
+
+def integer_value(value):
+    """
+    Validates a value the way serializers.IntegerField does: integers,
+    integral floats and numeric strings ('12', '12.0'); no None or booleans.
+    """
+    if value is None or (isinstance(value, str) and len(value) > 1000):
+        raise ValueError(f'Not a valid integer: {value!r}')
+    try:
+        return int(_DECIMAL_ZEROS.sub('', str(value)))
+    except (TypeError, ValueError):
+        raise ValueError(f'Not a valid integer: {value!r}') from None
+
+
+class Projection:
+    """
+    Precompiled mapping from upstream records to response rows.
+
+    Usage:
+        QUOTE = Projection(quote=Field('q'), author=Field('a'))
+        QUOTE.one({'q': 'Be kind.', 'a': 'Anon', 'h': '...'})
+        # {'quote': 'Be kind.', 'author': 'Anon'}
+        QUOTE.many(records)
+
+    Missing keys raise KeyError, as the serializers did.
+    """
+
+    def __init__(self, **fields):
+        self.fields = fields
+        self._getters = tuple((name, field.compile()) for name, field in fields.items())
+
+    def one(self, record):
+        return {name: get(record) for name, get in self._getters}
+
+    def many(self, records):
+        getters = self._getters
+        return [{name: get(record) for name, get in getters} for record in records]
+
+
+# Same fields and conversions as CountryDetailSerializer, UniversitySerializer,
+# BoredSerialier and QuotesSerializer.
+# Country details were validated with CountryDetailSerializer(data=...), so
+# their fields still reject what is_valid() rejected.
+COUNTRY_DETAIL = Projection(
+    name=Field('name', 'common', validate=char_value),
+    capital=Field('capital', 0, validate=char_value),
+    population=Field('population', validate=integer_value),
+    flag=Field('flag', validate=char_value),
+    region=Field('region', validate=char_value),
+)
+UNIVERSITY = Projection(
+    name=Field('name', cast=str),
+    website=Field('web_pages', 0),
+)
+BORED_ACTIVITY = Projection(
+    activity=Field('activity', cast=str),
+    type=Field('type', cast=str),
+    participants=Field('participants', cast=int),
+)
+QUOTE = Projection(
+    quote=Field('q'),
+    author=Field('a'),
+)
+
+# Extra /api/country/ attributes a client can ask for with ?fields=; the
+# first step of each path is the REST Countries field fetched for it.
+COUNTRY_EXTRA_FIELDS = {
+    'official_name': Field('name', 'official', cast=str, optional=True),
+    'capitals': Field('capital', optional=True),
+    'subregion': Field('subregion', optional=True),
+    'continents': Field('continents', optional=True),
+    'area': Field('area', optional=True),
+    'languages': Field('languages', optional=True),
+    'currencies': Field('currencies', optional=True),
+    'timezones': Field('timezones', optional=True),
+    'borders': Field('borders', optional=True),
+    'landlocked': Field('landlocked', optional=True),
+    'latlng': Field('latlng', optional=True),
+    'tld': Field('tld', optional=True),
+    'cca2': Field('cca2', optional=True),
+    'cca3': Field('cca3', optional=True),
+    'maps': Field('maps', optional=True),
+}
+
+
+def country_fields(extra=()):
+    """
+    Returns the REST Countries fields needed for a /api/country/ response with
+    the given extra attributes, for the upstream fields filter.
+
+    Example:
+        >>> country_fields(['official_name', 'area'])
+        ['area', 'capital', 'flag', 'name', 'population', 'region']
+    """
+    fields = {field.path[0] for field in COUNTRY_DETAIL.fields.values()}
+    fields.update(COUNTRY_EXTRA_FIELDS[name].path[0] for name in extra)
+    return sorted(fields)
+
+
+@functools.lru_cache(maxsize=128)
+def _country_projection(extra):
+    return Projection(**COUNTRY_DETAIL.fields, **{name: COUNTRY_EXTRA_FIELDS[name] for name in extra})
+
+
+@timed('shape')
+def country_detail_payload(country_info, fields=()):
+    """
+    Shapes a REST Countries record list into the /api/country/ response body,
+    with the extra attributes named in fields (see COUNTRY_EXTRA_FIELDS).
+    """
+    if not fields:
+        return COUNTRY_DETAIL.one(country_info[0])
+    return _country_projection(tuple(fields)).one(country_info[0])
+
+
+@timed('shape')
+def cat_image_payload(images):
+    """
+    Shapes a Cat API search result into the /api/cat/ response body.
+    """
+    image = images[0]
+    return {
+        'image_url':image['url'],
+        'width':image['width'],
+        'height':image['height'],
+    }
+
+
+@timed('shape')
+def joke_payload(joke):
+    """
+    Shapes an Official Joke API record into the /api/joke/ response body.
+    """
+    return {
+        'setup':joke['setup'],
+        'punchline':joke['punchline']
+        }
+
+
+@timed('shape')
+def advice_payload(advice):
+    """
+    Shapes an Advice Slip record into the /api/advice/ response body.
+    """
+    return {
+        'advice':advice['slip']['advice']
+    }
+
+
+@timed('shape')
+def age_prediction_payload(age_prediction):
+    """
+    Shapes an Agify.io record into the /api/age/ response body.
+    """
+    return {
+        'name': age_prediction['name'],
+        'predicted_age': age_prediction.get('age')
+    }
+
+
+def age_bulk_payload(predictions):
+    """
+    Shapes age_prediction_bulk() results into the /api/age/bulk/ response
+    body; names that could not be fetched carry an 'error' instead.
+    """
+    return [
+        {'name': prediction['name'], 'error': 'Fetching age data failed.'}
+        if prediction.get('unavailable') else age_prediction_payload(prediction)
+        for prediction in predictions
+    ]
+
+
+def university_row(university):
+    """
+    Shapes one Hipolabs record into a {'name', 'website'} response row.
+    """
+    return UNIVERSITY.one(university)
+
+
+@timed('shape')
+def university_rows(universities):
+    """
+    Shapes a list of Hipolabs records into response rows.
+    """
+    return UNIVERSITY.many(universities)
+
+
+@timed('shape')
+def universities_payload(country_universities):
+    """
+    Shapes a Hipolabs result list into the /api/universities/ response body.
+    """
+    data_list = university_rows(country_universities)
+    return {
+            'country': country_universities[0]['country'],
+            'universities': data_list
+        }
+
+
+@timed('shape')
+def bored_payload(activities):
+    """
+    Shapes Bored API activities into the /api/bored/ response body.
+    """
+    return BORED_ACTIVITY.many(activities)
+
+
+@timed('shape')
+def quotes_payload(quotes):
+    """
+    Shapes zenquotes records into the /api/quotes/ response body.
+    """
+    return QUOTE.many(quotes)
@@ -0,0 +1,65 @@
+"""
+Permissions Module
+
+This module guards the operational endpoints (/api/stats/, /api/cache/ and
+/metrics): their statistics describe the whole service layer, and an
+invalidation makes the next requests call the upstreams again.
+
+A request is allowed when it comes from a staff user (session or basic
+authentication under the default settings), or when it sends the shared
+secret of the API_ADMIN_TOKEN setting in the X-Admin-Token header. The
+API-only settings have no authentication, so there the token is the only way
+in. Without a token configured only staff users are allowed.
+
+/metrics is a plain Django view. Besides the above it accepts the scrape token
+of API_METRICS['TOKEN'] as "Authorization: Bearer <token>", the header
+Prometheus sends for a scrape job's authorization credentials.
+"""
+
+import hmac
+
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+HEADER = 'X-Admin-Token'
+
+
+def _matches(supplied, token):
+    return supplied is not None and hmac.compare_digest(supplied.encode(), token.encode())
+
+
+def is_admin(request):
+    """
+    Returns True for staff users and requests carrying the admin token.
+    """
+    if getattr(getattr(request, 'user', None), 'is_staff', False):
+        return True
+    token = getattr(settings, 'API_ADMIN_TOKEN', None)
+    return bool(token) and _matches(request.headers.get(HEADER), token)
+
+
+def may_scrape(request):
+    """
+    Returns True when a request may read /metrics: an admin request, or one
+    sending the API_METRICS['TOKEN'] bearer token.
+    """
+    if is_admin(request):
+        return True
+    token = getattr(settings, 'API_METRICS', {}).get('TOKEN')
+    return bool(token) and _matches(request.headers.get('Authorization'), f'Bearer {token}')
+
+
+class IsAdminOrToken(BasePermission):
+    """
+    Allows staff users and requests carrying the configured admin token.
+
+    Usage:
+        @api_view(['GET'])
+        @permission_classes([IsAdminOrToken])
+        def service_stats(request): ...
+    """
+
+    message = f'Staff user or a valid {HEADER} header required.'
+
+    def has_permission(self, request, view):
+        return is_admin(request)
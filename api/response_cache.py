@@ -0,0 +1,254 @@
+"""
+Response Cache Module
+
+This module caches fully rendered response bodies of read-only endpoints. On a
+hit the stored bytes are returned as they are: the view, its serializers or
+payload helpers and DRF's renderer do not run at all. It complements the data
+caches of api/services/cache.py, which only save the upstream round trip.
+
+Entries are keyed by request path, the query parameters (sorted, with the
+parameters named in `normalize` compared case- and whitespace-insensitively
+and the comma-separated lists named in `unordered` compared as sets), the
+Accept header and the chosen content encoding. Only 200 responses that are
+not streamed are stored. Large bodies can be stored gzip-compressed for
+clients that accept it, so hits skip compression as well.
+
+Decorated views also answer conditional requests. Every 200 response carries
+a strong ETag (a digest of the body, per content encoding) and a Last-Modified
+date; a request whose If-None-Match or If-Modified-Since still matches gets an
+empty 304. On a cache hit the stored entry already knows both, so the 304 is
+decided before anything is rendered or even copied into a response.
+
+Views opt in with the cache_response decorator, each with its own TTL:
+    @cache_response(ttl=3600, normalize=('name',))
+    @api_view(['GET'])
+    def get_country_data(request): ...
+
+The cache is configured through the API_RESPONSE_CACHE setting:
+    - ENABLED (bool): Master switch (default False)
+    - MAXSIZE (int): Entries kept per view (default 1024)
+    - COMPRESS (bool): Store gzip bodies for gzip-accepting clients (default True)
+    - COMPRESS_MIN_BYTES (int): Smallest body worth compressing (default 1024)
+    - CONDITIONAL (bool): Emit ETag/Last-Modified and answer 304s, also
+      when ENABLED is off (default True)
+"""
+
+import functools
+import gzip
+import hashlib
+import re
+import time
+from collections import namedtuple
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from .services import timing
+from .services.cache import get_cache, all_caches, normalize_key
+
+DEFAULTS = {
+    'ENABLED': False,
+    'MAXSIZE': 1024,
+    'COMPRESS': True,
+    'COMPRESS_MIN_BYTES': 1024,
+    'CONDITIONAL': True,
+}
+
+CACHE_PREFIX = 'response:'
+
+_accepts_gzip = re.compile(r'\bgzip\b')
+
+# One stored response; last_modified is a Unix timestamp.
+Entry = namedtuple('Entry', ['content_type', 'encoding', 'body', 'etag', 'last_modified'])
+
+
+def get_config():
+    """
+    Returns the response cache configuration merged over DEFAULTS.
+    """
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'API_RESPONSE_CACHE', {}))
+    return config
+
+
+def cache_key(request, normalize, encoding, unordered=()):
+    """
+    Builds the cache key of a request.
+
+    Args:
+        request (HttpRequest): The incoming request.
+        normalize (tuple): Query parameters whose values are normalized with
+            normalize_key(); other values are compared exactly (e.g. cursors).
+        encoding (str): 'gzip' or 'identity'.
+        unordered (tuple, optional): Comma-separated list parameters whose
+            items are deduplicated and sorted, so 'area,tld' and 'tld,area'
+            share one entry.
+
+    Returns:
+        str: A hex digest, so case-sensitive parts survive the cache's own key
+             normalization.
+    """
+    params = sorted(
+        (name, _canonical(value, name in normalize, name in unordered))
+        for name, values in request.GET.lists()
+        for value in values
+    )
+    raw = repr((request.path, params, request.headers.get('Accept', ''), encoding))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _canonical(value, normalize, unordered):
+    if unordered:
+        value = ','.join(sorted({item.strip() for item in value.split(',') if item.strip()}))
+    return normalize_key(value) if normalize else value
+
+
+def choose_encoding(request, config):
+    if config['COMPRESS'] and _accepts_gzip.search(request.headers.get('Accept-Encoding', '')):
+        return 'gzip'
+    return 'identity'
+
+
+def make_etag(body, encoding):
+    """
+    Returns a strong ETag for an uncompressed body sent with the given encoding.
+    """
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    return f'"{digest}"' if encoding == 'identity' else f'"{digest}-{encoding}"'
+
+
+def set_validators(response, entry, config):
+    patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+    if config['CONDITIONAL']:
+        response['ETag'] = entry.etag
+        response['Last-Modified'] = http_date(entry.last_modified)
+
+
+def not_modified(request, entry, config):
+    """
+    Returns a 304 (or 412) response when the request's validators match entry,
+    else None.
+    """
+    if not config['CONDITIONAL']:
+        return None
+    # Without response=, Django returns None when the validators don't match.
+    response = get_conditional_response(request, etag=entry.etag, last_modified=int(entry.last_modified))
+    if response is None or response.status_code not in (304, 412):
+        return None
+    set_validators(response, entry, config)
+    return response
+
+
+def replay(request, entry, config):
+    """
+    Answers a request from a stored entry: a 304 if the client's copy is
+    current, otherwise the stored bytes.
+    """
+    response = not_modified(request, entry, config)
+    if response is None:
+        response = HttpResponse(entry.body, content_type=entry.content_type)
+        if entry.encoding != 'identity':
+            response['Content-Encoding'] = entry.encoding
+        set_validators(response, entry, config)
+    response['X-Cache'] = 'HIT'
+    return response
+
+
+def finalize(request, cache, key, response, encoding, config):
+    """
+    Renders a fresh response, stores its final bytes when key is given, adds
+    the validators and returns it, or a 304 if the client's copy is current.
+
+    Responses other than non-streamed 200s are returned untouched.
+    """
+    if response.status_code != 200 or response.streaming:
+        return response
+    if hasattr(response, 'render'):
+        with timing.phase('render'):
+            response.render()
+
+    body = response.content
+    if encoding == 'gzip' and len(body) >= config['COMPRESS_MIN_BYTES']:
+        etag = make_etag(body, encoding)
+        body = gzip.compress(body)
+        response.content = body
+        response['Content-Encoding'] = 'gzip'
+    else:
+        encoding = 'identity'
+        etag = make_etag(body, encoding)
+
+    entry = Entry(response['Content-Type'], encoding, body, etag, time.time())
+    if key is not None:
+        cache.set(key, entry)
+        response['X-Cache'] = 'MISS'
+    set_validators(response, entry, config)
+    return not_modified(request, entry, config) or response
+
+
+def cache_response(ttl, normalize=(), name=None, unordered=()):
+    """
+    Decorator caching the rendered GET responses of a sync or async view and
+    answering conditional GETs with 304.
+
+    Apply it above @api_view / @require_GET so it sees the plain Django request.
+
+    Args:
+        ttl (float): Seconds a rendered response stays valid.
+        normalize (tuple, optional): Query parameters matched case- and
+            whitespace-insensitively, e.g. ('name',) for country names.
+        name (str, optional): Cache name suffix (default: the view's name).
+        unordered (tuple, optional): Comma-separated list parameters whose
+            item order and duplicates do not matter, e.g. ('fields',).
+    """
+    def decorator(view):
+        # Class-based views (DRF's @api_view included) are named by their class.
+        view_name = name or getattr(view, 'view_class', view).__name__
+        cache = get_cache(CACHE_PREFIX + view_name, maxsize=get_config()['MAXSIZE'], ttl=ttl)
+
+        def lookup(request):
+            config = get_config()
+            if request.method != 'GET' or not config['ENABLED']:
+                return config, 'identity', None, None
+            encoding = choose_encoding(request, config)
+            key = cache_key(request, normalize, encoding, unordered)
+            return config, encoding, key, cache.get(key)
+
+        def respond(request, config, encoding, key, response):
+            if key is None and not (request.method == 'GET' and config['CONDITIONAL']):
+                return response
+            return finalize(request, cache, key, response, encoding, config)
+
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def wrapped(request, *args, **kwargs):
+                config, encoding, key, entry = lookup(request)
+                if entry is not None:
+                    return replay(request, entry, config)
+                response = await view(request, *args, **kwargs)
+                return respond(request, config, encoding, key, response)
+        else:
+            @functools.wraps(view)
+            def wrapped(request, *args, **kwargs):
+                config, encoding, key, entry = lookup(request)
+                if entry is not None:
+                    return replay(request, entry, config)
+                response = view(request, *args, **kwargs)
+                return respond(request, config, encoding, key, response)
+        return wrapped
+    return decorator
+
+
+def clear():
+    """
+    Drops every rendered response, e.g. after the data behind them was invalidated.
+
+    Returns:
+        int: Number of response caches cleared.
+    """
+    caches = [cache for cache in all_caches() if cache.name.startswith(CACHE_PREFIX)]
+    for cache in caches:
+        cache.clear()
+    return len(caches)
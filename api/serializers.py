@@ -5,17 +5,44 @@ This module contains Django REST Framework serializers used for request validati
 and response formatting. Serializers ensure data integrity by validating input
 parameters and structuring output responses.
 
+Input serializers extend QuerySerializer, which times validation as the
+request's 'validate' phase (see api/services/timing.py).
+
 Serializers included:
+- QuerySerializer: Base class of the request validation serializers
 - CountryDetailSerializer: Validates and formats country information
 - CountryQuerySerializer: Validates country name query parameter
 - AgeQuerySerializer: Validates name query parameter for age prediction
+- AgeBulkSerializer: Validates the list of names for bulk age prediction
 - CountryUniversitiesQuerySerializer: Validates country query parameter for universities
+- UniversitiesPageQuerySerializer: Adds pagination and streaming options for universities
 - UniversitySerializer: Formats individual university data
 - CountryUniversitiesSerializer: Combines country data with list of universities
+- BoredQuerySerializer: Validates the activity types and filters of the bored endpoint
+- QuotesQuerySerializer: Validates the number of quotes requested
+- CacheInvalidateQuerySerializer: Validates cache invalidation parameters
+- BatchItemSerializer: Validates one sub-request of a batch
+- BatchRequestSerializer: Validates the body of a batch request
 """
 
 from rest_framework import serializers
 
+from .pagination import decode_cursor
+from .payloads import COUNTRY_EXTRA_FIELDS
+from .services import timing
+
+
+class QuerySerializer(serializers.Serializer):
+    """
+    Base class of the serializers validating request input.
+
+    Times is_valid() as the 'validate' phase of the current request.
+    """
+
+    def is_valid(self, *, raise_exception=False):
+        with timing.phase('validate'):
+            return super().is_valid(raise_exception=raise_exception)
+
 
 class CountryDetailSerializer(serializers.Serializer):
     """
@@ -50,7 +77,7 @@ class CountryDetailSerializer(serializers.Serializer):
     region = serializers.CharField()
 
 
-class CountryQuerySerializer(serializers.Serializer):
+class CountryQuerySerializer(QuerySerializer):
     """
     Serializer for validating country name query parameters.
     
@@ -59,6 +86,10 @@ class CountryQuerySerializer(serializers.Serializer):
     
     Fields:
         - name (str, required): The name of the country to query
+        - fields (str, optional): Extra attributes to include, separated by
+          commas (e.g. 'area,languages'); see payloads.COUNTRY_EXTRA_FIELDS.
+          Validated to a sorted list without duplicates, so the order a
+          client lists them in does not change the response or its caching
     
     Usage:
         serializer = CountryQuerySerializer(data=request.query_params)
@@ -67,9 +98,19 @@ class CountryQuerySerializer(serializers.Serializer):
             # Process country_name
     """
     name = serializers.CharField(required=True)
+    fields = serializers.CharField(required=False, min_length=1)
+
+    def validate_fields(self, value):
+        fields = sorted({field.strip() for field in value.split(',') if field.strip()})
+        unknown = [field for field in fields if field not in COUNTRY_EXTRA_FIELDS]
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(COUNTRY_EXTRA_FIELDS)}."
+            )
+        return fields
 
 
-class AgeQuerySerializer(serializers.Serializer):
+class AgeQuerySerializer(QuerySerializer):
     """
     Serializer for validating age prediction query parameters.
     
@@ -88,7 +129,27 @@ class AgeQuerySerializer(serializers.Serializer):
     name = serializers.CharField(required=True)
 
 
-class CountryUniversitiesQuerySerializer(serializers.Serializer):
+class AgeBulkSerializer(QuerySerializer):
+    """
+    Serializer for validating bulk age prediction requests.
+
+    Fields:
+        - names (list of str, required, 1-1000 items): Names to predict;
+          duplicates are allowed and answered once
+
+    Usage:
+        serializer = AgeBulkSerializer(data=request.data)
+        if serializer.is_valid(raise_exception=True):
+            names = serializer.validated_data['names']
+    """
+    names = serializers.ListField(
+        child=serializers.CharField(min_length=1),
+        allow_empty=False,
+        max_length=1000,
+    )
+
+
+class CountryUniversitiesQuerySerializer(QuerySerializer):
     """
     Serializer for validating country name query parameters for universities endpoint.
     
@@ -107,6 +168,31 @@ class CountryUniversitiesQuerySerializer(serializers.Serializer):
     country = serializers.CharField(min_length=1,required=True)
 
 
+class UniversitiesPageQuerySerializer(CountryUniversitiesQuerySerializer):
+    """
+    Serializer for validating the query parameters of the universities endpoints.
+
+    Extends CountryUniversitiesQuerySerializer with optional pagination and
+    streaming (see api/pagination.py).
+
+    Fields:
+        - country (str, required): The name of the country to search for universities
+        - limit (int, optional, 1-1000): Maximum universities per page
+        - cursor (str, optional): The 'next' cursor of the previous page; decoded
+          to a list offset in validated_data
+        - stream (str, optional): 'json' or 'ndjson' to stream the response
+    """
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=1000)
+    cursor = serializers.CharField(required=False)
+    stream = serializers.ChoiceField(choices=['json', 'ndjson'], required=False)
+
+    def validate_cursor(self, value):
+        try:
+            return decode_cursor(value)
+        except ValueError:
+            raise serializers.ValidationError('Invalid cursor.')
+
+
 class UniversitySerializer(serializers.Serializer):
     """
     Serializer for formatting individual university data.
@@ -200,14 +286,69 @@ class CountryUniversitiesSerializer(serializers.Serializer):
             'universities':universities
         }
     
-class BoredQuerySerializer(serializers.Serializer):
-    type = serializers.CharField(required=True, min_length=1)
-    
+class BoredQuerySerializer(QuerySerializer):
+    """
+    Serializer for validating the query parameters of the bored endpoint.
+
+    Filters are applied server-side (see api/services/activity_catalog.py), and
+    validated_data matches the keyword arguments of find_activities().
+
+    Fields:
+        - type (str, required): One activity type, or several separated by
+          commas (e.g. 'education,music'); validated to the list 'types'
+        - participants (int, optional): Exact number of participants; sets both
+          bounds of the participants range
+        - min_participants, max_participants (int, optional): Participants range
+        - min_price, max_price (float, optional, 0-1): Price range
+        - accessibility (str, optional): Accessibility label, e.g.
+          'Few to no challenges' (case-insensitive)
+        - limit (int, optional, 1-1000): Maximum activities returned
+        - sample (int, optional, 1-100): Number of matches returned at random
+    """
+    type = serializers.CharField(required=True, min_length=1, source='types')
+    participants = serializers.IntegerField(required=False, min_value=1)
+    min_participants = serializers.IntegerField(required=False, min_value=1)
+    max_participants = serializers.IntegerField(required=False, min_value=1)
+    min_price = serializers.FloatField(required=False, min_value=0, max_value=1)
+    max_price = serializers.FloatField(required=False, min_value=0, max_value=1)
+    accessibility = serializers.CharField(required=False, min_length=1)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=1000)
+    sample = serializers.IntegerField(required=False, min_value=1, max_value=100)
+
+    def validate_type(self, value):
+        types = [activity_type.strip() for activity_type in value.split(',') if activity_type.strip()]
+        if not types:
+            raise serializers.ValidationError('At least one activity type is required.')
+        return types
+
+    def validate(self, attrs):
+        participants = attrs.pop('participants', None)
+        if participants is not None:
+            if 'min_participants' in attrs or 'max_participants' in attrs:
+                raise serializers.ValidationError('Use either participants or min_participants/max_participants.')
+            attrs['min_participants'] = attrs['max_participants'] = participants
+        if attrs.get('min_participants', 0) > attrs.get('max_participants', float('inf')):
+            raise serializers.ValidationError('min_participants cannot exceed max_participants.')
+        if attrs.get('min_price', 0) > attrs.get('max_price', 1):
+            raise serializers.ValidationError('min_price cannot exceed max_price.')
+        return attrs
+
+
 class BoredSerialier(serializers.Serializer):
     activity = serializers.CharField()
     type = serializers.CharField()
     participants = serializers.IntegerField()
 
+class QuotesQuerySerializer(QuerySerializer):
+    """
+    Serializer for validating the query parameters of the quotes endpoint.
+
+    Fields:
+        - count (int, optional, 1-50): Number of distinct quotes returned (default 1)
+    """
+    count = serializers.IntegerField(required=False, default=1, min_value=1, max_value=50)
+
+
 class QuotesSerializer(serializers.Serializer):
     quote = serializers.CharField()
     author = serializers.CharField()
@@ -220,4 +361,66 @@ class QuotesSerializer(serializers.Serializer):
         return {
             'quote':quote,
             'author':author
-        }
\ No newline at end of file
+        }
+
+
+class CacheInvalidateQuerySerializer(QuerySerializer):
+    """
+    Serializer for validating cache invalidation query parameters.
+
+    Fields:
+        - country (str, optional): Country whose cached entries are removed;
+          when omitted the caches are cleared entirely
+        - cache (str, optional): Restrict invalidation to one named cache
+          (e.g. 'country_data' or 'country_universities_api')
+    """
+    country = serializers.CharField(required=False, min_length=1)
+    cache = serializers.CharField(required=False, min_length=1)
+
+
+class BatchItemSerializer(serializers.Serializer):
+    """
+    Serializer for validating one sub-request of a batch.
+
+    Fields:
+        - endpoint (str, required): Name of the endpoint to call, as in its URL
+          (e.g. 'country', 'universities/pro')
+        - params (dict, optional): Query parameters of the sub-request; they are
+          validated later with the endpoint's own query serializer
+    """
+    endpoint = serializers.ChoiceField(choices=[
+        'dog', 'cat', 'joke', 'advice', 'age', 'country',
+        'universities', 'universities/pro', 'bored', 'quotes',
+    ])
+    params = serializers.DictField(required=False, default=dict)
+
+
+class BatchRequestSerializer(QuerySerializer):
+    """
+    Serializer for validating the body of a batch request.
+
+    Fields:
+        - requests (list, required): Sub-requests validated by BatchItemSerializer;
+          at most API_BATCH['MAX_ITEMS'] entries
+        - timeout (float, optional): Global deadline in seconds for the batch
+
+    Usage:
+        serializer = BatchRequestSerializer(data={
+            'requests': [
+                {'endpoint': 'country', 'params': {'name': 'Nigeria'}},
+                {'endpoint': 'joke'},
+            ],
+            'timeout': 3,
+        })
+        serializer.is_valid(raise_exception=True)
+    """
+    requests = BatchItemSerializer(many=True, allow_empty=False)
+    timeout = serializers.FloatField(required=False, min_value=0.1, max_value=30)
+
+    def validate_requests(self, value):
+        from .batch import get_config
+
+        max_items = get_config()['MAX_ITEMS']
+        if len(value) > max_items:
+            raise serializers.ValidationError(f'Ensure this field has no more than {max_items} elements.')
+        return value
@@ -0,0 +1,232 @@
+"""
+Activity Catalog Service Module
+
+This module answers /api/bored/ queries from an in-memory catalog of Bored API
+activities instead of the network. The catalog is loaded from a local snapshot
+written by the snapshot_activities management command to the file named by the
+API_ACTIVITY_DATASET setting (gzip-compressed JSON). Without a snapshot,
+api/services/bored_api.py builds a catalog from the live per-type results.
+
+The catalog keeps each activity once, plus:
+    - A type index: type -> record positions, O(1) per requested type
+    - A participants index: participant count -> record positions, with the
+      counts sorted so a participants range is found by bisect
+    - Type, participants, price and accessibility columns for the remaining
+      filters
+
+Records keep the Bored API shape, so callers cannot tell whether a result came
+from the catalog or from the live API.
+
+Like the country index (see api/services/country_index.py), the catalog is
+rebuilt when the snapshot file's modification time changes, checked every
+RELOAD_CHECK_SECONDS.
+"""
+
+import gzip
+import json
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+
+from .cache import normalize_key
+from .country_index import RELOAD_CHECK_SECONDS, snapshot_mtime
+
+logger = logging.getLogger(__name__)
+
+# Every activity type of the Bored API; the snapshot fetches each of them
+ACTIVITY_TYPES = ['education', 'recreational', 'social', 'diy', 'charity', 'cooking', 'relaxation', 'music', 'busywork']
+
+# Fields kept in the snapshot
+SNAPSHOT_FIELDS = ['key', 'activity', 'type', 'participants', 'price', 'accessibility', 'availability', 'duration', 'kidFriendly', 'link']
+
+
+class ActivityCatalog:
+    """
+    In-memory index over a list of Bored API activities.
+
+    Args:
+        records (list): Activity records in Bored API shape.
+
+    Usage:
+        catalog = ActivityCatalog(records)
+        catalog.find(['education', 'music'], min_participants=2, limit=5)
+        catalog.find(['social'], max_price=0.2, sample=1)
+    """
+
+    def __init__(self, records):
+        self.records = records
+        self.by_type = {}
+        self.by_participants = {}
+        self.types = []
+        self.participants = []
+        self.prices = []
+        self.accessibility = []
+
+        for position, record in enumerate(records):
+            activity_type = normalize_key(str(record.get('type', '')))
+            participants = int(record.get('participants') or 0)
+            self.by_type.setdefault(activity_type, []).append(position)
+            self.by_participants.setdefault(participants, []).append(position)
+            self.types.append(activity_type)
+            self.participants.append(participants)
+            self.prices.append(float(record.get('price') or 0))
+            self.accessibility.append(normalize_key(str(record.get('accessibility', ''))))
+
+        self.participant_counts = sorted(self.by_participants)
+        self.queries = 0
+
+    def _type_positions(self, types):
+        lists = [self.by_type.get(normalize_key(activity_type), []) for activity_type in types]
+        if len(lists) == 1:
+            return lists[0]
+        return sorted(set().union(*lists))
+
+    def _participant_positions(self, low, high):
+        start = 0 if low is None else bisect_left(self.participant_counts, low)
+        stop = len(self.participant_counts) if high is None else bisect_right(self.participant_counts, high)
+        return sorted(
+            position
+            for count in self.participant_counts[start:stop]
+            for position in self.by_participants[count]
+        )
+
+    def find(self, types, min_participants=None, max_participants=None, min_price=None, max_price=None,
+             accessibility=None, limit=None, sample=None):
+        """
+        Finds the activities matching every given filter.
+
+        Args:
+            types (list): Activity types; an activity matches any of them.
+            min_participants (int, optional): Fewest participants.
+            max_participants (int, optional): Most participants.
+            min_price (float, optional): Lowest price (0-1).
+            max_price (float, optional): Highest price (0-1).
+            accessibility (str, optional): Accessibility label, compared
+                case-insensitively (e.g. 'Few to no challenges').
+            limit (int, optional): Return at most this many activities.
+            sample (int, optional): Return this many matches picked at random
+                instead of the first ones.
+
+        Returns:
+            list: Matching records in catalog order (random order when sampled).
+        """
+        self.queries += 1
+        positions = self._type_positions(types)
+        ranged = min_participants is not None or max_participants is not None
+        if ranged:
+            by_participants = self._participant_positions(min_participants, max_participants)
+            if len(by_participants) < len(positions):
+                # Drive the scan with the smaller index; types are checked below.
+                wanted = {normalize_key(activity_type) for activity_type in types}
+                positions = [position for position in by_participants if self.types[position] in wanted]
+                ranged = False
+
+        wanted_accessibility = normalize_key(accessibility) if accessibility is not None else None
+        low = min_participants if min_participants is not None else float('-inf')
+        high = max_participants if max_participants is not None else float('inf')
+        stop_at = limit if sample is None else None
+
+        matches = []
+        for position in positions:
+            if ranged and not low <= self.participants[position] <= high:
+                continue
+            if min_price is not None and self.prices[position] < min_price:
+                continue
+            if max_price is not None and self.prices[position] > max_price:
+                continue
+            if wanted_accessibility is not None and self.accessibility[position] != wanted_accessibility:
+                continue
+            matches.append(position)
+            if stop_at is not None and len(matches) >= stop_at:
+                break
+
+        if sample is not None:
+            matches = random.sample(matches, min(sample, limit or sample, len(matches)))
+        return [self.records[position] for position in matches]
+
+    def stats(self):
+        return {
+            'loaded': True,
+            'size': len(self.records),
+            'types': len(self.by_type),
+            'queries': self.queries,
+        }
+
+
+_catalog = None
+# Modification time of the snapshot behind _catalog (None: no file) and when
+# it was last compared with the file's
+_catalog_mtime = None
+_catalog_checked = 0.0
+_catalog_lock = threading.Lock()
+
+
+def load_snapshot(path):
+    """
+    Reads a snapshot file written by the snapshot_activities command.
+
+    Args:
+        path (str or Path): Path of the gzip-compressed JSON snapshot.
+
+    Returns:
+        list: The activity records.
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as snapshot:
+        return json.load(snapshot)['activities']
+
+
+def get_catalog():
+    """
+    Returns the process-wide ActivityCatalog, loading the snapshot on first
+    use and again when the file changed (checked every RELOAD_CHECK_SECONDS).
+
+    Returns:
+        ActivityCatalog or None: None when no snapshot is configured or
+        readable, in which case queries go to the live API.
+    """
+    global _catalog, _catalog_mtime, _catalog_checked
+    catalog = _catalog
+    now = time.monotonic()
+    if catalog is None or now - _catalog_checked >= RELOAD_CHECK_SECONDS:
+        with _catalog_lock:
+            if _catalog is None or now - _catalog_checked >= RELOAD_CHECK_SECONDS:
+                path = getattr(settings, 'API_ACTIVITY_DATASET', None)
+                mtime = snapshot_mtime(path)
+                if _catalog is None or mtime != _catalog_mtime:
+                    records = []
+                    if mtime is not None:
+                        try:
+                            records = load_snapshot(path)
+                        except (OSError, ValueError, KeyError):
+                            logger.warning('Activity snapshot %s is not readable; using live lookups', path)
+                    elif path:
+                        logger.warning('Activity snapshot %s is not available; using live lookups', path)
+                    _catalog = ActivityCatalog(records)
+                    _catalog_mtime = mtime
+                _catalog_checked = now
+            catalog = _catalog
+    return catalog if catalog.records else None
+
+
+def reset_catalog():
+    """
+    Drops the loaded catalog so the next query reloads the snapshot.
+    """
+    global _catalog
+    with _catalog_lock:
+        _catalog = None
+
+
+def stats():
+    """
+    Returns catalog statistics, or {'loaded': False} before the first query or
+    when no snapshot is available.
+    """
+    catalog = _catalog
+    if catalog is None or not catalog.records:
+        return {'loaded': False}
+    return catalog.stats()
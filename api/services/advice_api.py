@@ -5,11 +5,14 @@ This module provides functionality to fetch random life advice from the Advice S
 It serves as an integration point for retrieving daily wisdom and motivational quotes.
 """
 
-import requests
+from . import http_client
+from .metrics import instrumented
+from .prefetch import get_buffer
 
 # Advice Slip API endpoint for fetching random advice
 URL = 'https://api.adviceslip.com/advice'
 
+@instrumented
 def advice_api():
     """
     Fetches random life advice from the Advice Slip API.
@@ -30,6 +33,20 @@ def advice_api():
         >>> advice = advice_api()
         >>> print(advice['slip']['advice'])
     """
-    response = requests.get(url=URL, timeout=5)
-    response.raise_for_status()
-    return response.json()
\ No newline at end of file
+    response = http_client.get(URL)
+    return response.json()
+
+
+# Pre-fetched items served by the views (see api/services/prefetch.py)
+advice_buffer = get_buffer('advice_api', advice_api)
+
+
+@instrumented
+async def advice_api_async():
+    """
+    Async counterpart of advice_api() used by the ASGI views.
+
+    Returns:
+        dict: A dictionary containing advice data under the 'slip' key.
+    """
+    return await http_client.aget_json(URL)
@@ -3,39 +3,200 @@ Age Prediction API Service Module
 
 This module provides functionality to predict a person's age based on their name.
 It uses the Agify.io API to estimate age demographics for given names.
+
+Predictions are cached per name (see api/services/cache.py). Bulk lookups
+dedupe the names, serve known ones from the cache and fetch the rest with
+Agify's multi-name query, MAX_NAMES_PER_REQUEST names per HTTP request.
+
+A bulk lookup can need more upstream requests than Agify's rate limit and the
+request deadline allow. Once a request fails, the remaining names are not
+fetched and are answered as unavailable, so the names already fetched are
+still returned. Names a multi-name reply has no record for are answered as
+unavailable as well.
 """
 
+import asyncio
+
 import requests
 
+from . import http_client
+from .metrics import instrumented
+from .cache import get_cache, normalize_key
+
 # Agify.io API endpoint for predicting age based on name
 URL = 'https://api.agify.io/'
 
+# Largest number of name[] parameters Agify accepts in one request
+MAX_NAMES_PER_REQUEST = 10
+
+cache = get_cache('age_prediction_api')
+
+
+class InvalidReply(requests.exceptions.RequestException):
+    """
+    Raised when a multi-name reply holds no usable record for the names asked.
+    """
+
+
+@instrumented
 def age_prediction_api(name):
     """
     Predicts the age of a person based on their name using the Agify.io API.
-    
+
     This function makes an HTTP GET request to the Agify.io API with a given name
     and returns the predicted age based on statistical analysis of the name.
-    
+    Predictions are served from the 'age_prediction_api' cache when available.
+
     Args:
         name (str): The person's name for which to predict the age.
-    
+
     Returns:
         dict: A dictionary containing age prediction data with keys:
               - 'name': The name provided (str)
               - 'age': The predicted age (int or None if prediction unavailable)
               - 'count': The count of data points used for prediction (int)
-    
+
     Raises:
         requests.exceptions.RequestException: If the HTTP request fails or times out.
         json.JSONDecodeError: If the response is not valid JSON.
-    
+
     Example:
         >>> prediction = age_prediction_api('Michael')
         >>> print(f"Predicted age for Michael: {prediction['age']}")
     """
-    params = {'name':name}
+    prediction = cache.get_or_load(name, lambda: _fetch(name))
+    return dict(prediction, name=name)
+
+
+@instrumented
+async def age_prediction_api_async(name):
+    """
+    Async counterpart of age_prediction_api() used by the ASGI views.
+
+    Args:
+        name (str): The person's name for which to predict the age.
+
+    Returns:
+        dict: A dictionary with 'name', 'age' and 'count'.
+    """
+    prediction = await cache.aget_or_load(name, lambda: _fetch_async(name))
+    return dict(prediction, name=name)
+
+
+@instrumented
+def age_prediction_bulk(names):
+    """
+    Predicts the ages of many names with as few HTTP requests as possible.
+
+    Names are deduplicated case- and whitespace-insensitively, known names are
+    served from the cache, and the remaining ones are fetched in chunks of
+    MAX_NAMES_PER_REQUEST using Agify's name[] query. Repeat names cost no
+    request at all.
 
-    response = requests.get(url=URL, params=params, timeout=5)
-    response.raise_for_status()
+    Args:
+        names (list): Names to predict; duplicates are allowed.
+
+    Returns:
+        list: One prediction dict ('name', 'age', 'count') per distinct name,
+              in first-seen order, with 'name' as first given. Names that
+              could not be fetched get {'name': name, 'unavailable': True}.
+
+    Raises:
+        requests.exceptions.RequestException: If an upstream request fails
+            and no name could be answered at all.
+
+    Example:
+        >>> predictions = age_prediction_bulk(['Michael', 'Amina', 'michael'])
+        >>> [p['name'] for p in predictions]
+        ['Michael', 'Amina']
+    """
+    unique, known, missing = _partition(names)
+    for start in range(0, len(missing), MAX_NAMES_PER_REQUEST):
+        chunk = missing[start:start + MAX_NAMES_PER_REQUEST]
+        try:
+            _store(chunk, _fetch_many(chunk), known)
+        except requests.exceptions.RequestException:
+            # Later chunks would run into the same rate limit or deadline.
+            if not known:
+                raise
+            break
+    return _results(unique, known)
+
+
+@instrumented
+async def age_prediction_bulk_async(names):
+    """
+    Async counterpart of age_prediction_bulk(); chunks are fetched one after
+    another to stay within Agify's rate limit. Cache lookups and writes run in
+    a worker thread, as the shared tier blocks on SQLite.
+    """
+    unique, known, missing = await asyncio.to_thread(_partition, names)
+    for start in range(0, len(missing), MAX_NAMES_PER_REQUEST):
+        chunk = missing[start:start + MAX_NAMES_PER_REQUEST]
+        try:
+            predictions = await _fetch_many_async(chunk)
+            await asyncio.to_thread(_store, chunk, predictions, known)
+        except requests.exceptions.RequestException:
+            if not known:
+                raise
+            break
+    return _results(unique, known)
+
+
+def _partition(names):
+    unique = {}
+    for name in names:
+        unique.setdefault(normalize_key(name), name)
+
+    known = {}
+    missing = []
+    for key, name in unique.items():
+        prediction = cache.get(key)
+        if prediction is None:
+            missing.append(name)
+        else:
+            known[key] = prediction
+    return unique, known, missing
+
+
+def _results(unique, known):
+    return [
+        dict(known[key], name=name) if key in known else {'name': name, 'unavailable': True}
+        for key, name in unique.items()
+    ]
+
+
+def _store(chunk, predictions, known):
+    # Agify answers a multi-name query with one record per name, in request
+    # order. A reply of another length is matched by name instead, so no
+    # prediction lands on the wrong name; names without a record stay unknown.
+    if not isinstance(predictions, list) or not all(isinstance(prediction, dict) for prediction in predictions):
+        raise InvalidReply(f'Unexpected Agify reply for {len(chunk)} names')
+    if len(predictions) == len(chunk):
+        pairs = list(zip(chunk, predictions))
+    else:
+        by_name = {normalize_key(str(prediction.get('name', ''))): prediction for prediction in predictions}
+        pairs = [(name, by_name[normalize_key(name)]) for name in chunk if normalize_key(name) in by_name]
+        if not pairs:
+            raise InvalidReply(f'Agify returned {len(predictions)} records for {len(chunk)} names')
+    for name, prediction in pairs:
+        cache.set(name, prediction)
+        known[normalize_key(name)] = prediction
+
+
+def _fetch(name):
+    response = http_client.get(URL, params={'name':name})
     return response.json()
+
+
+async def _fetch_async(name):
+    return await http_client.aget_json(URL, params={'name':name})
+
+
+def _fetch_many(names):
+    response = http_client.get(URL, params=[('name[]', name) for name in names])
+    return response.json()
+
+
+async def _fetch_many_async(names):
+    return await http_client.aget_json(URL, params=[('name[]', name) for name in names])
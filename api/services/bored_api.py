@@ -1,10 +1,108 @@
+"""
+Bored API Service Module
+
+This module finds activities from the Bored API (bored-api.appbrewery.com).
+
+Queries are answered from the local activity catalog when a snapshot is loaded
+(see api/services/activity_catalog.py). Without one, each requested type is
+fetched live from /filter, kept in the 'bored_api' cache and filtered in memory
+the same way, so both paths return the same activities. A live reply that is
+not a list of activity records raises InvalidReply and is not cached.
+"""
+
+import asyncio
+
 import requests
 
+from . import http_client
+from .metrics import instrumented
+from . import activity_catalog
+from .cache import get_cache, normalize_key
+
 
 URL = 'https://bored-api.appbrewery.com/filter'
 
+cache = get_cache('bored_api', maxsize=64, ttl=60 * 60)
+
 
+class InvalidReply(requests.exceptions.RequestException):
+    """
+    Raised when the Bored API answers with something other than a list of
+    activity records.
+    """
+
+
+def check_reply(records):
+    """
+    Returns a /filter reply after checking that it is a list of records.
+
+    Raises:
+        InvalidReply: If records is not a list of dicts.
+    """
+    if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        raise InvalidReply(f'Unexpected Bored API reply of type {type(records).__name__}')
+    return records
+
+
+@instrumented
 def bored_api(activity_type):
-    response = requests.get(URL, timeout=5, params={'type':activity_type})
-    response.raise_for_status()
-    return response.json()
\ No newline at end of file
+    response = http_client.get(URL, params={'type':activity_type})
+    return check_reply(response.json())
+
+
+@instrumented
+async def bored_api_async(activity_type):
+    return check_reply(await http_client.aget_json(URL, params={'type':activity_type}))
+
+
+@instrumented
+def find_activities(types, **filters):
+    """
+    Finds activities of the given types matching the filters.
+
+    Args:
+        types (list): Activity types (e.g. ['education', 'music']).
+        **filters: Keyword filters of ActivityCatalog.find (min_participants,
+            max_participants, min_price, max_price, accessibility, limit, sample).
+
+    Returns:
+        list: Activity records in Bored API shape.
+
+    Raises:
+        requests.exceptions.RequestException: If no snapshot is loaded and the
+            live request of a type fails (including unknown types, which the
+            upstream answers with 404); InvalidReply if its reply is not a
+            list of records.
+
+    Example:
+        >>> find_activities(['education'], max_participants=1, sample=1)
+        [{'activity': 'Learn Express.js', 'type': 'education', 'participants': 1, ...}]
+    """
+    catalog = activity_catalog.get_catalog()
+    if catalog is None:
+        records = [
+            cache.get_or_load(activity_type, lambda activity_type=activity_type: bored_api(activity_type))
+            for activity_type in _unique(types)
+        ]
+        catalog = activity_catalog.ActivityCatalog([record for result in records for record in result])
+    return catalog.find(types, **filters)
+
+
+@instrumented
+async def find_activities_async(types, **filters):
+    """
+    Async counterpart of find_activities() used by the ASGI views; live types
+    are fetched concurrently.
+    """
+    catalog = activity_catalog.get_catalog()
+    if catalog is None:
+        records = await asyncio.gather(*(
+            cache.aget_or_load(activity_type, lambda activity_type=activity_type: bored_api_async(activity_type))
+            for activity_type in _unique(types)
+        ))
+        catalog = activity_catalog.ActivityCatalog([record for result in records for record in result])
+    return catalog.find(types, **filters)
+
+
+def _unique(types):
+    return list(dict.fromkeys(normalize_key(activity_type) for activity_type in types))
@@ -0,0 +1,476 @@
+"""
+Response Cache Service Module
+
+This module provides a bounded, thread-safe in-process cache with LRU eviction
+and a per-cache time-to-live. It sits in front of upstream services whose data
+rarely changes (country details, university lists) so that repeated lookups for
+the same key are answered from memory instead of the network. Concurrent misses
+for the same key are coalesced into one load (see api/services/single_flight.py).
+
+Expired values are kept aside (up to MAXSIZE of them) so that a load rejected
+by a rate limit with the 'stale' policy (see api/services/rate_limit.py) is
+answered with the last known value instead of an error.
+
+Caches with SHARED on have two tiers: the in-process LRU is a small hot tier
+in front of the node-local shared tier that every worker reads and writes (see
+api/services/shared_cache.py). Loaded values are written to both tiers; a
+value found in the shared tier is promoted into the hot tier, and entries
+evicted or expired from the hot tier remain available in the shared one. Hot
+entries live at most HOT_TTL seconds, so an invalidation reaches the other
+workers within HOT_TTL.
+
+Services register a refresher with each cache that can reload an entry from
+its key alone. The warm-up and the refresh-ahead scheduler (see
+api/services/warmup.py) use it, with the per-key demand each cache counts, to
+load the most requested keys before traffic arrives and to reload them shortly
+before they expire.
+
+Caches are registered by name and configured through the API_CACHES setting:
+    API_CACHES = {
+        'country_data': {'MAXSIZE': 256, 'TTL': 86400, 'SHARED': True, 'HOT_TTL': 300},
+    }
+"""
+
+import asyncio
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+
+from . import shared_cache
+from .single_flight import SingleFlight
+
+DEFAULT_MAXSIZE = 256
+DEFAULT_TTL = 3600
+
+# Separates a key from its variant (see variant_key)
+VARIANT_SEPARATOR = '|'
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def normalize_key(key):
+    """
+    Normalizes a lookup key so that equivalent spellings share one cache entry.
+
+    Surrounding whitespace is stripped, inner runs of whitespace are collapsed
+    and the result is case-folded, so 'france', 'France ' and 'FRANCE' all map
+    to 'france'.
+
+    Args:
+        key (str): The raw lookup key (e.g. a country name from a query string).
+
+    Returns:
+        str: The normalized key.
+    """
+    return ' '.join(str(key).split()).casefold()
+
+
+def variant_key(key, variant):
+    """
+    Returns the key of one variant of an entry, e.g. a country fetched with a
+    particular set of fields. Invalidating the plain key also removes all of
+    its variants.
+
+    Example:
+        >>> variant_key('France ', 'area,name')
+        'france|area,name'
+    """
+    return f'{normalize_key(key)}{VARIANT_SEPARATOR}{variant}'
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries expire after a fixed time-to-live.
+
+    All operations are O(1) and guarded by a lock, so one instance can be shared
+    by every thread of a worker process.
+
+    Args:
+        name (str): Cache name used in statistics.
+        maxsize (int): Maximum number of entries kept; the least recently used
+            entry is evicted when the cache is full.
+        ttl (float): Seconds an entry stays valid after it was stored.
+        shared (shared_cache.SharedTier, optional): Node-local second tier.
+        hot_ttl (float, optional): Longest time an entry stays in the
+            in-process tier; defaults to ttl.
+
+    Usage:
+        cache = TTLCache('country_data', maxsize=256, ttl=86400)
+        data = cache.get_or_load('France', lambda: fetch_country('France'))
+
+        @cache.refresher
+        def refresh(key):
+            return fetch_country(key)
+    """
+
+    def __init__(self, name, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL, shared=None, hot_ttl=None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.shared = shared
+        self.hot_ttl = ttl if hot_ttl is None else min(hot_ttl, ttl)
+        self._data = OrderedDict()
+        self._stale = OrderedDict()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight(name)
+        self._refresh = None
+        self._demand = Counter()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_served = 0
+        self.refreshes = 0
+
+    def _lookup(self, key, now):
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+        hot_until, value, _ = entry
+        if hot_until <= now:
+            del self._data[key]
+            self.expirations += 1
+            self._stale[key] = value
+            self._stale.move_to_end(key)
+            if len(self._stale) > self.maxsize:
+                self._stale.popitem(last=False)
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    def _counted_lookup(self, key):
+        found, value = self._hot_lookup(key)
+        if found or self.shared is None:
+            return found, value
+        return self._promote(key)
+
+    def _hot_lookup(self, key):
+        # Looks key up in the in-process tier only, counting the lookup.
+        with self._lock:
+            found, value = self._lookup(key, time.monotonic())
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self._demand[key] += 1
+            if len(self._demand) > 2 * self.maxsize:
+                # Keep the counts of the most requested half only.
+                self._demand = Counter(dict(self._demand.most_common(self.maxsize)))
+        return found, value
+
+    def _promote(self, key):
+        # Copies the shared tier's entry into the in-process tier.
+        found, value, left = self.shared.get(key)
+        if found:
+            self._store(key, value, left)
+        return found, value
+
+    def _store(self, key, value, ttl):
+        # Stores into the in-process tier only; the shared copy is untouched.
+        # Entries are (end of the in-process copy, value, end of the entry).
+        now = time.monotonic()
+        with self._lock:
+            self._stale.pop(key, None)
+            self._data[key] = (now + min(ttl, self.hot_ttl), value, now + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value for key, or default on a miss or expired entry.
+        """
+        found, value = self._counted_lookup(normalize_key(key))
+        return value if found else default
+
+    def set(self, key, value):
+        """
+        Stores value under key in every tier, evicting the least recently used
+        in-process entry if full.
+        """
+        key = normalize_key(key)
+        self._store(key, value, self.ttl)
+        if self.shared is not None:
+            self.shared.set(key, value, self.ttl)
+
+    async def _aset(self, key, value):
+        # set() for the event loop; key is already normalized.
+        self._store(key, value, self.ttl)
+        if self.shared is not None:
+            await asyncio.to_thread(self.shared.set, key, value, self.ttl)
+
+    def get_or_load(self, key, loader):
+        """
+        Returns the cached value for key, calling loader() to fill it on a miss.
+
+        Exceptions raised by loader are propagated and nothing is cached, so a
+        failed upstream call is retried on the next request. Exceptions with a
+        true serve_stale attribute (rate_limit.RateLimited under the 'stale'
+        policy) return the expired value instead, when there is one. Threads
+        missing the same key at the same time share one loader() call and its
+        outcome.
+
+        Args:
+            key (str): Lookup key; normalized before use.
+            loader (callable): Zero-argument function that fetches the value.
+
+        Returns:
+            The cached or freshly loaded value.
+        """
+        key = normalize_key(key)
+        found, value = self._counted_lookup(key)
+        if found:
+            return value
+        return self._flight.do(key, lambda: self._load(key, loader))
+
+    async def aget_or_load(self, key, loader):
+        """
+        Async counterpart of get_or_load(); loader returns an awaitable.
+        Coroutines missing the same key share one load. Shared tier reads and
+        writes (SQLite, decoding) run in a worker thread, off the event loop.
+        """
+        key = normalize_key(key)
+        found, value = self._hot_lookup(key)
+        if not found and self.shared is not None:
+            found, value = await asyncio.to_thread(self._promote, key)
+        if found:
+            return value
+        return await self._flight.ado(key, lambda: self._aload(key, loader))
+
+    def _fresh(self, key):
+        # A load that finished between our miss and joining the flight has
+        # already filled the entry; don't fetch it a second time.
+        with self._lock:
+            return self._lookup(key, time.monotonic())
+
+    def _stale_value(self, key, exc):
+        if not getattr(exc, 'serve_stale', False):
+            return False, None
+        with self._lock:
+            if key not in self._stale:
+                return False, None
+            self.stale_served += 1
+            return True, self._stale[key]
+
+    def _load(self, key, loader):
+        found, value = self._fresh(key)
+        if not found:
+            try:
+                value = loader()
+            except Exception as exc:
+                found, value = self._stale_value(key, exc)
+                if not found:
+                    raise
+                return value
+            self.set(key, value)
+        return value
+
+    async def _aload(self, key, loader):
+        found, value = self._fresh(key)
+        if not found:
+            try:
+                value = await loader()
+            except Exception as exc:
+                found, value = self._stale_value(key, exc)
+                if not found:
+                    raise
+                return value
+            await self._aset(key, value)
+        return value
+
+    def refresher(self, fn):
+        """
+        Registers fn(key) as the function that reloads an entry from its
+        normalized key, bypassing the cache; usable as a decorator.
+        """
+        self._refresh = fn
+        return fn
+
+    @property
+    def refreshable(self):
+        return self._refresh is not None
+
+    def take_demand(self):
+        """
+        Returns the lookups per key since the previous call and starts a new
+        count.
+
+        Returns:
+            Counter: Normalized key to number of lookups (hits and misses).
+        """
+        with self._lock:
+            demand, self._demand = self._demand, Counter()
+        return demand
+
+    def _time_left(self, key, ahead):
+        # Seconds until key expires in any tier. A shared copy that outlives
+        # ahead is promoted, so the in-process tier stays warm as well.
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            left = entry[2] - now if entry is not None and entry[0] > now else 0.0
+        if left > ahead or self.shared is None:
+            return left
+        found, value, shared_left = self.shared.get(key)
+        if found and shared_left > ahead:
+            self._store(key, value, shared_left)
+            return shared_left
+        return left
+
+    def _reload(self, key):
+        value = self._refresh(key)
+        self.set(key, value)
+        with self._lock:
+            self.refreshes += 1
+        return value
+
+    def warm(self, key, ahead=0.0):
+        """
+        Makes sure key stays cached for at least ahead more seconds, reloading
+        it through the refresher otherwise. A request missing the key at the
+        same time shares the reload.
+
+        Args:
+            key (str): Lookup key; normalized before use.
+            ahead (float): Seconds the entry must still be valid for.
+
+        Returns:
+            bool: True if the entry was reloaded, False if it was fresh enough.
+
+        Raises:
+            ValueError: If no refresher is registered.
+            Exception: Whatever the refresher raises; nothing is cached then.
+        """
+        if self._refresh is None:
+            raise ValueError(f'Cache {self.name!r} has no refresher')
+        key = normalize_key(key)
+        if self._time_left(key, ahead) > ahead:
+            return False
+        self._flight.do(key, lambda: self._reload(key))
+        return True
+
+    def invalidate(self, key):
+        """
+        Removes one entry and its variants from every tier. Returns True if
+        any of them was cached in this process.
+        """
+        key = normalize_key(key)
+        prefix = key + VARIANT_SEPARATOR
+        if self.shared is not None:
+            self.shared.delete(key)
+        with self._lock:
+            keys = [cached for cached in self._data if cached == key or cached.startswith(prefix)]
+            for stale in [cached for cached in self._stale if cached == key or cached.startswith(prefix)]:
+                del self._stale[stale]
+            for cached in keys:
+                del self._data[cached]
+            return bool(keys)
+
+    def clear(self):
+        """
+        Removes every entry from every tier. Counters are kept.
+        """
+        if self.shared is not None:
+            self.shared.clear()
+        with self._lock:
+            self._data.clear()
+            self._stale.clear()
+
+    def stats(self):
+        """
+        Returns a snapshot of the cache counters.
+
+        Returns:
+            dict: Keys 'name', 'size', 'maxsize', 'ttl', 'hits', 'misses',
+                  'evictions', 'expirations', 'stale_served' (expired values
+                  returned under a rate limit), 'refreshes' (reloads by the
+                  warm-up and refresh-ahead), 'hit_ratio' and 'loads' (the
+                  single-flight counters, see SingleFlight.stats) for the
+                  in-process tier, and 'shared' (see SharedTier.stats, None
+                  without a shared tier).
+        """
+        loads = self._flight.stats()
+        shared = self.shared.stats() if self.shared is not None else None
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'stale_served': self.stale_served,
+                'refreshes': self.refreshes,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'loads': loads,
+                'shared': shared,
+            }
+
+
+def get_cache(name, maxsize=None, ttl=None):
+    """
+    Returns the named cache, creating it from settings.API_CACHES on first use.
+
+    Args:
+        name (str): Cache name, conventionally the service function name.
+        maxsize (int, optional): Size used when API_CACHES has no MAXSIZE for
+            the name (default DEFAULT_MAXSIZE).
+        ttl (float, optional): TTL used when API_CACHES has no TTL for the
+            name (default DEFAULT_TTL).
+
+    Returns:
+        TTLCache: The shared cache instance for that name.
+    """
+    with _registry_lock:
+        cache = _registry.get(name)
+        if cache is None:
+            options = getattr(settings, 'API_CACHES', {}).get(name, {})
+            store = shared_cache.get_store() if options.get('SHARED') else None
+            cache = TTLCache(
+                name,
+                maxsize=options.get('MAXSIZE', maxsize or DEFAULT_MAXSIZE),
+                ttl=options.get('TTL', ttl or DEFAULT_TTL),
+                shared=shared_cache.SharedTier(store, name) if store is not None else None,
+                hot_ttl=options.get('HOT_TTL'),
+            )
+            _registry[name] = cache
+        return cache
+
+
+def all_caches():
+    """
+    Returns every registered cache.
+
+    Returns:
+        list: TTLCache instances in registration order.
+    """
+    with _registry_lock:
+        return list(_registry.values())
+
+
+def invalidate(key=None, name=None):
+    """
+    Invalidates cached entries across the registered caches.
+
+    Args:
+        key (str, optional): Entry to remove (e.g. a country name). When omitted,
+            the caches are cleared entirely.
+        name (str, optional): Restrict the operation to one named cache.
+
+    Returns:
+        int: Number of entries removed when key is given, otherwise the number
+             of caches cleared.
+    """
+    caches = [c for c in all_caches() if name is None or c.name == name]
+    if key is None:
+        for cache in caches:
+            cache.clear()
+        return len(caches)
+    return sum(1 for cache in caches if cache.invalidate(key))
@@ -5,11 +5,14 @@ This module provides functionality to fetch random cat images from The Cat API.
 It integrates with an external API service to retrieve cat photos with metadata.
 """
 
-import requests
+from . import http_client
+from .metrics import instrumented
+from .prefetch import get_buffer
 
 # The Cat API endpoint for searching and retrieving cat images
 URL = 'https://api.thecatapi.com/v1/images/search'
 
+@instrumented
 def cat_image():
     """
     Fetches a random cat image from The Cat API.
@@ -30,7 +33,21 @@ def cat_image():
         >>> print(images[0]['url'])
         'https://cdn2.thecatapi.com/images/...'
     """
-    response = requests.get(URL, timeout=5)
-    response.raise_for_status()
+    response = http_client.get(URL)
     data=response.json()
-    return data
\ No newline at end of file
+    return data
+
+
+# Pre-fetched items served by the views (see api/services/prefetch.py)
+cat_buffer = get_buffer('cat_image', cat_image)
+
+
+@instrumented
+async def cat_image_async():
+    """
+    Async counterpart of cat_image() used by the ASGI views.
+
+    Returns:
+        list: A list containing dictionaries with cat image data.
+    """
+    return await http_client.aget_json(URL)
@@ -0,0 +1,250 @@
+"""
+Circuit Breaker Service Module
+
+This module provides one circuit breaker per upstream host. When an upstream
+keeps failing or answering slowly, its breaker opens and calls to it fail
+immediately with CircuitOpenError instead of waiting for the full timeout, so
+the views return their usual 503 error bodies at once and no worker is tied up.
+
+States:
+    - closed: Calls pass through; outcomes are recorded in a sliding window
+    - open: Calls fail fast until OPEN_SECONDS have passed
+    - half_open: Up to HALF_OPEN_PROBES calls are let through; a success closes
+      the breaker, a failure opens it again
+
+Breakers are configured through the API_CIRCUIT_BREAKER setting:
+    - WINDOW (float): Sliding window length in seconds (default 30)
+    - MIN_CALLS (int): Calls needed in the window before the breaker may open (default 10)
+    - FAILURE_RATE (float): Failure ratio that opens the breaker (default 0.5)
+    - SLOW_CALL_SECONDS (float): Calls slower than this count as slow (default 3)
+    - SLOW_CALL_RATE (float): Slow-call ratio that opens the breaker (default 0.8)
+    - OPEN_SECONDS (float): Time spent open before probing (default 30)
+    - HALF_OPEN_PROBES (int): Concurrent probe calls while half-open (default 1)
+    - HOSTS (dict): Per-host overrides of the options above
+"""
+
+import threading
+import time
+from collections import deque
+
+import requests
+from django.conf import settings
+
+from .deadline import DeadlineExceeded
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+DEFAULTS = {
+    'WINDOW': 30,
+    'MIN_CALLS': 10,
+    'FAILURE_RATE': 0.5,
+    'SLOW_CALL_SECONDS': 3,
+    'SLOW_CALL_RATE': 0.8,
+    'OPEN_SECONDS': 30,
+    'HALF_OPEN_PROBES': 1,
+    'HOSTS': {},
+}
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """
+    Raised instead of calling an upstream whose breaker is open.
+
+    It subclasses requests.exceptions.ConnectionError so existing
+    'except RequestException' handlers turn it into the usual 503 response.
+    """
+
+
+def is_upstream_failure(exc):
+    """
+    Returns True when an exception means the upstream is unhealthy.
+
+    Connection errors, timeouts and 5xx responses count; 4xx responses (e.g. an
+    unknown country) are the caller's problem and do not. Neither does a call
+    cut short by the request's deadline (deadline.DeadlineExceeded).
+    """
+    if isinstance(exc, DeadlineExceeded):
+        return False
+    if isinstance(exc, requests.exceptions.HTTPError):
+        response = getattr(exc, 'response', None)
+        return response is None or response.status_code >= 500
+    return isinstance(exc, requests.exceptions.RequestException)
+
+
+class CircuitBreaker:
+    """
+    Failure-rate and slow-call-rate circuit breaker for one upstream host.
+
+    Usage:
+        breaker = CircuitBreaker('zenquotes.io')
+        breaker.before_call()              # raises CircuitOpenError when open
+        try:
+            response = do_request()
+        except requests.exceptions.RequestException as exc:
+            breaker.record(elapsed, failed=is_upstream_failure(exc))
+            raise
+        breaker.record(elapsed, failed=False)
+    """
+
+    def __init__(self, name, window=DEFAULTS['WINDOW'], min_calls=DEFAULTS['MIN_CALLS'],
+                 failure_rate=DEFAULTS['FAILURE_RATE'], slow_call_seconds=DEFAULTS['SLOW_CALL_SECONDS'],
+                 slow_call_rate=DEFAULTS['SLOW_CALL_RATE'], open_seconds=DEFAULTS['OPEN_SECONDS'],
+                 half_open_probes=DEFAULTS['HALF_OPEN_PROBES']):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self._lock = threading.Lock()
+        self._calls = deque()
+        self._opened_at = 0.0
+        self._probes = 0
+        self.rejected = 0
+        self.opened = 0
+
+    def _trim(self, now):
+        cutoff = now - self.window
+        while self._calls and self._calls[0][0] < cutoff:
+            self._calls.popleft()
+
+    def _open(self, now):
+        self.state = OPEN
+        self._opened_at = now
+        self._probes = 0
+        self.opened += 1
+
+    def before_call(self):
+        """
+        Admits or rejects a call.
+
+        Raises:
+            CircuitOpenError: If the breaker is open, or half-open with all
+                probe slots taken.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            now = time.monotonic()
+            if self.state == OPEN and now - self._opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+                self._probes = 0
+            if self.state == HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return
+            self.rejected += 1
+        raise CircuitOpenError(f'Circuit breaker for {self.name} is open')
+
+    def record(self, elapsed, failed):
+        """
+        Records the outcome of an admitted call.
+
+        Args:
+            elapsed (float): Call duration in seconds.
+            failed (bool): Whether the upstream failed (see is_upstream_failure).
+        """
+        now = time.monotonic()
+        slow = elapsed >= self.slow_call_seconds
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+                if failed or slow:
+                    self._open(now)
+                else:
+                    self.state = CLOSED
+                    self._calls.clear()
+                return
+            if self.state == OPEN:
+                return
+
+            self._calls.append((now, failed, slow))
+            self._trim(now)
+            total = len(self._calls)
+            if total < self.min_calls:
+                return
+            failures = sum(1 for _, f, _ in self._calls if f)
+            slow_calls = sum(1 for _, _, s in self._calls if s)
+            if failures / total >= self.failure_rate or slow_calls / total >= self.slow_call_rate:
+                self._open(now)
+
+    def release(self):
+        """
+        Frees the probe slot of an admitted call that was cancelled before it
+        produced an outcome.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+
+    def stats(self):
+        """
+        Returns a snapshot of the breaker state.
+
+        Returns:
+            dict: Keys 'name', 'state', 'calls', 'failures', 'slow_calls'
+                  (all within the window), 'opened' and 'rejected' (totals).
+        """
+        with self._lock:
+            self._trim(time.monotonic())
+            return {
+                'name': self.name,
+                'state': self.state,
+                'calls': len(self._calls),
+                'failures': sum(1 for _, f, _ in self._calls if f),
+                'slow_calls': sum(1 for _, _, s in self._calls if s),
+                'opened': self.opened,
+                'rejected': self.rejected,
+            }
+
+
+def get_breaker(host):
+    """
+    Returns the breaker of an upstream host, creating it from
+    settings.API_CIRCUIT_BREAKER on first use.
+
+    Args:
+        host (str): Upstream host name (e.g. 'zenquotes.io').
+
+    Returns:
+        CircuitBreaker: The shared breaker for that host.
+    """
+    breaker = _registry.get(host)
+    if breaker is not None:
+        return breaker
+    with _registry_lock:
+        breaker = _registry.get(host)
+        if breaker is None:
+            options = dict(DEFAULTS)
+            options.update(getattr(settings, 'API_CIRCUIT_BREAKER', {}))
+            options.update(options['HOSTS'].get(host, {}))
+            breaker = CircuitBreaker(
+                host,
+                window=options['WINDOW'],
+                min_calls=options['MIN_CALLS'],
+                failure_rate=options['FAILURE_RATE'],
+                slow_call_seconds=options['SLOW_CALL_SECONDS'],
+                slow_call_rate=options['SLOW_CALL_RATE'],
+                open_seconds=options['OPEN_SECONDS'],
+                half_open_probes=options['HALF_OPEN_PROBES'],
+            )
+            _registry[host] = breaker
+        return breaker
+
+
+def all_breakers():
+    """
+    Returns every registered breaker.
+
+    Returns:
+        list: CircuitBreaker instances in registration order.
+    """
+    with _registry_lock:
+        return list(_registry.values())
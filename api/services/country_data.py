@@ -4,26 +4,46 @@ Country Data API Service Module
 This module provides functionality to fetch detailed information about countries.
 It uses the REST Countries API to retrieve comprehensive country data including
 capital, population, region, flag emoji, and other geographical information.
+
+Lookups are answered from the local country snapshot when it has a match (see
+api/services/country_index.py). Misses go to the live API and are cached per
+country (see api/services/cache.py).
+
+Callers that only need some attributes pass their REST Countries field names;
+they are sent upstream as the fields filter, so only those attributes are
+transferred and decoded (a few hundred bytes instead of several KB per
+country). Each field set is cached as its own variant of the country's entry.
 """
 
-import requests
+from . import http_client
+from .metrics import instrumented
+from . import country_index
+from .cache import VARIANT_SEPARATOR, get_cache, variant_key
 
 # REST Countries API base URL for fetching country information by name
 BASE_URL = 'https://restcountries.com/v3.1/name/'
 
-def country_data(country):
+cache = get_cache('country_data')
+
+@instrumented
+def country_data(country, fields=None):
     """
     Fetches detailed information about a country from the REST Countries API.
     
     This function makes an HTTP GET request to the REST Countries API and retrieves
     comprehensive data about a specified country. The country name is used to search
-    and retrieve matching country records.
+    and retrieve matching country records. The local snapshot index is tried
+    first; names it does not know are fetched live and kept in the
+    'country_data' cache. Lookups are case- and whitespace-insensitive.
     
     Args:
         country (str): The name of the country to fetch data for (e.g., 'United States', 'France').
+        fields (list, optional): REST Countries fields to fetch (e.g.
+            ['name', 'capital', 'area']); all fields when omitted.
     
     Returns:
-        list: A list of dictionaries containing country data. Each dictionary includes keys such as:
+        list: A list of dictionaries containing country data, limited to fields
+              when given. Each dictionary includes keys such as:
               - 'name': Dictionary with common and official names (dict)
               - 'capital': List of capital cities (list)
               - 'population': Population count (int)
@@ -42,10 +62,55 @@ def country_data(country):
         >>> print(country_info[0]['name']['common'])
         'Italy'
     """
-    url = f'{BASE_URL}{country}'
-    response = requests.get(url, timeout=5)
-    response.raise_for_status()
+    records = country_index.lookup(country, fields)
+    if records:
+        return records
+    return cache.get_or_load(_cache_key(country, fields), lambda: _fetch(country, fields))
+
+
+@instrumented
+async def country_data_async(country, fields=None):
+    """
+    Async counterpart of country_data() used by the ASGI views.
+
+    Shares the snapshot index and the 'country_data' cache with the sync path.
+
+    Args:
+        country (str): The name of the country to fetch data for.
+        fields (list, optional): REST Countries fields to fetch.
+
+    Returns:
+        list: A list of dictionaries containing country data.
+    """
+    records = country_index.lookup(country, fields)
+    if records:
+        return records
+    return await cache.aget_or_load(_cache_key(country, fields), lambda: _fetch_async(country, fields))
+
+
+def _cache_key(country, fields):
+    return country if fields is None else variant_key(country, ','.join(sorted(fields)))
+
+
+@cache.refresher
+def _refresh(key):
+    # Reloads a cache entry (see _cache_key) for the warm-up and refresh-ahead.
+    country, _, fields = key.partition(VARIANT_SEPARATOR)
+    return _fetch(country, fields.split(',') if fields else None)
+
+
+def _params(fields):
+    return None if fields is None else {'fields': ','.join(fields)}
+
+
+def _fetch(country, fields=None):
+    url = f'{BASE_URL}{country.strip()}'
+    response = http_client.get(url, params=_params(fields))
 
     data = response.json()
     return data
 
+
+async def _fetch_async(country, fields=None):
+    url = f'{BASE_URL}{country.strip()}'
+    return await http_client.aget_json(url, params=_params(fields))
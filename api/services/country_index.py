@@ -0,0 +1,234 @@
+"""
+Country Index Service Module
+
+This module answers country lookups from a local snapshot of the REST Countries
+dataset instead of the network. The snapshot is written by the
+snapshot_countries management command to the file named by the
+API_COUNTRY_DATASET setting (gzip-compressed JSON).
+
+The index is built lazily on the first lookup so that worker startup stays fast.
+Every RELOAD_CHECK_SECONDS the snapshot file's modification time is checked,
+and the index is rebuilt when it changed, so a snapshot written or fixed
+after the workers started is picked up without a restart.
+It supports:
+    - Exact, case-insensitive matches on common and official names, ISO 3166
+      codes (cca2, cca3, ccn3), IOC code and alternative spellings: O(1) dict lookup
+    - Prefix matches on common and official names: O(log n) bisect over a
+      sorted key list
+
+Records keep the REST Countries v3.1 shape, so callers cannot tell whether a
+result came from the index or from the live API. Lookups that need fields the
+snapshot does not keep are left to the live API.
+"""
+
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+from .cache import normalize_key
+
+logger = logging.getLogger(__name__)
+
+# Fields kept in the snapshot; they are also requested from the upstream /all
+# endpoint, which only returns the fields it is asked for.
+SNAPSHOT_FIELDS = ['name', 'capital', 'population', 'flag', 'region', 'cca2', 'cca3', 'ccn3', 'cioc', 'altSpellings']
+
+# Seconds between checks of the snapshot file for a new version
+RELOAD_CHECK_SECONDS = 30
+
+
+class CountryIndex:
+    """
+    In-memory index over a list of REST Countries records.
+
+    Args:
+        records (list): Country records in REST Countries v3.1 shape.
+
+    Usage:
+        index = CountryIndex(records)
+        index.lookup('fr')        # exact ISO code match
+        index.lookup('Germ')      # prefix match
+    """
+
+    def __init__(self, records):
+        self.records = records
+        self.fields = frozenset(field for record in records for field in record)
+        self.exact = {}
+        prefix_keys = {}
+
+        for position, record in enumerate(records):
+            name = record.get('name', {})
+            names = [name.get('common'), name.get('official')]
+            codes = [record.get('cca2'), record.get('cca3'), record.get('ccn3'), record.get('cioc')]
+            for key in names + codes + list(record.get('altSpellings', [])):
+                if key:
+                    self.exact.setdefault(normalize_key(key), position)
+            for key in names:
+                if key:
+                    prefix_keys.setdefault(normalize_key(key), set()).add(position)
+
+        self.prefix_keys = sorted(prefix_keys)
+        self.prefix_positions = [sorted(prefix_keys[key]) for key in self.prefix_keys]
+        self.exact_hits = 0
+        self.prefix_hits = 0
+        self.misses = 0
+
+    def lookup(self, query):
+        """
+        Finds the records matching query.
+
+        Args:
+            query (str): Country name, ISO code or alternative spelling.
+
+        Returns:
+            list: Matching records (exact match first), or an empty list.
+        """
+        key = normalize_key(query)
+        if not key:
+            self.misses += 1
+            return []
+
+        position = self.exact.get(key)
+        if position is not None:
+            self.exact_hits += 1
+            return [self.records[position]]
+
+        positions = []
+        seen = set()
+        start = bisect_left(self.prefix_keys, key)
+        for i in range(start, len(self.prefix_keys)):
+            if not self.prefix_keys[i].startswith(key):
+                break
+            for position in self.prefix_positions[i]:
+                if position not in seen:
+                    seen.add(position)
+                    positions.append(position)
+
+        if positions:
+            self.prefix_hits += 1
+            return [self.records[position] for position in positions]
+
+        self.misses += 1
+        return []
+
+    def stats(self):
+        return {
+            'loaded': True,
+            'size': len(self.records),
+            'exact_hits': self.exact_hits,
+            'prefix_hits': self.prefix_hits,
+            'misses': self.misses,
+        }
+
+
+_index = None
+# Modification time of the snapshot behind _index (None: no file) and when it
+# was last compared with the file's
+_index_mtime = None
+_index_checked = 0.0
+_index_lock = threading.Lock()
+
+
+def load_snapshot(path):
+    """
+    Reads a snapshot file written by the snapshot_countries command.
+
+    Args:
+        path (str or Path): Path of the gzip-compressed JSON snapshot.
+
+    Returns:
+        list: The country records.
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as snapshot:
+        return json.load(snapshot)['countries']
+
+
+def snapshot_mtime(path):
+    """
+    Returns the modification time of a snapshot file in nanoseconds, or None
+    when there is no such file.
+    """
+    try:
+        return os.stat(path).st_mtime_ns if path else None
+    except OSError:
+        return None
+
+
+def get_index():
+    """
+    Returns the process-wide CountryIndex, loading the snapshot on first use
+    and again when the file changed (checked every RELOAD_CHECK_SECONDS).
+
+    A missing or unreadable snapshot is not retried until the file changes,
+    so lookups meanwhile cost no more than the periodic stat().
+
+    Returns:
+        CountryIndex or None: None when no snapshot is configured or readable,
+        in which case every lookup goes to the live API.
+    """
+    global _index, _index_mtime, _index_checked
+    index = _index
+    now = time.monotonic()
+    if index is None or now - _index_checked >= RELOAD_CHECK_SECONDS:
+        with _index_lock:
+            if _index is None or now - _index_checked >= RELOAD_CHECK_SECONDS:
+                path = getattr(settings, 'API_COUNTRY_DATASET', None)
+                mtime = snapshot_mtime(path)
+                if _index is None or mtime != _index_mtime:
+                    records = []
+                    if mtime is not None:
+                        try:
+                            records = load_snapshot(path)
+                        except (OSError, ValueError, KeyError):
+                            logger.warning('Country snapshot %s is not readable; using live lookups', path)
+                    elif path:
+                        logger.warning('Country snapshot %s is not available; using live lookups', path)
+                    _index = CountryIndex(records)
+                    _index_mtime = mtime
+                _index_checked = now
+            index = _index
+    return index if index.records else None
+
+
+def reset_index():
+    """
+    Drops the loaded index so the next lookup reloads the snapshot.
+    """
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def lookup(country, fields=None):
+    """
+    Finds country records in the local snapshot.
+
+    Args:
+        country (str): Country name, ISO code or alternative spelling.
+        fields (list, optional): REST Countries fields the caller needs.
+
+    Returns:
+        list: Matching records, or an empty list when the snapshot is missing,
+              lacks one of the fields or has no match.
+    """
+    index = get_index()
+    if index is None or (fields is not None and not index.fields.issuperset(fields)):
+        return []
+    return index.lookup(country)
+
+
+def stats():
+    """
+    Returns index statistics, or {'loaded': False} before the first lookup or
+    when no snapshot is available.
+    """
+    index = _index
+    if index is None or not index.records:
+        return {'loaded': False}
+    return index.stats()
@@ -4,19 +4,40 @@ Country Universities API Service Module
 This module provides functionality to fetch university information for a given country.
 It integrates with the Hipolabs Universities API to retrieve a list of universities
 and their associated information for any specified country.
+
+When API_UNIVERSITIES_LOCAL is enabled, universities are read from the local
+University table (loaded by the sync_universities management command) and the
+upstream is only called for countries that have no local rows. Responses are
+cached per country (see api/services/cache.py) because the dataset changes
+rarely and traffic repeats the same few countries.
 """
 
-import requests
+from django.conf import settings
+from django.db import DatabaseError
+
+from . import http_client
+from .metrics import instrumented
+from .cache import get_cache, normalize_key
+from ..models import University
 
 # Hipolabs Universities API endpoint for searching universities by country
 URL = 'http://universities.hipolabs.com/search'
 
+cache = get_cache('country_universities_api')
+
+# Columns the universities responses need; the rest stay on disk
+LOCAL_COLUMNS = ('name', 'country', 'web_pages')
+
+@instrumented
 def country_universities_api(country):
     """
     Fetches a list of universities in a specified country.
     
     This function makes an HTTP GET request to the Hipolabs Universities API and
-    retrieves all universities registered for the given country.
+    retrieves all universities registered for the given country. Results are
+    served from the 'country_universities_api' cache when available, then from
+    the local database, then from the upstream; the lookup is case- and
+    whitespace-insensitive.
     
     Args:
         country (str): The name of the country to search for universities (e.g., 'United States', 'Japan').
@@ -38,6 +59,121 @@ def country_universities_api(country):
         >>> print(universities[0]['name'])
         'Example University'
     """
-    response = requests.get(url=URL, params={'country':country}, timeout=5)
-    response.raise_for_status()
-    return response.json()
\ No newline at end of file
+    return cache.get_or_load(country, lambda: _load(country))
+
+
+@instrumented
+async def country_universities_api_async(country):
+    """
+    Async counterpart of country_universities_api() used by the ASGI views.
+
+    Shares the 'country_universities_api' cache with the sync path.
+
+    Args:
+        country (str): The name of the country to search for universities.
+
+    Returns:
+        list: A list of dictionaries containing university data.
+    """
+    return await cache.aget_or_load(country, lambda: _load_async(country))
+
+
+def local_queryset(country):
+    """
+    Returns the local universities of a country, reading only LOCAL_COLUMNS.
+
+    Args:
+        country (str): Country name; matched case- and whitespace-insensitively.
+
+    Returns:
+        QuerySet: Dictionaries with 'name', 'country' and 'web_pages', in
+                  upstream order.
+    """
+    return University.objects.filter(country_key=normalize_key(country)).values(*LOCAL_COLUMNS)
+
+
+def universities_source(country):
+    """
+    Returns what the paged and streamed universities responses read.
+
+    Countries in the local table are read straight from it: a lazy QuerySet,
+    so a page or a stream never loads the whole country (see
+    api/pagination.py). Other countries get the cached list of
+    country_universities_api().
+
+    Args:
+        country (str): Country name; matched case- and whitespace-insensitively.
+
+    Returns:
+        QuerySet or list: Dictionaries with at least 'name', 'country' and
+                          'web_pages', in upstream order.
+    """
+    if _local_enabled():
+        queryset = local_queryset(country)
+        try:
+            if queryset.exists():
+                return queryset
+        except DatabaseError:
+            pass
+    return country_universities_api(country)
+
+
+async def universities_source_async(country):
+    """
+    Async counterpart of universities_source().
+    """
+    if _local_enabled():
+        queryset = local_queryset(country)
+        try:
+            if await queryset.aexists():
+                return queryset
+        except DatabaseError:
+            pass
+    return await country_universities_api_async(country)
+
+
+def _local_enabled():
+    return getattr(settings, 'API_UNIVERSITIES_LOCAL', False)
+
+
+def _load(country):
+    if _local_enabled():
+        try:
+            universities = list(local_queryset(country))
+        except DatabaseError:
+            universities = []
+        if universities:
+            return universities
+    return fetch_live(country)
+
+
+async def _load_async(country):
+    if _local_enabled():
+        try:
+            universities = [university async for university in local_queryset(country)]
+        except DatabaseError:
+            universities = []
+        if universities:
+            return universities
+    return await fetch_live_async(country)
+
+
+@cache.refresher
+def _refresh(country):
+    # Reloads a cache entry for the warm-up and refresh-ahead.
+    return _load(country)
+
+
+def fetch_live(country):
+    """
+    Fetches a country's universities from the upstream, bypassing cache and database.
+    """
+    response = http_client.get(URL, params={'country':country.strip()})
+    return response.json()
+
+
+async def fetch_live_async(country):
+    """
+    Async counterpart of fetch_live().
+    """
+    return await http_client.aget_json(URL, params={'country':country.strip()})
@@ -0,0 +1,109 @@
+"""
+Request Deadline Service Module
+
+This module gives every request a deadline that follows it into the service
+layer, so upstream calls never outlive the time the client is willing to wait.
+DeadlineMiddleware (see api/middleware.py) starts the deadline when a request
+arrives; api/services/http_client.py caps each upstream timeout to the time
+left and fails at once, without a request, when none is left.
+
+The deadline of the current request lives in a context variable, so it follows
+the request through sync views, async views, sync_to_async hops and hedged
+calls. Outside a request (prefetch refills, management commands) there is no
+deadline and upstream calls use their own timeouts.
+
+Deadlines are configured through the API_REQUEST_DEADLINE setting:
+    - SECONDS (float): Time budget of a request; None disables deadlines
+      (default 10)
+    - HEADER (str): Request header in which a client may send a shorter budget,
+      in seconds (default 'X-Request-Timeout'); it never extends SECONDS
+"""
+
+import time
+from contextvars import ContextVar
+
+import requests
+from django.conf import settings
+
+DEFAULTS = {
+    'SECONDS': 10,
+    'HEADER': 'X-Request-Timeout',
+}
+
+_current = ContextVar('request_deadline', default=None)
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """
+    Raised when the request's deadline passed before or during an upstream call.
+
+    It subclasses requests.exceptions.Timeout so existing 'except
+    RequestException' handlers turn it into the usual 503 response. Circuit
+    breakers do not count it as an upstream failure.
+    """
+
+
+def get_config():
+    """
+    Returns DEFAULTS updated with the values from settings.API_REQUEST_DEADLINE.
+    """
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'API_REQUEST_DEADLINE', {}))
+    return config
+
+
+def budget(requested, config):
+    """
+    Returns the time budget of a request in seconds.
+
+    Args:
+        requested (str or None): Value of the client's deadline header.
+        config (dict): Deadline configuration (see get_config).
+
+    Returns:
+        float or None: The smaller of SECONDS and the client's budget; None
+        when neither is set. Malformed or non-positive header values are
+        ignored.
+    """
+    seconds = config['SECONDS']
+    try:
+        asked = float(requested) if requested else None
+    except ValueError:
+        asked = None
+    if asked is not None and asked > 0:
+        seconds = asked if seconds is None else min(seconds, asked)
+    return seconds
+
+
+def start(seconds):
+    """
+    Starts the deadline of the current request.
+
+    Args:
+        seconds (float or None): Time budget; None starts no deadline.
+
+    Returns:
+        Token: Pass it to stop() when the request ends.
+    """
+    return _current.set(None if seconds is None else time.monotonic() + seconds)
+
+
+def stop(token):
+    """
+    Ends the deadline started with the given token.
+    """
+    _current.reset(token)
+
+
+def remaining():
+    """
+    Returns the seconds left before the current request's deadline.
+
+    Returns:
+        float or None: None outside a request or without a deadline; zero or
+        negative once the deadline has passed.
+    """
+    expires_at = _current.get()
+    if expires_at is None:
+        return None
+    return expires_at - time.monotonic()
@@ -5,11 +5,14 @@ This module provides functionality to fetch random dog images from the Dog CEO A
 It serves as an external API integration for retrieving cute dog photos.
 """
 
-import requests
+from . import http_client
+from .metrics import instrumented
+from .prefetch import get_buffer
 
 # Dog CEO API endpoint for fetching random dog images
 url = "https://dog.ceo/api/breeds/image/random"
 
+@instrumented
 def dog_api():
     """
     Fetches a random dog image URL from the Dog CEO API.
@@ -29,7 +32,22 @@ def dog_api():
         >>> print(image_url)
         'https://images.dog.ceo/breeds/...'
     """
-    response = requests.get(url, timeout=5)
+    response = http_client.get(url)
     data = response.json()
-    response.raise_for_status()
+    return data['message']
+
+
+# Pre-fetched items served by the views (see api/services/prefetch.py)
+dog_buffer = get_buffer('dog_api', dog_api)
+
+
+@instrumented
+async def dog_api_async():
+    """
+    Async counterpart of dog_api() used by the ASGI views.
+
+    Returns:
+        str: A URL string pointing to a random dog image.
+    """
+    data = await http_client.aget_json(url)
     return data['message']
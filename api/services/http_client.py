@@ -0,0 +1,640 @@
+"""
+HTTP Client Service Module
+
+This module provides the shared HTTP client used by every service in api/services.
+Instead of calling the module-level requests.get (which opens a new TCP connection
+and performs a new TLS handshake on every call), services go through a single
+requests.Session that keeps per-host keep-alive connection pools. Async views
+(served under ASGI) use an equivalent httpx.AsyncClient, one per event loop;
+httpx is imported on first async use, so WSGI workers never load it.
+Every call takes a token of its upstream host's shared rate limit (see
+api/services/rate_limit.py), passes through the host's circuit breaker (see
+api/services/circuit_breaker.py) and is timed per host (see
+api/services/metrics.py).
+
+Unless a call passes its own timeout, it uses the host's adaptive timeout (see
+api/services/latency.py), and any timeout is cut to the time left before the
+current request's deadline (see api/services/deadline.py). Calls to hosts with
+hedging on are duplicated once they run past the host's p95 latency. Async
+calls return the first answer and cancel the other request. Sync calls send
+the original request from the caller's thread and only the duplicate from
+the hedge thread pool, so a busy pool delays or skips hedges but never calls;
+the hedge answers when the original request fails or times out.
+
+The client is configured through the API_HTTP_CLIENT setting:
+    - POOL_CONNECTIONS (int): Number of per-host pools kept alive (default 10)
+    - POOL_MAXSIZE (int): Maximum idle connections kept per host (default 10)
+    - POOL_BLOCK (bool): Block when a host pool is exhausted instead of opening
+      an extra, non-pooled connection (default False)
+    - MAX_RETRIES (int): Retries for idempotent GET requests (default 2)
+    - BACKOFF_FACTOR (float): Exponential backoff factor between retries (default 0.3)
+    - RETRY_STATUSES (tuple): Status codes that trigger a retry (default 502, 503, 504)
+    - TIMEOUT (float or tuple): Default (connect, read) timeout in seconds, and
+      the upper bound of adaptive timeouts (default 5)
+    - HOSTS (dict): Per-host overrides of the pool options, keyed by host name
+      (sync client only)
+    - ASYNC_MAX_CONNECTIONS (int): Maximum concurrent connections of the async
+      client across all hosts (default 200)
+    - UPSTREAM_BASE_URL (str): Send every upstream request to this server
+      instead, as <base>/<host><path> (default None); used by the load-test
+      stubs (see api/stub_upstreams.py)
+    - HEDGE_THREADS (int): Threads sending the hedges of sync calls (default 16)
+"""
+
+import asyncio
+import contextvars
+import functools
+import json
+import threading
+import time
+import weakref
+from concurrent import futures
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import circuit_breaker
+from . import deadline
+from . import latency
+from . import metrics
+from . import rate_limit
+from . import timing
+
+DEFAULTS = {
+    'POOL_CONNECTIONS': 10,
+    'POOL_MAXSIZE': 10,
+    'POOL_BLOCK': False,
+    'MAX_RETRIES': 2,
+    'BACKOFF_FACTOR': 0.3,
+    'RETRY_STATUSES': (502, 503, 504),
+    'TIMEOUT': 5,
+    'HOSTS': {},
+    'ASYNC_MAX_CONNECTIONS': 200,
+    'UPSTREAM_BASE_URL': None,
+    'HEDGE_THREADS': 16,
+}
+
+_session = None
+_session_lock = threading.Lock()
+_hedge_executor = None
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_config():
+    """
+    Returns the effective client configuration.
+
+    Returns:
+        dict: DEFAULTS updated with the values from settings.API_HTTP_CLIENT.
+    """
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'API_HTTP_CLIENT', {}))
+    return config
+
+
+def _build_adapter(options):
+    retry = Retry(
+        total=options['MAX_RETRIES'],
+        backoff_factor=options['BACKOFF_FACTOR'],
+        status_forcelist=options['RETRY_STATUSES'],
+        allowed_methods=frozenset(['GET']),
+        raise_on_status=False,
+    )
+    return HTTPAdapter(
+        pool_connections=options['POOL_CONNECTIONS'],
+        pool_maxsize=options['POOL_MAXSIZE'],
+        pool_block=options['POOL_BLOCK'],
+        max_retries=retry,
+    )
+
+
+def _build_session():
+    config = get_config()
+    session = requests.Session()
+
+    default_adapter = _build_adapter(config)
+    session.mount('http://', default_adapter)
+    session.mount('https://', default_adapter)
+
+    for host, overrides in config['HOSTS'].items():
+        options = dict(config)
+        options.update(overrides)
+        adapter = _build_adapter(options)
+        session.mount(f'http://{host}/', adapter)
+        session.mount(f'https://{host}/', adapter)
+
+    return session
+
+
+def get_session():
+    """
+    Returns the process-wide requests.Session, creating it on first use.
+
+    The session is created lazily so that each gunicorn worker builds its own
+    pools after forking instead of sharing sockets with the master process.
+
+    Returns:
+        requests.Session: The shared session.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def reset_session():
+    """
+    Closes the shared session and all of its pooled connections.
+
+    The next call to get_session() builds a new session from the current settings.
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def upstream_url(url, config):
+    """
+    Returns the URL to actually request, honouring UPSTREAM_BASE_URL.
+
+    Example:
+        With UPSTREAM_BASE_URL 'http://127.0.0.1:8765',
+        'https://zenquotes.io/api/random' becomes
+        'http://127.0.0.1:8765/zenquotes.io/api/random'.
+    """
+    base = config['UPSTREAM_BASE_URL']
+    if not base:
+        return url
+    parts = urlsplit(url)
+    query = f'?{parts.query}' if parts.query else ''
+    return f"{base.rstrip('/')}/{parts.hostname}{parts.path}{query}"
+
+
+def throttle(url, max_wait=None):
+    """
+    Takes a token of the rate limit of the URL's host.
+
+    A token due after the request's deadline is not waited for.
+
+    Args:
+        url (str): The URL about to be requested.
+        max_wait (float, optional): Longest acceptable wait (0 for hedges).
+
+    Returns:
+        float: Seconds the caller must wait before calling (0 for hosts
+               without a limit).
+
+    Raises:
+        rate_limit.RateLimited: If the host's policy rejects the call.
+    """
+    host = urlsplit(url).hostname
+    labels = (('host', host),)
+    left = deadline.remaining()
+    if left is not None:
+        max_wait = max(0.0, left) if max_wait is None else min(max_wait, max(0.0, left))
+    try:
+        delay = rate_limit.reserve(host, max_wait)
+    except rate_limit.RateLimited as exc:
+        if metrics.enabled():
+            metrics.inc('api_upstream_calls_total', labels + (('outcome', metrics.outcome_of(exc)),))
+        raise
+    if delay:
+        timing.add('upstream', delay)
+        if metrics.enabled():
+            metrics.observe('api_rate_limit_wait_seconds', labels, delay)
+    return delay
+
+
+async def athrottle(url, max_wait=None):
+    """
+    Async counterpart of throttle().
+
+    Buckets in the shared SQLite file are taken on a worker thread, so a
+    contended bucket never stalls the event loop; hosts without a limit or
+    with in-memory buckets are handled inline.
+    """
+    limiter = rate_limit.get_limiter(urlsplit(url).hostname)
+    if limiter is None or isinstance(limiter.backend, rate_limit.MemoryBackend):
+        return throttle(url, max_wait)
+    return await asyncio.to_thread(throttle, url, max_wait)
+
+
+def request_timeout(url, timeout, config):
+    """
+    Returns the timeout of one upstream call and whether the deadline set it.
+
+    Without an explicit timeout the host's adaptive timeout is used; either is
+    then cut to the time left before the request's deadline.
+
+    Returns:
+        tuple: (timeout, capped) where timeout is a number or a (connect, read)
+               tuple and capped is True when the deadline shortened it.
+
+    Raises:
+        deadline.DeadlineExceeded: If the deadline has already passed.
+    """
+    host = urlsplit(url).hostname
+    if timeout is None:
+        timeout = latency.get_tracker(host).timeout(config['TIMEOUT'])
+    left = deadline.remaining()
+    if left is None:
+        return timeout, False
+    if left <= 0:
+        raise deadline.DeadlineExceeded(f'Request deadline passed before calling {host}')
+    connect, read = timeout if isinstance(timeout, (tuple, list)) else (timeout, timeout)
+    if connect <= left and read <= left:
+        return timeout, False
+    return (min(connect, left), min(read, left)), True
+
+
+def hedge_delay(url):
+    """
+    Returns the seconds after which a call to the URL's host is hedged.
+
+    Returns:
+        float or None: None when the host is not hedged, its latency is not
+        known yet or the request's deadline comes first.
+    """
+    delay = latency.get_tracker(urlsplit(url).hostname).hedge_delay()
+    left = deadline.remaining()
+    if delay is None or (left is not None and left <= delay):
+        return None
+    return delay
+
+
+def _start_hedge(url):
+    # A hedge needs a share of the hedge budget and a rate-limit token that
+    # is available right now; otherwise the original call is simply awaited.
+    if not latency.get_tracker(urlsplit(url).hostname).allow_hedge():
+        return False
+    try:
+        throttle(url, max_wait=0)
+    except rate_limit.RateLimited:
+        return False
+    return True
+
+
+async def _astart_hedge(url):
+    if not latency.get_tracker(urlsplit(url).hostname).allow_hedge():
+        return False
+    try:
+        await athrottle(url, max_wait=0)
+    except rate_limit.RateLimited:
+        return False
+    return True
+
+
+def _hedge_finished(url, winner):
+    tracker = latency.get_tracker(urlsplit(url).hostname)
+    if winner == 'hedge':
+        tracker.hedge_won()
+    if metrics.enabled():
+        metrics.inc('api_upstream_hedges_total', (('host', tracker.name), ('winner', winner)))
+
+
+@contextmanager
+def guarded(url):
+    """
+    Runs an upstream call under the circuit breaker of the URL's host and
+    records its latency and outcome. Latencies of answered and timed-out
+    calls feed the host's adaptive timeout.
+
+    Raises:
+        circuit_breaker.CircuitOpenError: If the breaker rejects the call.
+    """
+    host = urlsplit(url).hostname
+    labels = (('host', host),)
+    record = metrics.enabled()
+    breaker = circuit_breaker.get_breaker(host)
+    try:
+        breaker.before_call()
+    except circuit_breaker.CircuitOpenError as exc:
+        if record:
+            metrics.inc('api_upstream_calls_total', labels + (('outcome', metrics.outcome_of(exc)),))
+        raise
+
+    if record:
+        metrics.add_gauge('api_upstream_in_flight', labels)
+    tracker = latency.get_tracker(host)
+    start = time.monotonic()
+    outcome = 'ok'
+    try:
+        yield
+    except Exception as exc:
+        outcome = metrics.outcome_of(exc)
+        failed = (
+            circuit_breaker.is_upstream_failure(exc)
+            or not isinstance(exc, requests.exceptions.RequestException)
+        )
+        breaker.record(time.monotonic() - start, failed=failed)
+        answered = isinstance(exc, (requests.exceptions.HTTPError, requests.exceptions.Timeout))
+        if answered and not isinstance(exc, deadline.DeadlineExceeded):
+            tracker.record(time.monotonic() - start)
+        raise
+    except BaseException:
+        outcome = 'cancelled'
+        breaker.release()
+        raise
+    else:
+        breaker.record(time.monotonic() - start, failed=False)
+        tracker.record(time.monotonic() - start)
+    finally:
+        elapsed = time.monotonic() - start
+        timing.add('upstream', elapsed)
+        if record:
+            metrics.add_gauge('api_upstream_in_flight', labels, -1)
+            metrics.observe('api_upstream_duration_seconds', labels, elapsed)
+            metrics.inc('api_upstream_calls_total', labels + (('outcome', outcome),))
+
+
+def get(url, params=None, timeout=None):
+    """
+    Performs a pooled HTTP GET request and raises for error statuses.
+
+    Args:
+        url (str): The URL to request.
+        params (dict, optional): Query string parameters.
+        timeout (float or tuple, optional): Overrides the host's adaptive timeout.
+
+    Returns:
+        requests.Response: The successful response.
+
+    Raises:
+        requests.exceptions.RequestException: If the request fails, times out or
+            the upstream answers with a 4xx/5xx status after retries.
+            circuit_breaker.CircuitOpenError and rate_limit.RateLimited (both
+            ConnectionErrors) are raised without a request when the host's
+            breaker is open or its rate limit rejects the call, and
+            deadline.DeadlineExceeded (a Timeout) when the request's deadline
+            has passed.
+
+    Example:
+        >>> response = get('https://dog.ceo/api/breeds/image/random')
+        >>> response.json()['message']
+    """
+    config = get_config()
+    delay = throttle(url)
+    if delay:
+        time.sleep(delay)
+    attempt = functools.partial(_send, url, params, timeout, config)
+    hedge_after = hedge_delay(url)
+    if hedge_after is None:
+        return attempt()
+    return _hedged(url, attempt, hedge_after, config)
+
+
+def _send(url, params, timeout, config):
+    timeout, capped = request_timeout(url, timeout, config)
+    with guarded(url):
+        try:
+            response = get_session().get(upstream_url(url, config), params=params, timeout=timeout)
+        except requests.exceptions.Timeout as exc:
+            if capped:
+                raise deadline.DeadlineExceeded(str(exc)) from exc
+            raise
+        response.raise_for_status()
+    return response
+
+
+def _get_hedge_executor(config):
+    global _hedge_executor
+    if _hedge_executor is None:
+        with _session_lock:
+            if _hedge_executor is None:
+                _hedge_executor = futures.ThreadPoolExecutor(
+                    max_workers=config['HEDGE_THREADS'], thread_name_prefix='upstream-hedge',
+                )
+    return _hedge_executor
+
+
+def _hedged(url, attempt, hedge_after, config):
+    # The original request runs on the caller's thread. The hedge waits on
+    # the executor until hedge_after has passed since the call started, and
+    # is not sent if the original request finished first or the executor only
+    # got to it later. The request context (deadline, timings) goes with it.
+    started = time.monotonic()
+    primary_done = threading.Event()
+    hedge_sent = threading.Event()
+
+    def send_hedge():
+        if primary_done.wait(max(0.0, hedge_after - (time.monotonic() - started))):
+            return None
+        if not _start_hedge(url):
+            return None
+        hedge_sent.set()
+        return attempt()
+
+    hedge = _get_hedge_executor(config).submit(contextvars.copy_context().run, send_hedge)
+    try:
+        response = attempt()
+    except Exception:
+        primary_done.set()
+        hedge.cancel()
+        if not hedge_sent.is_set():
+            raise
+        # The hedge may still answer; wait for it no longer than the deadline.
+        left = deadline.remaining()
+        done, _ = futures.wait([hedge], timeout=None if left is None else max(0.0, left))
+        if done and hedge.exception() is None and hedge.result() is not None:
+            _hedge_finished(url, 'hedge')
+            return hedge.result()
+        _hedge_finished(url, 'none')
+        raise
+    primary_done.set()
+    hedge.cancel()
+    if hedge_sent.is_set():
+        _hedge_finished(url, 'primary')
+    return response
+
+
+def pool_stats():
+    """
+    Returns usage statistics for every live per-host connection pool.
+
+    Use these numbers to size POOL_MAXSIZE for the gunicorn worker count: if
+    num_connections keeps growing past maxsize, the pool is too small and
+    connections are being discarded instead of reused.
+
+    Returns:
+        list: One dictionary per pool with keys:
+              - 'host': Upstream host name (str)
+              - 'scheme': 'http' or 'https' (str)
+              - 'port': Upstream port (int)
+              - 'maxsize': Maximum idle connections kept (int)
+              - 'num_connections': Connections opened so far (int)
+              - 'num_requests': Requests sent through the pool (int)
+              - 'idle': Connections currently idle in the pool (int)
+    """
+    if _session is None:
+        return []
+
+    stats = []
+    seen = set()
+    for adapter in _session.adapters.values():
+        if id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            stats.append({
+                'host': pool.host,
+                'scheme': pool.scheme,
+                'port': pool.port,
+                'maxsize': pool.pool.maxsize if pool.pool is not None else 0,
+                'num_connections': pool.num_connections,
+                'num_requests': pool.num_requests,
+                'idle': pool.pool.qsize() if pool.pool is not None else 0,
+            })
+    return stats
+
+
+def _async_timeout(timeout):
+    import httpx
+
+    if isinstance(timeout, (tuple, list)):
+        connect, read = timeout
+        return httpx.Timeout(read, connect=connect)
+    return httpx.Timeout(timeout)
+
+
+def get_async_client():
+    """
+    Returns the httpx.AsyncClient bound to the running event loop.
+
+    httpx clients cannot be shared between event loops, so one client is kept
+    per loop and discarded together with it.
+
+    Returns:
+        httpx.AsyncClient: The shared async client for the current loop.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        import httpx
+
+        config = get_config()
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=config['ASYNC_MAX_CONNECTIONS'],
+                max_keepalive_connections=config['POOL_MAXSIZE'],
+            ),
+            transport=httpx.AsyncHTTPTransport(retries=config['MAX_RETRIES']),
+            timeout=_async_timeout(config['TIMEOUT']),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def aget_json(url, params=None, timeout=None):
+    """
+    Async counterpart of get(): performs a pooled GET and decodes the JSON body.
+
+    Error statuses listed in RETRY_STATUSES are retried with the same exponential
+    backoff as the sync client. httpx errors are re-raised as the matching
+    requests exceptions so callers handle both paths with one except clause.
+
+    Args:
+        url (str): The URL to request.
+        params (dict, optional): Query string parameters.
+        timeout (float or tuple, optional): Overrides the host's adaptive timeout.
+
+    Returns:
+        The decoded JSON body (dict or list).
+
+    Raises:
+        requests.exceptions.RequestException: If the request fails, times out,
+            the upstream answers with a 4xx/5xx status or the body is not JSON.
+            circuit_breaker.CircuitOpenError and rate_limit.RateLimited are
+            raised without a request when the host's breaker is open or its
+            rate limit rejects the call, and deadline.DeadlineExceeded when
+            the request's deadline has passed.
+
+    Example:
+        >>> data = await aget_json('https://dog.ceo/api/breeds/image/random')
+        >>> data['message']
+    """
+    config = get_config()
+    client = get_async_client()
+    delay = await athrottle(url)
+    if delay:
+        await asyncio.sleep(delay)
+    attempt = functools.partial(_asend, client, url, params, timeout, config)
+    hedge_after = hedge_delay(url)
+    if hedge_after is None:
+        return await attempt()
+    return await _ahedged(url, attempt, hedge_after)
+
+
+async def _asend(client, url, params, timeout, config):
+    timeout, capped = request_timeout(url, timeout, config)
+    kwargs = {'params': params, 'timeout': _async_timeout(timeout)}
+    with guarded(url):
+        try:
+            return await _aget_json(client, upstream_url(url, config), kwargs, config)
+        except requests.exceptions.Timeout as exc:
+            if capped:
+                raise deadline.DeadlineExceeded(str(exc)) from exc
+            raise
+
+
+async def _ahedged(url, attempt, hedge_after):
+    primary = asyncio.ensure_future(attempt())
+    pending = {primary}
+    try:
+        done, _ = await asyncio.wait(pending, timeout=hedge_after)
+        if done or not await _astart_hedge(url):
+            return await primary
+        hedge = asyncio.ensure_future(attempt())
+        pending = {primary, hedge}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    _hedge_finished(url, 'hedge' if task is hedge else 'primary')
+                    return task.result()
+        _hedge_finished(url, 'none')
+        return primary.result()
+    finally:
+        # The slower request (or both, if the caller was cancelled) is cancelled.
+        for task in pending:
+            task.cancel()
+
+
+async def _aget_json(client, url, kwargs, config):
+    import httpx
+
+    try:
+        for attempt in range(config['MAX_RETRIES'] + 1):
+            response = await client.get(url, **kwargs)
+            if response.status_code not in config['RETRY_STATUSES'] or attempt == config['MAX_RETRIES']:
+                break
+            backoff = config['BACKOFF_FACTOR'] * (2 ** attempt)
+            left = deadline.remaining()
+            if left is not None and left <= backoff:
+                break
+            await asyncio.sleep(backoff)
+        response.raise_for_status()
+        return response.json()
+    except httpx.TimeoutException as exc:
+        raise requests.exceptions.Timeout(str(exc)) from exc
+    except httpx.HTTPStatusError as exc:
+        response = requests.Response()
+        response.status_code = exc.response.status_code
+        response.url = str(exc.request.url)
+        raise requests.exceptions.HTTPError(str(exc), response=response) from exc
+    except httpx.HTTPError as exc:
+        raise requests.exceptions.ConnectionError(str(exc)) from exc
+    except json.JSONDecodeError as exc:
+        raise requests.exceptions.JSONDecodeError(exc.msg, exc.doc, exc.pos) from exc
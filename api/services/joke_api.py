@@ -5,11 +5,14 @@ This module provides functionality to fetch random jokes from the Official Joke
 It retrieves jokes in a setup/punchline format for entertainment purposes.
 """
 
-import requests
+from . import http_client
+from .metrics import instrumented
+from .prefetch import get_buffer
 
 # Official Joke API endpoint for fetching random jokes
 URL = 'https://official-joke-api.appspot.com/random_joke'
 
+@instrumented
 def joke_api():
     """
     Fetches a random joke from the Official Joke API.
@@ -25,13 +28,27 @@ def joke_api():
               - 'id': Unique identifier for the joke (int)
     
     Raises:
-        requests.exceptions.RequestException: If the HTTP request fails.
+        requests.exceptions.RequestException: If the HTTP request fails or times out.
         json.JSONDecodeError: If the response is not valid JSON.
     
     Example:
         >>> joke = joke_api()
         >>> print(f"{joke['setup']} {joke['punchline']}")
     """
-    response = requests.get(URL)
-    response.raise_for_status()
-    return response.json()
\ No newline at end of file
+    response = http_client.get(URL)
+    return response.json()
+
+
+# Pre-fetched items served by the views (see api/services/prefetch.py)
+joke_buffer = get_buffer('joke_api', joke_api)
+
+
+@instrumented
+async def joke_api_async():
+    """
+    Async counterpart of joke_api() used by the ASGI views.
+
+    Returns:
+        dict: A dictionary containing 'setup', 'punchline', 'type' and 'id'.
+    """
+    return await http_client.aget_json(URL)
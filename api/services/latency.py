@@ -0,0 +1,223 @@
+"""
+Upstream Latency Service Module
+
+This module keeps the recent latencies of every upstream host and derives two
+numbers from them for api/services/http_client.py:
+    - The timeout of the next call: TIMEOUT_FACTOR times the host's
+      TIMEOUT_QUANTILE (p99) latency, between MIN_TIMEOUT and the configured
+      http_client TIMEOUT. A host that usually answers in 80 ms no longer
+      holds a worker for 5 seconds when it hangs.
+    - The hedge delay of hosts with HEDGE on: a call still running after the
+      host's HEDGE_QUANTILE (p95) latency gets a duplicate request, and the
+      first answer wins. At most HEDGE_RATIO of a host's calls are hedged, so
+      the extra load stays around 5%.
+
+Until MIN_SAMPLES calls of a host have been seen, calls use the configured
+timeout and are not hedged. Calls that answered (including 4xx/5xx) or timed
+out are sampled; a timed-out call counts with its full timeout, so a slowing
+host raises its own timeout again.
+
+Trackers are configured through the API_UPSTREAM_LATENCY setting:
+    - SAMPLES (int): Latencies kept per host (default 200)
+    - MIN_SAMPLES (int): Latencies needed before adapting (default 20)
+    - TIMEOUT_QUANTILE (float): Quantile the timeout is based on (default 0.99)
+    - TIMEOUT_FACTOR (float): Timeout as a multiple of that quantile (default 2)
+    - MIN_TIMEOUT (float): Shortest adaptive timeout in seconds (default 0.5)
+    - HEDGE (bool): Hedge idempotent calls to the host (default False)
+    - HEDGE_QUANTILE (float): Quantile after which a hedge is sent (default 0.95)
+    - HEDGE_RATIO (float): Largest share of calls that are hedged (default 0.1)
+    - HOSTS (dict): Per-host overrides of the options above
+"""
+
+import threading
+from collections import deque
+
+from django.conf import settings
+
+DEFAULTS = {
+    'SAMPLES': 200,
+    'MIN_SAMPLES': 20,
+    'TIMEOUT_QUANTILE': 0.99,
+    'TIMEOUT_FACTOR': 2,
+    'MIN_TIMEOUT': 0.5,
+    'HEDGE': False,
+    'HEDGE_QUANTILE': 0.95,
+    'HEDGE_RATIO': 0.1,
+    'HOSTS': {},
+}
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class LatencyTracker:
+    """
+    Recent latencies of one upstream host.
+
+    Usage:
+        tracker = LatencyTracker('restcountries.com', hedge=True)
+        tracker.record(0.084)
+        timeout = tracker.timeout(5)          # e.g. 0.5 once warmed up
+        hedge_after = tracker.hedge_delay()   # e.g. 0.12, or None
+    """
+
+    def __init__(self, name, samples=DEFAULTS['SAMPLES'], min_samples=DEFAULTS['MIN_SAMPLES'],
+                 timeout_quantile=DEFAULTS['TIMEOUT_QUANTILE'], timeout_factor=DEFAULTS['TIMEOUT_FACTOR'],
+                 min_timeout=DEFAULTS['MIN_TIMEOUT'], hedge=DEFAULTS['HEDGE'],
+                 hedge_quantile=DEFAULTS['HEDGE_QUANTILE'], hedge_ratio=DEFAULTS['HEDGE_RATIO']):
+        self.name = name
+        self.min_samples = min_samples
+        self.timeout_quantile = timeout_quantile
+        self.timeout_factor = timeout_factor
+        self.min_timeout = min_timeout
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_ratio = hedge_ratio
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=samples)
+        self._sorted = None
+        self.calls = 0
+        self.hedged = 0
+        self.hedges_won = 0
+
+    def record(self, seconds):
+        """
+        Adds the latency of one answered or timed-out call.
+        """
+        with self._lock:
+            self._samples.append(seconds)
+            self._sorted = None
+
+    def quantile(self, q):
+        """
+        Returns the q-quantile of the recent latencies, or None while fewer
+        than min_samples were recorded.
+        """
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            if self._sorted is None:
+                self._sorted = sorted(self._samples)
+            ordered = self._sorted
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def timeout(self, default):
+        """
+        Returns the timeout of the next call.
+
+        Args:
+            default (float or tuple): The configured timeout, a number or a
+                (connect, read) tuple; it is also the upper bound.
+
+        Returns:
+            float or tuple: default with its read part replaced by the adaptive
+            timeout, or default itself while there are too few samples.
+        """
+        observed = self.quantile(self.timeout_quantile)
+        if observed is None:
+            return default
+        if isinstance(default, (tuple, list)):
+            connect, read = default
+            return connect, min(read, max(self.min_timeout, observed * self.timeout_factor))
+        return min(default, max(self.min_timeout, observed * self.timeout_factor))
+
+    def hedge_delay(self):
+        """
+        Counts one call and returns how long to wait before hedging it.
+
+        Returns:
+            float or None: None when hedging is off for the host or there are
+            too few samples.
+        """
+        if not self.hedge:
+            return None
+        delay = self.quantile(self.hedge_quantile)
+        if delay is not None:
+            with self._lock:
+                self.calls += 1
+        return delay
+
+    def allow_hedge(self):
+        """
+        Takes one hedge from the HEDGE_RATIO budget; returns False when the
+        host already had its share.
+        """
+        with self._lock:
+            if self.hedged >= self.hedge_ratio * self.calls:
+                return False
+            self.hedged += 1
+            return True
+
+    def hedge_won(self):
+        """
+        Counts a hedge that answered before the original request.
+        """
+        with self._lock:
+            self.hedges_won += 1
+
+    def stats(self):
+        """
+        Returns a snapshot of the tracker.
+
+        Returns:
+            dict: Keys 'name', 'samples', 'p50', 'p95', 'p99' (seconds, None
+                  while warming up), 'hedge', 'calls' (hedgeable calls),
+                  'hedged' and 'hedges_won'.
+        """
+        quantiles = {f'p{int(q * 100)}': self.quantile(q) for q in (0.5, 0.95, 0.99)}
+        with self._lock:
+            return {
+                'name': self.name,
+                'samples': len(self._samples),
+                **{key: None if value is None else round(value, 4) for key, value in quantiles.items()},
+                'hedge': self.hedge,
+                'calls': self.calls,
+                'hedged': self.hedged,
+                'hedges_won': self.hedges_won,
+            }
+
+
+def get_tracker(host):
+    """
+    Returns the latency tracker of an upstream host, creating it from
+    settings.API_UPSTREAM_LATENCY on first use.
+
+    Args:
+        host (str): Upstream host name (e.g. 'restcountries.com').
+
+    Returns:
+        LatencyTracker: The shared tracker for that host.
+    """
+    tracker = _registry.get(host)
+    if tracker is not None:
+        return tracker
+    with _registry_lock:
+        tracker = _registry.get(host)
+        if tracker is None:
+            options = dict(DEFAULTS)
+            options.update(getattr(settings, 'API_UPSTREAM_LATENCY', {}))
+            options.update(options['HOSTS'].get(host, {}))
+            tracker = LatencyTracker(
+                host,
+                samples=options['SAMPLES'],
+                min_samples=options['MIN_SAMPLES'],
+                timeout_quantile=options['TIMEOUT_QUANTILE'],
+                timeout_factor=options['TIMEOUT_FACTOR'],
+                min_timeout=options['MIN_TIMEOUT'],
+                hedge=options['HEDGE'],
+                hedge_quantile=options['HEDGE_QUANTILE'],
+                hedge_ratio=options['HEDGE_RATIO'],
+            )
+            _registry[host] = tracker
+        return tracker
+
+
+def all_trackers():
+    """
+    Returns every registered tracker.
+
+    Returns:
+        list: LatencyTracker instances in registration order.
+    """
+    with _registry_lock:
+        return list(_registry.values())
@@ -0,0 +1,365 @@
+"""
+Metrics Service Module
+
+This module records request, upstream and service metrics and renders them in
+the Prometheus text exposition format for /metrics.
+
+Metrics recorded:
+    - api_requests_total{endpoint,method,status}: Requests handled (counter)
+    - api_request_duration_seconds{endpoint}: Request latency (histogram)
+    - api_requests_in_flight: Requests being handled (gauge)
+    - api_upstream_calls_total{host,outcome}: Upstream calls by result, 'ok' or
+      the exception ('http_503', 'Timeout', 'CircuitOpenError', ...) (counter)
+    - api_upstream_duration_seconds{host}: Upstream call latency (histogram)
+    - api_upstream_in_flight{host}: Upstream calls in progress (gauge)
+    - api_rate_limit_wait_seconds{host}: Time calls waited for a rate-limit
+      token (histogram); rejected calls count as outcome 'RateLimited'
+    - api_upstream_hedges_total{host,winner}: Hedged calls by the request that
+      answered first, 'primary', 'hedge' or 'none' (counter)
+    - api_service_calls_total{service,outcome}: Calls of each api/services
+      function, 'ok' or the exception class name (counter)
+    - api_service_duration_seconds{service}: Service function latency (histogram)
+    - api_cache_{hits,misses,evictions}_total{cache}: Response cache counters
+      of the in-process tier
+    - api_cache_shared_{hits,misses}_total{cache}: Lookups answered or missed
+      by the node-local shared tier (counter)
+    - api_cache_refreshes_total{cache}: Entries reloaded by the warm-up and
+      refresh-ahead (counter)
+    - api_circuit_breaker_open{host}: 1 while a breaker is not closed (gauge)
+
+Recording only updates in-memory numbers under one lock. Each gunicorn worker
+has its own numbers, so for multi-process servers set API_METRICS['DIR'] (env
+API_METRICS_DIR) to a directory shared by the workers: every process then
+writes a snapshot file there every FLUSH_SECONDS, and a scrape merges the
+files of all workers. Gauges of workers that have exited are dropped; their
+counters and histograms are kept so totals never go backwards.
+
+The module is configured through the API_METRICS setting:
+    - ENABLED (bool): Record metrics (default True)
+    - DIR (str): Snapshot directory for multi-process mode (default None)
+    - FLUSH_SECONDS (float): Snapshot interval in multi-process mode (default 5)
+    - TOKEN (str): Bearer token a scraper sends to read /metrics; staff users
+      and the admin token are always allowed (default None, see
+      api/permissions.py)
+"""
+
+import functools
+import glob
+import json
+import os
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+
+DEFAULTS = {
+    'ENABLED': True,
+    'DIR': None,
+    'FLUSH_SECONDS': 5,
+    'TOKEN': None,
+}
+
+# Upper bounds in seconds, as in the Prometheus client libraries
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+# name: (type, help)
+FAMILIES = {
+    'api_requests_total': ('counter', 'HTTP requests handled.'),
+    'api_request_duration_seconds': ('histogram', 'HTTP request latency.'),
+    'api_requests_in_flight': ('gauge', 'HTTP requests being handled.'),
+    'api_upstream_calls_total': ('counter', 'Upstream API calls by outcome.'),
+    'api_upstream_duration_seconds': ('histogram', 'Upstream API call latency.'),
+    'api_upstream_in_flight': ('gauge', 'Upstream API calls in progress.'),
+    'api_rate_limit_wait_seconds': ('histogram', 'Time upstream calls waited for a rate-limit token.'),
+    'api_upstream_hedges_total': ('counter', 'Hedged upstream calls by the request that answered first.'),
+    'api_service_calls_total': ('counter', 'Service function calls by outcome.'),
+    'api_service_duration_seconds': ('histogram', 'Service function latency.'),
+    'api_cache_hits_total': ('counter', 'Response cache hits.'),
+    'api_cache_misses_total': ('counter', 'Response cache misses.'),
+    'api_cache_evictions_total': ('counter', 'Response cache evictions.'),
+    'api_cache_shared_hits_total': ('counter', 'Shared cache tier hits.'),
+    'api_cache_shared_misses_total': ('counter', 'Shared cache tier misses.'),
+    'api_cache_refreshes_total': ('counter', 'Response cache entries reloaded ahead of requests.'),
+    'api_circuit_breaker_open': ('gauge', 'Whether the upstream circuit breaker is open or half-open.'),
+}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_histograms = {}
+_pid = None
+
+
+def get_config():
+    """
+    Returns the metrics configuration merged over DEFAULTS.
+    """
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'API_METRICS', {}))
+    return config
+
+
+def enabled():
+    """
+    Returns whether metrics are recorded (API_METRICS['ENABLED']).
+    """
+    return getattr(settings, 'API_METRICS', {}).get('ENABLED', DEFAULTS['ENABLED'])
+
+
+def _ensure_process():
+    # A forked worker starts from zero and gets its own flush thread.
+    global _pid
+    pid = os.getpid()
+    if _pid == pid:
+        return
+    with _lock:
+        if _pid == pid:
+            return
+        _pid = pid
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+    if get_config()['DIR']:
+        threading.Thread(target=_flush_forever, name='metrics-flush', daemon=True).start()
+
+
+def inc(name, labels=(), value=1):
+    """
+    Adds value to a counter. labels is a tuple of (label, value) pairs.
+    """
+    _ensure_process()
+    key = (name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def add_gauge(name, labels=(), value=1):
+    """
+    Adds value (which may be negative) to a gauge.
+    """
+    _ensure_process()
+    key = (name, labels)
+    with _lock:
+        _gauges[key] = _gauges.get(key, 0) + value
+
+
+def observe(name, labels, seconds):
+    """
+    Records one observation in a histogram.
+    """
+    _ensure_process()
+    key = (name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            # Per-bucket counts, then sum and count
+            histogram = _histograms[key] = [0] * len(BUCKETS) + [0.0, 0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram[i] += 1
+                break
+        histogram[-2] += seconds
+        histogram[-1] += 1
+
+
+def outcome_of(exc):
+    """
+    Returns the outcome label of a failed call: 'http_<status>' for HTTP errors
+    carrying a response, otherwise the exception class name.
+    """
+    response = getattr(exc, 'response', None)
+    status_code = getattr(response, 'status_code', None)
+    if status_code is not None:
+        return f'http_{status_code}'
+    return type(exc).__name__
+
+
+def instrumented(fn):
+    """
+    Decorator counting calls and timing a sync or async service function.
+
+    Usage:
+        @instrumented
+        def country_data(country): ...
+    """
+    labels = (('service', fn.__name__),)
+
+    def record(start, outcome):
+        if not enabled():
+            return
+        observe('api_service_duration_seconds', labels, time.perf_counter() - start)
+        inc('api_service_calls_total', labels + (('outcome', outcome),))
+
+    if iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapped(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as exc:
+                record(start, outcome_of(exc))
+                raise
+            record(start, 'ok')
+            return result
+    else:
+        @functools.wraps(fn)
+        def wrapped(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as exc:
+                record(start, outcome_of(exc))
+                raise
+            record(start, 'ok')
+            return result
+    return wrapped
+
+
+def _collect():
+    # Point-in-time values owned by other modules, refreshed before a snapshot.
+    from . import cache, circuit_breaker
+
+    collected = {}
+    for stats in (c.stats() for c in cache.all_caches()):
+        labels = (('cache', stats['name']),)
+        collected[('api_cache_hits_total', labels)] = stats['hits']
+        collected[('api_cache_misses_total', labels)] = stats['misses']
+        collected[('api_cache_evictions_total', labels)] = stats['evictions']
+        collected[('api_cache_refreshes_total', labels)] = stats['refreshes']
+        if stats['shared'] is not None:
+            collected[('api_cache_shared_hits_total', labels)] = stats['shared']['hits']
+            collected[('api_cache_shared_misses_total', labels)] = stats['shared']['misses']
+    gauges = {}
+    for stats in (b.stats() for b in circuit_breaker.all_breakers()):
+        gauges[('api_circuit_breaker_open', (('host', stats['name']),))] = int(stats['state'] != 'closed')
+    return collected, gauges
+
+
+def snapshot():
+    """
+    Returns this process's metrics as a JSON-serializable dict.
+    """
+    _ensure_process()
+    collected, collected_gauges = _collect()
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        histograms = {key: list(value) for key, value in _histograms.items()}
+    counters.update(collected)
+    gauges.update(collected_gauges)
+    return {
+        'pid': os.getpid(),
+        'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+        'gauges': [[name, list(labels), value] for (name, labels), value in gauges.items()],
+        'histograms': [[name, list(labels), value] for (name, labels), value in histograms.items()],
+    }
+
+
+def flush():
+    """
+    Writes this process's snapshot into the multi-process directory.
+    """
+    directory = get_config()['DIR']
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'metrics-{os.getpid()}.json')
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+def _flush_forever():
+    while True:
+        time.sleep(get_config()['FLUSH_SECONDS'])
+        try:
+            flush()
+        except OSError:
+            pass
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _snapshots():
+    directory = get_config()['DIR']
+    if not directory:
+        return [snapshot()]
+    flush()
+    snapshots = []
+    for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def merged():
+    """
+    Merges the snapshots of every process into (counters, gauges, histograms),
+    each keyed by (name, labels).
+    """
+    counters, gauges, histograms = {}, {}, {}
+    for snap in _snapshots():
+        alive = snap['pid'] == os.getpid() or _alive(snap['pid'])
+        for name, labels, value in snap['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        if alive:
+            for name, labels, value in snap['gauges']:
+                key = (name, tuple(map(tuple, labels)))
+                gauges[key] = gauges.get(key, 0) + value
+        for name, labels, value in snap['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            current = histograms.get(key)
+            histograms[key] = value if current is None else [a + b for a, b in zip(current, value)]
+    return counters, gauges, histograms
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def render():
+    """
+    Returns every metric in the Prometheus text exposition format.
+    """
+    counters, gauges, histograms = merged()
+    samples = {}
+    for (name, labels), value in sorted(list(counters.items()) + list(gauges.items())):
+        samples.setdefault(name, []).append(f'{name}{_format_labels(labels)} {value}')
+    for (name, labels), value in sorted(histograms.items()):
+        lines = samples.setdefault(name, [])
+        cumulative = 0
+        for bound, count in zip(BUCKETS, value):
+            cumulative += count
+            lines.append(f'{name}_bucket{_format_labels(labels + (("le", repr(bound)),))} {cumulative}')
+        lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {value[-1]}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {value[-2]}')
+        lines.append(f'{name}_count{_format_labels(labels)} {value[-1]}')
+
+    output = []
+    for name, (kind, help_text) in FAMILIES.items():
+        output.append(f'# HELP {name} {help_text}')
+        output.append(f'# TYPE {name} {kind}')
+        output.extend(samples.get(name, ()))
+    return '\n'.join(output) + '\n'
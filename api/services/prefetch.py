@@ -0,0 +1,246 @@
+"""
+Prefetch Buffer Service Module
+
+This module keeps a bounded in-memory buffer of pre-fetched items for the
+"something random" endpoints (dog, cat, joke, advice, quotes). A background
+thread refills the buffer whenever it drops below its low-water mark, so
+requests are served from memory and never wait on the upstream while items
+are available.
+
+Buffers are registered by name and configured through the API_PREFETCH setting;
+services without an entry are not buffered and always fetch live:
+    API_PREFETCH = {
+        'dog_api': {
+            'CAPACITY': 20,        # maximum items kept
+            'LOW_WATER': 5,        # refill when fewer items remain
+            'ON_EMPTY': 'fetch',   # 'fetch' live, or 'block' until refilled
+            'BLOCK_TIMEOUT': 1.0,  # seconds to wait when ON_EMPTY is 'block'
+        },
+    }
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+DEFAULTS = {
+    'CAPACITY': 20,
+    'LOW_WATER': 5,
+    'ON_EMPTY': 'fetch',
+    'BLOCK_TIMEOUT': 1.0,
+}
+
+# Window in seconds over which refill_rate is computed
+RATE_WINDOW = 60
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class PrefetchBuffer:
+    """
+    Bounded buffer of pre-fetched upstream results with a background refiller.
+
+    Items are handed out at most once, oldest first. The refill thread starts on
+    the first request in each process, so gunicorn workers never inherit it
+    from the master.
+
+    Args:
+        name (str): Buffer name used in statistics.
+        fetch (callable): Zero-argument sync function returning one item.
+        enabled (bool): When False, get() always calls fetch() directly.
+        capacity (int): Maximum number of items kept.
+        low_water (int): Refill starts when fewer items remain.
+        on_empty (str): 'fetch' to fall through to a live fetch when empty, or
+            'block' to wait up to block_timeout for the refill thread.
+        block_timeout (float): Seconds to wait when on_empty is 'block'.
+
+    Usage:
+        dog_buffer = PrefetchBuffer('dog_api', dog_api)
+        image_url = dog_buffer.get()
+    """
+
+    def __init__(self, name, fetch, enabled=True, capacity=DEFAULTS['CAPACITY'],
+                 low_water=DEFAULTS['LOW_WATER'], on_empty=DEFAULTS['ON_EMPTY'],
+                 block_timeout=DEFAULTS['BLOCK_TIMEOUT']):
+        if on_empty not in ('fetch', 'block'):
+            raise ValueError(f"on_empty must be 'fetch' or 'block', not {on_empty!r}")
+        self.name = name
+        self.fetch = fetch
+        self.enabled = enabled
+        self.capacity = capacity
+        self.low_water = min(low_water, capacity)
+        self.on_empty = on_empty
+        self.block_timeout = block_timeout
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._worker_pid = None
+        self._refill_times = deque()
+        self.hits = 0
+        self.misses = 0
+        self.refilled = 0
+        self.errors = 0
+
+    def _ensure_worker(self):
+        pid = os.getpid()
+        if self._worker_pid == pid:
+            return
+        with self._cond:
+            if self._worker_pid == pid:
+                return
+            self._worker_pid = pid
+            self._items.clear()
+            thread = threading.Thread(target=self._run, name=f'prefetch-{self.name}', daemon=True)
+            thread.start()
+
+    def _run(self):
+        failures = 0
+        while True:
+            with self._cond:
+                while len(self._items) >= self.low_water:
+                    self._cond.wait()
+
+            while True:
+                with self._cond:
+                    if len(self._items) >= self.capacity:
+                        break
+                try:
+                    item = self.fetch()
+                except Exception:
+                    self.errors += 1
+                    failures += 1
+                    time.sleep(min(30, 0.5 * 2 ** failures))
+                    continue
+
+                failures = 0
+                now = time.monotonic()
+                with self._cond:
+                    self._items.append(item)
+                    self.refilled += 1
+                    self._refill_times.append(now)
+                    self._cond.notify_all()
+
+    def _pop(self):
+        with self._cond:
+            if self._items:
+                self.hits += 1
+                item = self._items.popleft()
+                if len(self._items) < self.low_water:
+                    self._cond.notify_all()
+                return True, item
+            self.misses += 1
+            return False, None
+
+    def _wait_item(self):
+        with self._cond:
+            self._cond.notify_all()
+            if self._cond.wait_for(lambda: self._items, timeout=self.block_timeout):
+                return self._items.popleft()
+        raise requests.exceptions.Timeout(f'Prefetch buffer {self.name!r} is empty')
+
+    def get(self):
+        """
+        Returns one item, from memory when available.
+
+        Raises:
+            requests.exceptions.RequestException: If the buffer is empty and the
+                live fetch fails, or (ON_EMPTY 'block') no item arrived in time.
+        """
+        if not self.enabled:
+            return self.fetch()
+
+        self._ensure_worker()
+        found, item = self._pop()
+        if found:
+            return item
+        if self.on_empty == 'block':
+            return self._wait_item()
+        return self.fetch()
+
+    async def aget(self, afetch):
+        """
+        Async counterpart of get(); afetch is the async live fetch used on a miss.
+        """
+        if not self.enabled:
+            return await afetch()
+
+        self._ensure_worker()
+        found, item = self._pop()
+        if found:
+            return item
+        if self.on_empty == 'block':
+            return await sync_to_async(self._wait_item, thread_sensitive=False)()
+        return await afetch()
+
+    def stats(self):
+        """
+        Returns a snapshot of the buffer counters.
+
+        Returns:
+            dict: Keys 'name', 'enabled', 'depth', 'capacity', 'low_water',
+                  'on_empty', 'hits', 'misses', 'refilled', 'errors' and
+                  'refill_rate' (items per second over the last minute).
+        """
+        with self._cond:
+            cutoff = time.monotonic() - RATE_WINDOW
+            while self._refill_times and self._refill_times[0] < cutoff:
+                self._refill_times.popleft()
+            return {
+                'name': self.name,
+                'enabled': self.enabled,
+                'depth': len(self._items),
+                'capacity': self.capacity,
+                'low_water': self.low_water,
+                'on_empty': self.on_empty,
+                'hits': self.hits,
+                'misses': self.misses,
+                'refilled': self.refilled,
+                'errors': self.errors,
+                'refill_rate': len(self._refill_times) / RATE_WINDOW,
+            }
+
+
+def get_buffer(name, fetch):
+    """
+    Returns the named buffer, creating it from settings.API_PREFETCH on first use.
+
+    Args:
+        name (str): Buffer name, conventionally the service function name.
+        fetch (callable): Zero-argument sync function returning one item.
+
+    Returns:
+        PrefetchBuffer: The shared buffer instance for that name.
+    """
+    with _registry_lock:
+        buffer = _registry.get(name)
+        if buffer is None:
+            configured = getattr(settings, 'API_PREFETCH', {})
+            options = dict(DEFAULTS)
+            options.update(configured.get(name, {}))
+            buffer = PrefetchBuffer(
+                name,
+                fetch,
+                enabled=name in configured,
+                capacity=options['CAPACITY'],
+                low_water=options['LOW_WATER'],
+                on_empty=options['ON_EMPTY'],
+                block_timeout=options['BLOCK_TIMEOUT'],
+            )
+            _registry[name] = buffer
+        return buffer
+
+
+def all_buffers():
+    """
+    Returns every registered buffer.
+
+    Returns:
+        list: PrefetchBuffer instances in registration order.
+    """
+    with _registry_lock:
+        return list(_registry.values())
@@ -1,9 +1,319 @@
+"""
+Quotes API Service Module
+
+This module serves /api/quotes/ from a pool of zenquotes.io quotes instead of
+calling the upstream once per request. zenquotes allows about 5 requests per
+30 seconds per client IP, while its bulk endpoint returns 50 random quotes per
+call, so a pool refilled from the bulk endpoint answers any request rate with
+a few upstream calls per hour.
+
+The pool:
+    - Stores each quote once, as a compact (quote, author) tuple, deduplicated
+      case- and whitespace-insensitively; the oldest quotes are overwritten
+      when it is full
+    - Is filled on the first request of each worker (one call, shared by every
+      concurrent caller) and then refreshed by a background thread every
+      REFRESH_SECONDS
+    - Never sends more than BUDGET requests per WINDOW_SECONDS from one worker;
+      a refresh that would exceed the budget is skipped
+    - Skips malformed records; a failed refresh is logged and the thread
+      tries again after REFRESH_SECONDS
+
+The pool is configured through the API_QUOTE_POOL setting:
+    - CAPACITY (int): Maximum quotes kept (default 1000)
+    - REFRESH_SECONDS (float): Interval between bulk fetches (default 120)
+    - BUDGET (int): Upstream requests allowed per window (default 5)
+    - WINDOW_SECONDS (float): Length of the budget window (default 30)
+
+Every gunicorn worker keeps its own pool; with W workers the upstream sees W
+calls per REFRESH_SECONDS, so keep REFRESH_SECONDS above W * WINDOW_SECONDS /
+BUDGET.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+
 import requests
+from django.conf import settings
+
+from . import http_client
+from .cache import normalize_key
+from .metrics import instrumented
+from .single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Bulk endpoint returning 50 random quotes per call
+URL = 'https://zenquotes.io/api/quotes'
+
+DEFAULTS = {
+    'CAPACITY': 1000,
+    'REFRESH_SECONDS': 120,
+    'BUDGET': 5,
+    'WINDOW_SECONDS': 30,
+}
+
+
+def get_config():
+    """
+    Returns DEFAULTS updated with the values from settings.API_QUOTE_POOL.
+    """
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'API_QUOTE_POOL', {}))
+    return config
 
 
-URL ='https://zenquotes.io/api/random'
+class BudgetExceeded(requests.exceptions.RequestException):
+    """
+    Raised instead of calling zenquotes when the request budget is used up.
+    """
 
+
+class InvalidReply(requests.exceptions.RequestException):
+    """
+    Raised when zenquotes answers with something other than a list of quotes.
+    """
+
+
+@instrumented
 def quotes_api():
-    response = requests.get(URL, timeout=5)
-    response.raise_for_status()
-    return response.json()
\ No newline at end of file
+    """
+    Fetches one batch of random quotes from the zenquotes bulk endpoint.
+
+    Returns:
+        list: Quote records with 'q' (quote), 'a' (author) and 'h' (HTML) keys.
+
+    Raises:
+        requests.exceptions.RequestException: If the HTTP request fails or times out.
+    """
+    response = http_client.get(URL)
+    return response.json()
+
+
+@instrumented
+async def quotes_api_async():
+    return await http_client.aget_json(URL)
+
+
+class QuotePool:
+    """
+    Deduplicated pool of quotes refreshed from the zenquotes bulk endpoint.
+
+    Args:
+        name (str): Pool name used in statistics.
+        capacity (int): Maximum quotes kept.
+        refresh_seconds (float): Interval between background refreshes.
+        budget (int): Upstream requests allowed per window.
+        window_seconds (float): Length of the budget window.
+
+    Usage:
+        quote_pool = QuotePool('quotes_api')
+        quotes = quote_pool.get(3)          # three distinct quotes
+        quotes = await quote_pool.aget(3)
+    """
+
+    def __init__(self, name, capacity=DEFAULTS['CAPACITY'], refresh_seconds=DEFAULTS['REFRESH_SECONDS'],
+                 budget=DEFAULTS['BUDGET'], window_seconds=DEFAULTS['WINDOW_SECONDS']):
+        self.name = name
+        self.capacity = capacity
+        self.refresh_seconds = refresh_seconds
+        self.budget = budget
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._flight = SingleFlight(name)
+        self._quotes = []
+        self._keys = set()
+        self._next = 0
+        self._calls = deque()
+        self._worker_pid = None
+        self.fetched = 0
+        self.added = 0
+        self.duplicates = 0
+        self.skipped = 0
+        self.invalid = 0
+        self.errors = 0
+        self.served = 0
+        self.refreshed_at = None
+
+    def _reserve(self):
+        # Takes one request from the budget, or returns False when it is used up.
+        now = time.monotonic()
+        with self._lock:
+            while self._calls and self._calls[0] <= now - self.window_seconds:
+                self._calls.popleft()
+            if len(self._calls) >= self.budget:
+                self.skipped += 1
+                return False
+            self._calls.append(now)
+            return True
+
+    def add(self, records):
+        """
+        Adds quote records, skipping quotes already in the pool and records
+        without a non-empty string 'q' and a string 'a'.
+
+        Returns:
+            int: Number of quotes added.
+
+        Raises:
+            InvalidReply: If records is not a list.
+        """
+        if not isinstance(records, list):
+            raise InvalidReply(f'Unexpected zenquotes reply of type {type(records).__name__}')
+        added = 0
+        with self._lock:
+            for record in records:
+                quote = record.get('q') if isinstance(record, dict) else None
+                author = record.get('a') if isinstance(record, dict) else None
+                if not isinstance(quote, str) or not quote.strip() or not isinstance(author, str):
+                    self.invalid += 1
+                    continue
+                key = normalize_key(quote)
+                if key in self._keys:
+                    self.duplicates += 1
+                    continue
+                if len(self._quotes) < self.capacity:
+                    self._quotes.append((quote, author))
+                else:
+                    # Full: overwrite the oldest quote.
+                    self._keys.discard(normalize_key(self._quotes[self._next][0]))
+                    self._quotes[self._next] = (quote, author)
+                    self._next = (self._next + 1) % self.capacity
+                self._keys.add(key)
+                added += 1
+            self.fetched += len(records)
+            self.added += added
+            self.refreshed_at = time.time()
+        return added
+
+    def refresh(self):
+        """
+        Fetches one batch into the pool if the budget allows.
+
+        Raises:
+            BudgetExceeded: If the budget is used up.
+            requests.exceptions.RequestException: If the upstream call fails.
+        """
+        if not self._reserve():
+            raise BudgetExceeded(f'Request budget of quote pool {self.name!r} is used up')
+        try:
+            return self.add(quotes_api())
+        except requests.exceptions.RequestException:
+            self.errors += 1
+            raise
+
+    async def arefresh(self):
+        """
+        Async counterpart of refresh().
+        """
+        if not self._reserve():
+            raise BudgetExceeded(f'Request budget of quote pool {self.name!r} is used up')
+        try:
+            return self.add(await quotes_api_async())
+        except requests.exceptions.RequestException:
+            self.errors += 1
+            raise
+
+    def _ensure_worker(self):
+        pid = os.getpid()
+        if self._worker_pid == pid:
+            return
+        with self._lock:
+            if self._worker_pid == pid:
+                return
+            self._worker_pid = pid
+            thread = threading.Thread(target=self._run, name=f'quote-pool-{self.name}', daemon=True)
+            thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.refresh_seconds)
+            try:
+                self.refresh()
+            except BudgetExceeded:
+                pass
+            except (requests.exceptions.RequestException, ValueError, KeyError, TypeError) as exc:
+                # Whatever the reply held, the next refresh gets a new chance.
+                logger.warning('Refresh of quote pool %s failed: %r', self.name, exc)
+
+    def _sample(self, count):
+        with self._lock:
+            picked = random.sample(self._quotes, min(count, len(self._quotes)))
+            self.served += len(picked)
+        return [{'q': quote, 'a': author} for quote, author in picked]
+
+    def get(self, count=1):
+        """
+        Returns up to count distinct quotes, filling an empty pool first.
+
+        Args:
+            count (int): Number of quotes wanted.
+
+        Returns:
+            list: Quote records with 'q' and 'a' keys; fewer than count only
+                  while the pool holds fewer quotes.
+
+        Raises:
+            requests.exceptions.RequestException: If the pool is empty and
+                filling it failed or the budget is used up.
+        """
+        self._ensure_worker()
+        if not self._quotes:
+            self._flight.do('refresh', self.refresh)
+        return self._sample(count)
+
+    async def aget(self, count=1):
+        """
+        Async counterpart of get(); only an empty pool awaits the upstream.
+        """
+        self._ensure_worker()
+        if not self._quotes:
+            await self._flight.ado('refresh', self.arefresh)
+        return self._sample(count)
+
+    def stats(self):
+        """
+        Returns a snapshot of the pool counters.
+
+        Returns:
+            dict: Keys 'name', 'size', 'capacity', 'fetched', 'added',
+                  'duplicates', 'invalid' (malformed records skipped),
+                  'served', 'errors', 'skipped' (refreshes refused by the
+                  budget), 'budget_used' (requests in the current window)
+                  and 'refreshed_seconds_ago'.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                'name': self.name,
+                'size': len(self._quotes),
+                'capacity': self.capacity,
+                'fetched': self.fetched,
+                'added': self.added,
+                'duplicates': self.duplicates,
+                'invalid': self.invalid,
+                'served': self.served,
+                'errors': self.errors,
+                'skipped': self.skipped,
+                'budget_used': sum(1 for called in self._calls if called > now - self.window_seconds),
+                'refreshed_seconds_ago': None if self.refreshed_at is None else round(time.time() - self.refreshed_at, 1),
+            }
+
+
+def _build_pool():
+    config = get_config()
+    return QuotePool(
+        'quotes_api',
+        capacity=config['CAPACITY'],
+        refresh_seconds=config['REFRESH_SECONDS'],
+        budget=config['BUDGET'],
+        window_seconds=config['WINDOW_SECONDS'],
+    )
+
+
+# Pool served by the views
+quote_pool = _build_pool()
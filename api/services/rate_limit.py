@@ -0,0 +1,356 @@
+"""
+Rate Limit Service Module
+
+This module provides one token bucket per upstream host, shared by every worker
+process on the node, so the combined request rate to an upstream stays within
+its limits however many gunicorn workers run. Each upstream call takes one
+token (see api/services/http_client.py); tokens are refilled at RATE per second
+up to BURST.
+
+Buckets live in a small SQLite file (PATH). Every take is one short IMMEDIATE
+transaction, so all processes see the same buckets without an external
+service. Without PATH the buckets are kept per process.
+
+When no token is available, the host's POLICY decides:
+    - wait: Sleep until the reserved token is due, up to MAX_WAIT seconds;
+      callers that would wait longer fail with RateLimited
+    - fail: Fail at once with RateLimited
+    - stale: Fail at once with RateLimited, and caches answer with their
+      expired entry for the key instead (see api/services/cache.py)
+
+The limiter is configured through the API_RATE_LIMITS setting:
+    - PATH (str): SQLite file shared by the workers (default None: per process)
+    - HOSTS (dict): Limited hosts; hosts without an entry are not limited:
+        - RATE (float): Tokens added per second (default 1)
+        - BURST (int): Bucket size (default 1)
+        - POLICY (str): 'wait', 'fail' or 'stale' (default 'wait')
+        - MAX_WAIT (float): Longest wait under the 'wait' policy (default 5)
+
+If the SQLite file cannot be used (e.g. locked for longer than its timeout),
+calls are let through and counted in 'backend_errors' rather than failing.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ('wait', 'fail', 'stale')
+
+DEFAULTS = {
+    'PATH': None,
+    'HOSTS': {},
+}
+
+HOST_DEFAULTS = {
+    'RATE': 1,
+    'BURST': 1,
+    'POLICY': 'wait',
+    'MAX_WAIT': 5,
+}
+
+_registry = {}
+_registry_lock = threading.Lock()
+_backend = None
+
+
+class RateLimited(requests.exceptions.ConnectionError):
+    """
+    Raised instead of calling an upstream whose rate limit is exhausted.
+
+    It subclasses requests.exceptions.ConnectionError so existing
+    'except RequestException' handlers turn it into the usual 503 response.
+
+    Attributes:
+        retry_after (float): Seconds until a token would be available.
+        serve_stale (bool): True under the 'stale' policy; caches then answer
+            with their expired entry.
+    """
+
+    def __init__(self, host, retry_after, serve_stale=False):
+        super().__init__(f'Rate limit of {host} exceeded; retry in {retry_after:.2f}s')
+        self.retry_after = retry_after
+        self.serve_stale = serve_stale
+
+
+def take(state, now, rate, burst, max_wait):
+    """
+    Takes one token from a bucket.
+
+    Args:
+        state (tuple or None): (tokens, updated) of the bucket, None if new.
+        now (float): Current time in seconds.
+        rate (float): Tokens added per second.
+        burst (int): Bucket size.
+        max_wait (float): Longest acceptable wait for a token.
+
+    Returns:
+        tuple: (new state, (granted, wait)) where wait is the delay before the
+               token is due. When it would exceed max_wait nothing is taken and
+               granted is False. Tokens go negative while callers wait, so
+               later callers queue behind them.
+    """
+    if state is None:
+        tokens, updated = float(burst), now
+    else:
+        tokens, updated = state
+    # A wall clock stepped backwards refills nothing rather than the bucket.
+    tokens = min(float(burst), tokens + max(0.0, now - updated) * rate)
+    wait = max(0.0, (1 - tokens) / rate)
+    if wait > max_wait:
+        return (tokens, now), (False, wait)
+    return (tokens - 1, now), (True, wait)
+
+
+class MemoryBackend:
+    """
+    Buckets kept in this process only.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def update(self, host, fn):
+        with self._lock:
+            state, result = fn(self._buckets.get(host))
+            self._buckets[host] = state
+            return result
+
+
+class SQLiteBackend:
+    """
+    Buckets in a SQLite file shared by every process on the node.
+
+    Each thread of each process opens its own connection; a take is one
+    BEGIN IMMEDIATE transaction, which serializes concurrent takers.
+
+    Args:
+        path (str): SQLite file, created on first use.
+        timeout (float): Seconds to wait for another process's transaction.
+    """
+
+    def __init__(self, path, timeout=1.0):
+        self.path = str(path)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            # Buckets are soft state; losing the last writes on a crash is fine.
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS buckets (host TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def update(self, host, fn):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT tokens, updated FROM buckets WHERE host = ?', (host,)).fetchone()
+            state, result = fn(row)
+            connection.execute(
+                'INSERT OR REPLACE INTO buckets (host, tokens, updated) VALUES (?, ?, ?)',
+                (host, state[0], state[1]),
+            )
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return result
+
+
+class RateLimiter:
+    """
+    Token bucket of one upstream host.
+
+    Args:
+        host (str): Upstream host name.
+        backend (MemoryBackend or SQLiteBackend): Where the bucket lives.
+        rate (float): Tokens added per second.
+        burst (int): Bucket size.
+        policy (str): 'wait', 'fail' or 'stale'.
+        max_wait (float): Longest wait under the 'wait' policy.
+
+    Usage:
+        limiter = RateLimiter('zenquotes.io', MemoryBackend(), rate=5 / 30, burst=5)
+        time.sleep(limiter.reserve())
+    """
+
+    def __init__(self, host, backend, rate=HOST_DEFAULTS['RATE'], burst=HOST_DEFAULTS['BURST'],
+                 policy=HOST_DEFAULTS['POLICY'], max_wait=HOST_DEFAULTS['MAX_WAIT']):
+        if policy not in POLICIES:
+            raise ValueError(f'policy must be one of {POLICIES}, not {policy!r}')
+        self.host = host
+        self.backend = backend
+        self.rate = rate
+        self.burst = burst
+        self.policy = policy
+        self.max_wait = max_wait if policy == 'wait' else 0.0
+        self._lock = threading.Lock()
+        self.granted = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+        self.rejected = 0
+        self.backend_errors = 0
+
+    def reserve(self, max_wait=None):
+        """
+        Takes a token and returns the seconds to wait before using it.
+
+        Args:
+            max_wait (float, optional): Waits at most this long, even if the
+                policy allows more (0 takes a token only if one is free now).
+
+        Returns:
+            float: 0 when a token is available now.
+
+        Raises:
+            RateLimited: If no token is due within the policy's wait limit.
+        """
+        if max_wait is None or max_wait > self.max_wait:
+            max_wait = self.max_wait
+        try:
+            # The clock is read inside the transaction, so takes are applied in
+            # time order whichever process gets the lock first.
+            granted, wait = self.backend.update(
+                self.host, lambda state: take(state, time.time(), self.rate, self.burst, max_wait),
+            )
+        except sqlite3.Error:
+            logger.warning('Rate limit backend failed for %s; call let through', self.host, exc_info=True)
+            with self._lock:
+                self.backend_errors += 1
+            return 0.0
+
+        with self._lock:
+            if not granted:
+                self.rejected += 1
+            else:
+                self.granted += 1
+                if wait:
+                    self.waited += 1
+                    self.wait_seconds += wait
+        if not granted:
+            raise RateLimited(self.host, wait, serve_stale=self.policy == 'stale')
+        return wait
+
+    def stats(self):
+        """
+        Returns a snapshot of the limiter counters.
+
+        Returns:
+            dict: Keys 'name', 'rate', 'burst', 'policy', 'granted', 'waited',
+                  'wait_seconds', 'rejected' and 'backend_errors'.
+        """
+        with self._lock:
+            return {
+                'name': self.host,
+                'rate': self.rate,
+                'burst': self.burst,
+                'policy': self.policy,
+                'granted': self.granted,
+                'waited': self.waited,
+                'wait_seconds': round(self.wait_seconds, 3),
+                'rejected': self.rejected,
+                'backend_errors': self.backend_errors,
+            }
+
+
+def get_config():
+    """
+    Returns DEFAULTS updated with the values from settings.API_RATE_LIMITS.
+    """
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'API_RATE_LIMITS', {}))
+    return config
+
+
+def get_backend():
+    """
+    Returns the bucket backend: SQLite when PATH is set, otherwise in-memory.
+    """
+    global _backend
+    if _backend is None:
+        with _registry_lock:
+            if _backend is None:
+                path = get_config()['PATH']
+                _backend = SQLiteBackend(path) if path else MemoryBackend()
+    return _backend
+
+
+def get_limiter(host):
+    """
+    Returns the limiter of an upstream host, creating it from
+    settings.API_RATE_LIMITS on first use.
+
+    Args:
+        host (str): Upstream host name (e.g. 'zenquotes.io').
+
+    Returns:
+        RateLimiter or None: None when the host is not limited.
+    """
+    if host in _registry:
+        return _registry[host]
+    config = get_config()
+    options = config['HOSTS'].get(host)
+    backend = get_backend() if options is not None else None
+    with _registry_lock:
+        if host not in _registry:
+            if options is None:
+                _registry[host] = None
+            else:
+                options = dict(HOST_DEFAULTS, **options)
+                _registry[host] = RateLimiter(
+                    host,
+                    backend,
+                    rate=options['RATE'],
+                    burst=options['BURST'],
+                    policy=options['POLICY'],
+                    max_wait=options['MAX_WAIT'],
+                )
+        return _registry[host]
+
+
+def reserve(host, max_wait=None):
+    """
+    Takes a token for one call to host.
+
+    Args:
+        host (str): Upstream host name.
+        max_wait (float, optional): Longest acceptable wait, below the
+            host's own MAX_WAIT (see RateLimiter.reserve).
+
+    Returns:
+        float: Seconds the caller must wait before calling (0 for hosts
+               without a limit).
+
+    Raises:
+        RateLimited: If the host's policy rejects the call.
+    """
+    limiter = get_limiter(host)
+    return 0.0 if limiter is None else limiter.reserve(max_wait)
+
+
+def all_limiters():
+    """
+    Returns every configured limiter that has been used.
+
+    Returns:
+        list: RateLimiter instances in registration order.
+    """
+    with _registry_lock:
+        return [limiter for limiter in _registry.values() if limiter is not None]
@@ -0,0 +1,364 @@
+"""
+Shared Cache Service Module
+
+This module provides the node-local second tier of the response caches (see
+api/services/cache.py): a SQLite file that every worker process on the host
+reads and writes. A country fetched by one worker is then a hit for all of
+them, and each value is stored once per node instead of once per worker.
+
+Values are stored as compact binary blobs: marshal-encoded (the builtin types
+that upstream JSON decodes to) and zlib-compressed from COMPRESS_MIN_BYTES on.
+A two-byte header records the encoding and the marshal version; blobs in
+another format are treated as misses. Values marshal cannot encode are kept in
+the in-process tier only.
+
+Expiry uses wall-clock time, so every process agrees on it. Each cache keeps
+at most MAXSIZE entries in the file; the entries closest to expiry are pruned
+first.
+
+The file also keeps how often each key was requested, summed over all workers
+(see api/services/warmup.py). It outlives the workers, so the warm-up after a
+deploy knows which keys were hot before it.
+
+The store is configured through the API_SHARED_CACHE setting:
+    - PATH (str): SQLite file shared by the workers (default None: no shared
+      tier)
+    - MAXSIZE (int): Entries kept per cache (default 10000)
+    - COMPRESS_MIN_BYTES (int): Compress values of at least this many encoded
+      bytes (default 512)
+
+If the file cannot be used (e.g. locked for longer than its timeout), lookups
+count as misses and writes are skipped; both are counted in 'errors'.
+"""
+
+import logging
+import marshal
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'PATH': None,
+    'MAXSIZE': 10000,
+    'COMPRESS_MIN_BYTES': 512,
+}
+
+# Writes per cache between two prunes of its expired and surplus entries
+PRUNE_EVERY = 100
+
+RAW = b'm'
+COMPRESSED = b'z'
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def encode(value, compress_min_bytes=DEFAULTS['COMPRESS_MIN_BYTES']):
+    """
+    Encodes a value as a compact binary blob.
+
+    Raises:
+        ValueError: If the value contains types marshal cannot encode.
+    """
+    data = marshal.dumps(value)
+    if len(data) >= compress_min_bytes:
+        return COMPRESSED + bytes([marshal.version]) + zlib.compress(data, 1)
+    return RAW + bytes([marshal.version]) + data
+
+
+def decode(blob):
+    """
+    Decodes a blob written by encode().
+
+    Raises:
+        ValueError: If the blob was written in another format.
+    """
+    kind, version, data = blob[:1], blob[1], blob[2:]
+    if version != marshal.version or kind not in (RAW, COMPRESSED):
+        raise ValueError('Unknown shared cache entry format')
+    if kind == COMPRESSED:
+        data = zlib.decompress(data)
+    return marshal.loads(data)
+
+
+class SharedStore:
+    """
+    Cache entries in a SQLite file shared by every process on the node.
+
+    Each thread of each process opens its own connection. The file runs in WAL
+    mode, so readers never wait for a writer.
+
+    Args:
+        path (str): SQLite file, created on first use.
+        maxsize (int): Entries kept per cache.
+        compress_min_bytes (int): Compression threshold of encoded values.
+        timeout (float): Seconds to wait for another process's write.
+    """
+
+    def __init__(self, path, maxsize=DEFAULTS['MAXSIZE'], compress_min_bytes=DEFAULTS['COMPRESS_MIN_BYTES'],
+                 timeout=1.0):
+        self.path = str(path)
+        self.maxsize = maxsize
+        self.compress_min_bytes = compress_min_bytes
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            # Entries can be refetched; losing the last writes on a crash is fine.
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS entries (cache TEXT NOT NULL, key TEXT NOT NULL, '
+                'expires REAL NOT NULL, value BLOB NOT NULL, PRIMARY KEY (cache, key)) WITHOUT ROWID'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS entries_expires ON entries (cache, expires)')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS demand (cache TEXT NOT NULL, key TEXT NOT NULL, '
+                'hits INTEGER NOT NULL, seen REAL NOT NULL, PRIMARY KEY (cache, key)) WITHOUT ROWID'
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, cache, key):
+        """
+        Returns (value, seconds to expiry), or None on a miss.
+        """
+        row = self._connection().execute(
+            'SELECT expires, value FROM entries WHERE cache = ? AND key = ?', (cache, key),
+        ).fetchone()
+        if row is None:
+            return None
+        left = row[0] - time.time()
+        if left <= 0:
+            return None
+        return decode(row[1]), left
+
+    def set(self, cache, key, value, ttl):
+        """
+        Stores value for ttl seconds.
+
+        Returns:
+            int: Size of the stored blob in bytes.
+        """
+        blob = encode(value, self.compress_min_bytes)
+        self._connection().execute(
+            'INSERT OR REPLACE INTO entries (cache, key, expires, value) VALUES (?, ?, ?, ?)',
+            (cache, key, time.time() + ttl, blob),
+        )
+        return len(blob)
+
+    def prune(self, cache):
+        """
+        Deletes the cache's expired entries and those beyond maxsize.
+        """
+        connection = self._connection()
+        connection.execute('DELETE FROM entries WHERE cache = ? AND expires <= ?', (cache, time.time()))
+        connection.execute(
+            'DELETE FROM entries WHERE cache = ? AND key IN (SELECT key FROM entries WHERE cache = ? '
+            'ORDER BY expires DESC LIMIT -1 OFFSET ?)',
+            (cache, cache, self.maxsize),
+        )
+
+    def delete(self, cache, key):
+        """
+        Deletes an entry and its variants (see cache.variant_key).
+        """
+        prefix = f'{key}|'
+        self._connection().execute(
+            'DELETE FROM entries WHERE cache = ? AND (key = ? OR substr(key, 1, ?) = ?)',
+            (cache, key, len(prefix), prefix),
+        )
+
+    def clear(self, cache):
+        self._connection().execute('DELETE FROM entries WHERE cache = ?', (cache,))
+
+    def add_demand(self, cache, counts, max_age):
+        """
+        Adds lookup counts per key and forgets keys not requested for max_age
+        seconds.
+        """
+        now = time.time()
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(
+                'INSERT INTO demand (cache, key, hits, seen) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (cache, key) DO UPDATE SET hits = hits + excluded.hits, seen = excluded.seen',
+                [(cache, key, hits, now) for key, hits in counts.items()],
+            )
+            connection.execute('DELETE FROM demand WHERE cache = ? AND seen < ?', (cache, now - max_age))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+    def hot_keys(self, cache, limit, max_age):
+        """
+        Returns the limit most requested keys seen within max_age seconds,
+        most requested first.
+        """
+        rows = self._connection().execute(
+            'SELECT key FROM demand WHERE cache = ? AND seen >= ? ORDER BY hits DESC LIMIT ?',
+            (cache, time.time() - max_age, limit),
+        )
+        return [row[0] for row in rows]
+
+    def size(self, cache):
+        return self._connection().execute('SELECT COUNT(*) FROM entries WHERE cache = ?', (cache,)).fetchone()[0]
+
+
+class SharedTier:
+    """
+    One cache's view of the shared store, with its own counters.
+
+    Every method swallows store errors (logged and counted), so a broken or
+    busy file degrades the cache to its in-process tier instead of failing
+    requests.
+
+    Usage:
+        tier = SharedTier(get_store(), 'country_data')
+        tier.set('france', records, ttl=86400)
+        found, records, left = tier.get('france')
+    """
+
+    def __init__(self, store, name):
+        self.store = store
+        self.name = name
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.bytes_written = 0
+        self.errors = 0
+
+    def _failed(self, action):
+        logger.warning('Shared cache %s failed to %s', self.name, action, exc_info=True)
+        with self._lock:
+            self.errors += 1
+
+    def get(self, key):
+        """
+        Returns (found, value, seconds to expiry).
+        """
+        try:
+            entry = self.store.get(self.name, key)
+        except (sqlite3.Error, ValueError, EOFError, TypeError, zlib.error):
+            self._failed('read')
+            entry = None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return False, None, 0.0
+            self.hits += 1
+        return True, entry[0], entry[1]
+
+    def set(self, key, value, ttl):
+        try:
+            size = self.store.set(self.name, key, value, ttl)
+        except ValueError:
+            # Not marshal-encodable; the value stays in the in-process tier.
+            return
+        except sqlite3.Error:
+            self._failed('write')
+            return
+        with self._lock:
+            self.writes += 1
+            self.bytes_written += size
+            prune = self.writes % PRUNE_EVERY == 0
+        if prune:
+            try:
+                self.store.prune(self.name)
+            except sqlite3.Error:
+                self._failed('prune')
+
+    def delete(self, key):
+        try:
+            self.store.delete(self.name, key)
+        except sqlite3.Error:
+            self._failed('delete')
+
+    def clear(self):
+        try:
+            self.store.clear(self.name)
+        except sqlite3.Error:
+            self._failed('clear')
+
+    def add_demand(self, counts, max_age):
+        try:
+            self.store.add_demand(self.name, counts, max_age)
+        except sqlite3.Error:
+            self._failed('record demand')
+
+    def hot_keys(self, limit, max_age):
+        try:
+            return self.store.hot_keys(self.name, limit, max_age)
+        except sqlite3.Error:
+            self._failed('read demand')
+            return []
+
+    def stats(self):
+        """
+        Returns a snapshot of the tier counters.
+
+        Returns:
+            dict: Keys 'size' (entries in the file, None if unreadable),
+                  'maxsize', 'hits', 'misses', 'hit_ratio' (of the lookups
+                  the in-process tier missed), 'writes', 'avg_entry_bytes'
+                  and 'errors'.
+        """
+        try:
+            size = self.store.size(self.name)
+        except sqlite3.Error:
+            size = None
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': size,
+                'maxsize': self.store.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'writes': self.writes,
+                'avg_entry_bytes': round(self.bytes_written / self.writes) if self.writes else 0,
+                'errors': self.errors,
+            }
+
+
+def get_config():
+    """
+    Returns DEFAULTS updated with the values from settings.API_SHARED_CACHE.
+    """
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'API_SHARED_CACHE', {}))
+    return config
+
+
+def get_store():
+    """
+    Returns the process-wide SharedStore, or None when no PATH is configured.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                config = get_config()
+                if not config['PATH']:
+                    return None
+                _store = SharedStore(
+                    config['PATH'],
+                    maxsize=config['MAXSIZE'],
+                    compress_min_bytes=config['COMPRESS_MIN_BYTES'],
+                )
+    return _store
@@ -0,0 +1,174 @@
+"""
+Single-Flight Service Module
+
+This module coalesces identical concurrent upstream calls. While a call for a
+key is in flight, further callers asking for the same key do not start their
+own call; they wait for the first one and receive its result or its exception.
+When a country trends, fifty simultaneous lookups of 'Nigeria' therefore cost
+one upstream request instead of fifty.
+
+Both worker models are supported:
+    - do(): Threads of a WSGI worker; the first caller runs the function and
+      the others block until it finishes
+    - ado(): Coroutines on an event loop; the call runs as a task that every
+      caller awaits, so one caller being cancelled does not cancel the others
+
+The shared call runs under its leader's request deadline (see
+api/services/deadline.py), which a client can shorten. When it fails with
+DeadlineExceeded, followers whose own deadline has time left do not inherit
+that failure: they retry, so one impatient client cannot fail everyone
+waiting on a hot key.
+
+Nothing is remembered once a call finishes; keeping results is the job of the
+response cache (see api/services/cache.py), which routes its misses through a
+SingleFlight group.
+"""
+
+import asyncio
+import threading
+import weakref
+
+from . import deadline
+
+
+class _Call:
+    """
+    One in-flight threaded call shared by its leader and followers.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+def _retry_after(error):
+    # True when a follower should make the call itself instead of sharing a
+    # failure that only the leader's shorter deadline caused.
+    if not isinstance(error, deadline.DeadlineExceeded):
+        return False
+    left = deadline.remaining()
+    return left is None or left > 0
+
+
+class SingleFlight:
+    """
+    Group of in-flight calls keyed by an upstream key.
+
+    Args:
+        name (str): Group name used in statistics.
+
+    Usage:
+        flight = SingleFlight('country_data')
+        data = flight.do('nigeria', lambda: fetch_country('Nigeria'))
+        data = await flight.ado('nigeria', lambda: fetch_country_async('Nigeria'))
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._tasks = weakref.WeakKeyDictionary()
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """
+        Runs fn() once for all threads concurrently asking for key.
+
+        Args:
+            key (hashable): Identity of the upstream call.
+            fn (callable): Zero-argument function performing the call.
+
+        Returns:
+            The value returned by the shared call.
+
+        Raises:
+            Exception: Whatever the shared call raised, re-raised in every
+                caller; followers retry a call that missed the leader's
+                deadline instead while their own deadline allows.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                if _retry_after(call.error):
+                    return self.do(key, fn)
+                raise call.error
+            return call.value
+
+        try:
+            call.value = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
+    async def ado(self, key, fn):
+        """
+        Async counterpart of do(); fn returns an awaitable.
+
+        In-flight calls are tracked per event loop. The call runs as its own
+        task and callers await it through asyncio.shield(), so a disconnected
+        client only cancels its own wait.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            tasks = self._tasks.get(loop)
+            if tasks is None:
+                tasks = self._tasks[loop] = {}
+            task = tasks.get(key)
+            leader = task is None
+            if leader:
+                task = tasks[key] = loop.create_task(fn())
+                task.add_done_callback(lambda done: self._forget(tasks, key, done))
+                self.executed += 1
+            else:
+                self.coalesced += 1
+        try:
+            return await asyncio.shield(task)
+        except deadline.DeadlineExceeded as exc:
+            # The task was forgotten before its waiters resumed, so a retry
+            # starts or joins a new call.
+            if leader or not _retry_after(exc):
+                raise
+        return await self.ado(key, fn)
+
+    def _forget(self, tasks, key, task):
+        with self._lock:
+            if tasks.get(key) is task:
+                del tasks[key]
+        # Mark the outcome as retrieved even if every caller was cancelled.
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        """
+        Returns a snapshot of the coalescing counters.
+
+        Returns:
+            dict: Keys 'in_flight', 'executed' (calls actually made),
+                  'coalesced' (callers that shared another call) and
+                  'coalesce_ratio' (share of callers that were coalesced).
+        """
+        with self._lock:
+            callers = self.executed + self.coalesced
+            return {
+                'in_flight': len(self._calls) + sum(len(tasks) for tasks in self._tasks.values()),
+                'executed': self.executed,
+                'coalesced': self.coalesced,
+                'coalesce_ratio': self.coalesced / callers if callers else 0.0,
+            }
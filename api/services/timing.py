@@ -0,0 +1,124 @@
+"""
+Request Timing Service Module
+
+This module splits the wall time of one request into phases so that
+ServerTimingMiddleware (see api/middleware.py) can report them in a
+Server-Timing header and a log line.
+
+Phases:
+    - validate: Query/body serializer validation (is_valid)
+    - upstream: Time spent in upstream HTTP calls (summed, so concurrent calls
+      may add up to more than the wall time)
+    - shape: Building response bodies (api/payloads.py, api/pagination.py)
+    - render: DRF rendering of the response body
+    - app: Everything else (view logic, cache lookups, middleware)
+
+The timings of the current request live in a context variable, so they follow
+the request through sync views, async views and sync_to_async hops. Outside a
+request every helper is a no-op.
+"""
+
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+PHASES = ('validate', 'upstream', 'shape', 'render')
+
+_current = ContextVar('request_timings', default=None)
+
+
+class Timings:
+    """
+    Accumulated phase durations of one request, in seconds.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self._active = set()
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def breakdown(self, total=None):
+        """
+        Returns {phase: milliseconds} including 'app' and 'total'.
+        """
+        if total is None:
+            total = time.perf_counter() - self.started
+        accounted = sum(self.phases.values())
+        result = {name: round(seconds * 1000, 3) for name, seconds in self.phases.items()}
+        result['app'] = round(max(total - accounted, 0.0) * 1000, 3)
+        result['total'] = round(total * 1000, 3)
+        return result
+
+
+def start():
+    """
+    Starts timing the current request.
+
+    Returns:
+        tuple: (Timings, token); pass the token to stop() when the request ends.
+    """
+    timings = Timings()
+    return timings, _current.set(timings)
+
+
+def stop(token):
+    """
+    Ends the request started with the given token.
+    """
+    _current.reset(token)
+
+
+def current():
+    """
+    Returns the Timings of the current request, or None outside a request.
+    """
+    return _current.get()
+
+
+def add(name, seconds):
+    """
+    Adds seconds to a phase of the current request, if any.
+    """
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+@contextmanager
+def phase(name):
+    """
+    Times a block as one phase. Nested blocks of the same phase are counted
+    once, so helpers calling helpers do not double count.
+    """
+    timings = _current.get()
+    if timings is None or name in timings._active:
+        yield
+        return
+    timings._active.add(name)
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings._active.discard(name)
+        timings.add(name, time.perf_counter() - start_time)
+
+
+def timed(name):
+    """
+    Decorator timing every call of a sync function as the given phase.
+
+    Usage:
+        @timed('shape')
+        def universities_payload(country_universities): ...
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapped(*args, **kwargs):
+            with phase(name):
+                return fn(*args, **kwargs)
+        return wrapped
+    return decorator
@@ -0,0 +1,345 @@
+"""
+Cache Warm-up Service Module
+
+This module keeps the most requested entries of the response caches (see
+api/services/cache.py) loaded, so neither the first requests after a deploy
+nor the first request after an entry expires wait on the upstream:
+    - warm_up() loads the hot key set of every cache, CONCURRENCY keys at a
+      time. The warm_caches management command runs it before a deploy takes
+      traffic (filling the shared tier all workers read), and with ON_START
+      each worker runs it in the background when it starts
+    - RefreshScheduler reloads hot entries that expire within REFRESH_AHEAD of
+      their TTL, every REFRESH_INTERVAL seconds
+
+The hot key set of a cache is its configured KEYS plus its HOT_KEYS most
+requested keys. Every cache counts lookups per key; each worker's scheduler
+adds its counts to the shared tier file, so the ranking covers all workers and
+survives deploys. A key is refreshed ahead only while it is still requested:
+MIN_HITS lookups per interval on average, with older intervals weighing less.
+
+Only caches whose service registered a refresher take part (country_data and
+country_universities_api). Countries in the local snapshot never reach the
+country_data cache; the warm-up loads the snapshot first instead.
+
+The module is configured through the API_WARMUP setting:
+    - KEYS (dict): Keys always warmed, per cache name (default {})
+    - HOT_KEYS (int): Most requested keys warmed and refreshed per cache
+      (default 50)
+    - MAX_AGE (float): Keys not requested for this many seconds drop out of
+      the ranking (default 7 days)
+    - CONCURRENCY (int): Keys loaded at the same time by warm_up() (default 4)
+    - ON_START (bool): Warm up in the background when a worker starts
+      (default False)
+    - REFRESH (bool): Refresh hot entries ahead of expiry (default False)
+    - REFRESH_INTERVAL (float): Seconds between scheduler passes (default 30)
+    - REFRESH_AHEAD (float): Share of the TTL before expiry at which entries
+      are refreshed (default 0.1)
+    - MIN_HITS (float): Lookups per interval a key needs to be refreshed
+      (default 1)
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from . import cache as service_cache
+from . import country_index
+# Imported for their caches' refreshers.
+from . import country_data, country_universities_api  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'KEYS': {},
+    'HOT_KEYS': 50,
+    'MAX_AGE': 7 * 24 * 60 * 60,
+    'CONCURRENCY': 4,
+    'ON_START': False,
+    'REFRESH': False,
+    'REFRESH_INTERVAL': 30,
+    'REFRESH_AHEAD': 0.1,
+    'MIN_HITS': 1,
+}
+
+# Weight of the previous intervals in a key's demand
+DECAY = 0.5
+
+_last_warm_up = None
+_started_pid = None
+_start_lock = threading.Lock()
+
+
+def get_config():
+    """
+    Returns DEFAULTS updated with the values from settings.API_WARMUP.
+    """
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'API_WARMUP', {}))
+    return config
+
+
+def refreshable_caches(names=None):
+    """
+    Returns the registered caches that have a refresher.
+
+    Args:
+        names (list, optional): Restrict the result to these cache names.
+    """
+    return [
+        cache for cache in service_cache.all_caches()
+        if cache.refreshable and (names is None or cache.name in names)
+    ]
+
+
+def hot_keys(cache, config):
+    """
+    Returns the warm-up key set of a cache: its configured KEYS, then its most
+    requested keys across all workers (none without a shared tier).
+
+    Returns:
+        list: Normalized keys without duplicates.
+    """
+    keys = [service_cache.normalize_key(key) for key in config['KEYS'].get(cache.name, ())]
+    if cache.shared is not None:
+        keys += cache.shared.hot_keys(config['HOT_KEYS'], config['MAX_AGE'])
+    return list(dict.fromkeys(keys))
+
+
+def warm_up(names=None, concurrency=None):
+    """
+    Loads the hot key set of every refreshable cache.
+
+    Keys already cached in any tier are only promoted into this worker's
+    in-process tier. Keys are loaded in random order, so workers starting
+    together mostly load different keys and find the rest in the shared tier.
+
+    Args:
+        names (list, optional): Cache names to warm (default: all).
+        concurrency (int, optional): Keys loaded at the same time (default
+            CONCURRENCY).
+
+    Returns:
+        dict: Per cache name, the number of 'keys', of keys 'loaded' from the
+              upstream, already 'cached', and 'failed'.
+    """
+    global _last_warm_up
+    config = get_config()
+    started = time.monotonic()
+    country_index.get_index()
+
+    caches = refreshable_caches(names)
+    jobs = [(cache, key) for cache in caches for key in hot_keys(cache, config)]
+    random.shuffle(jobs)
+    summary = {cache.name: {'keys': 0, 'loaded': 0, 'cached': 0, 'failed': 0} for cache in caches}
+
+    def warm(job):
+        cache, key = job
+        try:
+            return cache.name, 'loaded' if cache.warm(key) else 'cached'
+        except Exception as exc:
+            logger.warning('Warm-up of %s key %r failed: %r', cache.name, key, exc)
+            return cache.name, 'failed'
+
+    if jobs:
+        workers = max(1, concurrency or config['CONCURRENCY'])
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cache-warmup') as executor:
+            for name, outcome in executor.map(warm, jobs):
+                summary[name]['keys'] += 1
+                summary[name][outcome] += 1
+
+    _last_warm_up = {
+        'caches': summary,
+        'seconds': round(time.monotonic() - started, 3),
+        'finished_at': time.time(),
+    }
+    return summary
+
+
+class RefreshScheduler:
+    """
+    Records the demand of every refreshable cache and reloads its hot entries
+    before they expire.
+
+    Each pass adds the lookups of the last interval to the shared tier's
+    ranking and to this worker's decayed demand per key; with refresh on, the
+    HOT_KEYS keys in highest demand that expire within REFRESH_AHEAD of their
+    TTL are reloaded. When another worker already refreshed an entry, its
+    shared copy is promoted instead of calling the upstream again.
+
+    Args:
+        interval (float): Seconds between passes.
+        refresh (bool): Reload entries; when False passes only record demand.
+        ahead (float): Share of the TTL before expiry at which entries are
+            reloaded.
+        min_hits (float): Lookups per interval a key needs to be reloaded.
+        hot_keys (int): Keys considered per cache.
+        max_age (float): Ranking age limit passed to the shared tier.
+
+    Usage:
+        scheduler = RefreshScheduler(interval=30, refresh=True)
+        scheduler.run_once()
+    """
+
+    def __init__(self, interval=DEFAULTS['REFRESH_INTERVAL'], refresh=DEFAULTS['REFRESH'],
+                 ahead=DEFAULTS['REFRESH_AHEAD'], min_hits=DEFAULTS['MIN_HITS'],
+                 hot_keys=DEFAULTS['HOT_KEYS'], max_age=DEFAULTS['MAX_AGE']):
+        self.interval = interval
+        self.refresh = refresh
+        self.ahead = ahead
+        self.min_hits = min_hits
+        self.hot_keys = hot_keys
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._demand = {}
+        self.passes = 0
+        self.refreshed = 0
+        self.errors = 0
+        self.last_pass_seconds = None
+
+    def _hot(self, cache):
+        # Keys of the cache in demand, highest first.
+        counts = cache.take_demand()
+        if counts and cache.shared is not None:
+            cache.shared.add_demand(counts, self.max_age)
+        demand = self._demand.setdefault(cache.name, {})
+        for key in demand:
+            demand[key] *= DECAY
+        for key, hits in counts.items():
+            demand[key] = demand.get(key, 0.0) + hits
+        # A key requested h times per interval settles at h / (1 - DECAY).
+        threshold = self.min_hits / (1 - DECAY)
+        ranked = sorted(demand.items(), key=lambda item: item[1], reverse=True)
+        self._demand[cache.name] = {key: score for key, score in ranked[:4 * self.hot_keys] if score >= 0.1}
+        return [key for key, score in ranked[:self.hot_keys] if score >= threshold]
+
+    def run_once(self):
+        """
+        Runs one pass over every refreshable cache.
+
+        Returns:
+            int: Number of entries reloaded from the upstream.
+        """
+        started = time.monotonic()
+        refreshed = errors = 0
+        for cache in refreshable_caches():
+            keys = self._hot(cache)
+            if not self.refresh:
+                continue
+            # Entries expiring before the next pass count as due as well.
+            ahead = cache.ttl * self.ahead + self.interval
+            for key in keys:
+                try:
+                    refreshed += cache.warm(key, ahead)
+                except Exception as exc:
+                    logger.warning('Refresh of %s key %r failed: %r', cache.name, key, exc)
+                    errors += 1
+        with self._lock:
+            self.passes += 1
+            self.refreshed += refreshed
+            self.errors += errors
+            self.last_pass_seconds = round(time.monotonic() - started, 3)
+        return refreshed
+
+    def run_forever(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception('Cache refresh pass failed')
+
+    def stats(self):
+        """
+        Returns a snapshot of the scheduler counters.
+
+        Returns:
+            dict: Keys 'refresh', 'interval', 'passes', 'refreshed' (entries
+                  reloaded), 'errors', 'last_pass_seconds' and 'tracked'
+                  (keys with recent demand, per cache).
+        """
+        with self._lock:
+            return {
+                'refresh': self.refresh,
+                'interval': self.interval,
+                'passes': self.passes,
+                'refreshed': self.refreshed,
+                'errors': self.errors,
+                'last_pass_seconds': self.last_pass_seconds,
+                'tracked': {name: len(demand) for name, demand in list(self._demand.items())},
+            }
+
+
+def _build_scheduler():
+    config = get_config()
+    return RefreshScheduler(
+        interval=config['REFRESH_INTERVAL'],
+        refresh=config['REFRESH'],
+        ahead=config['REFRESH_AHEAD'],
+        min_hits=config['MIN_HITS'],
+        hot_keys=config['HOT_KEYS'],
+        max_age=config['MAX_AGE'],
+    )
+
+
+# Scheduler of this worker, started by start()
+scheduler = _build_scheduler()
+
+
+def _run():
+    if get_config()['ON_START']:
+        try:
+            warm_up()
+        except Exception:
+            logger.exception('Cache warm-up failed')
+    scheduler.run_forever()
+
+
+def start():
+    """
+    Starts this worker's background thread: the warm-up with ON_START, then
+    the scheduler passes.
+
+    Called when the application is loaded (weather_api/wsgi.py and
+    weather_api/asgi.py). Workers forked from a preloaded application start
+    their own thread.
+    """
+    global _started_pid
+    pid = os.getpid()
+    with _start_lock:
+        if _started_pid == pid:
+            return
+        if _started_pid is None:
+            os.register_at_fork(after_in_child=_start_in_child)
+        _started_pid = pid
+    threading.Thread(target=_run, name='cache-warmup', daemon=True).start()
+
+
+def _start_in_child():
+    # Runs in a forked worker, where only the forking thread survives. Locks
+    # another parent thread held at fork time stay held forever, so the child
+    # takes fresh ones instead of waiting on them.
+    global _start_lock, _started_pid
+    _start_lock = threading.Lock()
+    scheduler._lock = threading.Lock()
+    _started_pid = os.getpid()
+    threading.Thread(target=_run, name='cache-warmup', daemon=True).start()
+
+
+def stats():
+    """
+    Returns the last warm-up of this worker (None before the first) and the
+    scheduler counters.
+    """
+    last = _last_warm_up
+    if last is not None:
+        last = {
+            'caches': last['caches'],
+            'seconds': last['seconds'],
+            'finished_seconds_ago': round(time.time() - last['finished_at'], 1),
+        }
+    return {'last_warm_up': last, 'scheduler': scheduler.stats()}
@@ -0,0 +1,281 @@
+"""
+Stub Upstreams Module
+
+This module provides a local stand-in for every upstream API the services call,
+so the load tests can run without network access and with reproducible
+behaviour. One threaded HTTP server answers for all hosts; the services are
+pointed at it through API_HTTP_CLIENT['UPSTREAM_BASE_URL'] (environment
+variable API_UPSTREAM_BASE_URL), which turns
+'https://restcountries.com/v3.1/name/France' into
+'<base>/restcountries.com/v3.1/name/France'.
+
+The stubs answer with synthetic payloads in the upstream formats and can be
+tuned with:
+    - latency (float): Added delay per response in seconds
+    - jitter (float): Uniform random extra delay in seconds
+    - error_rate (float): Share of requests answered with 503
+    - universities (int): Universities returned per country (e.g. 5000)
+    - activities (int): Activities returned per bored type
+    - seed (int): Random seed, so runs are reproducible
+
+Usage:
+    stubs = StubUpstreams(latency=0.05, universities=5000)
+    stubs.start()
+    os.environ['API_UPSTREAM_BASE_URL'] = stubs.base_url
+    ...
+    stubs.stop()
+
+Run them on their own with `python manage.py stub_upstreams`.
+"""
+
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+# Country names the stubs know; anything else gets REST Countries' 404.
+COUNTRIES = ['Nigeria', 'France', 'Japan', 'Brazil', 'Germany', 'Kenya', 'Canada', 'India']
+
+BORED_TYPES = ['education', 'recreational', 'social', 'diy', 'charity', 'cooking', 'relaxation', 'music', 'busywork']
+
+ACCESSIBILITY = ['Few to no challenges', 'Minor challenges', 'Major challenges']
+
+
+def dog_image(rng, query):
+    return {'message': f'https://images.dog.ceo/breeds/hound-afghan/n0{rng.randrange(10**8)}.jpg', 'status': 'success'}
+
+
+def cat_images(rng, query):
+    image_id = rng.randrange(10**6)
+    return [{'id': f'c{image_id}', 'url': f'https://cdn2.thecatapi.com/images/c{image_id}.jpg',
+             'width': rng.randrange(200, 2000), 'height': rng.randrange(200, 2000)}]
+
+
+def joke(rng, query):
+    joke_id = rng.randrange(1, 400)
+    return {'type': 'general', 'setup': f'Stub joke #{joke_id}?', 'punchline': 'Because it was local.', 'id': joke_id}
+
+
+def advice(rng, query):
+    slip_id = rng.randrange(1, 225)
+    return {'slip': {'id': slip_id, 'advice': f'Stub advice number {slip_id}.'}}
+
+
+def agify(rng, query):
+    def predict(name):
+        return {'count': rng.randrange(1, 100000), 'name': name, 'age': rng.randrange(18, 80)}
+
+    if 'name[]' in query:
+        return [predict(name) for name in query['name[]']]
+    return predict(query.get('name', [''])[0])
+
+
+def quote(quote_id):
+    return {'q': f'Stub quote {quote_id}.', 'a': 'Stub Author', 'h': f'<blockquote>Stub quote {quote_id}.</blockquote>'}
+
+
+def quotes(rng, query):
+    return [quote(rng.randrange(10**4))]
+
+
+def bulk_quotes(rng, query):
+    # 50 per call like zenquotes /api/quotes, drawn from a small set so repeats occur
+    return [quote(rng.randrange(500)) for _ in range(50)]
+
+
+# Upstreams whose answers are random; the rest are deterministic and encoded once.
+RANDOM_ROUTES = {
+    ('dog.ceo', '/api/breeds/image/random'): dog_image,
+    ('api.thecatapi.com', '/v1/images/search'): cat_images,
+    ('official-joke-api.appspot.com', '/random_joke'): joke,
+    ('api.adviceslip.com', '/advice'): advice,
+    ('api.agify.io', '/'): agify,
+    ('zenquotes.io', '/api/random'): quotes,
+    ('zenquotes.io', '/api/quotes'): bulk_quotes,
+}
+
+
+class StubUpstreams:
+    """
+    Threaded HTTP server impersonating every upstream API.
+
+    Large, deterministic payloads (countries, universities, activities) are
+    encoded once and reused, so the stub itself stays cheap under load.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 universities=100, activities=10, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.universities = universities
+        self.activities = activities
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._bodies = {}
+        self.requests = Counter()
+        self.errors = Counter()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='stub-upstreams', daemon=True)
+        self._thread.start()
+        return self
+
+    def join(self):
+        """
+        Blocks until the server is stopped.
+        """
+        self._thread.join()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def stats(self):
+        """
+        Returns the requests and injected errors served per upstream host.
+        """
+        return {
+            host: {'requests': self.requests[host], 'errors': self.errors[host]}
+            for host in sorted(self.requests)
+        }
+
+    def _cached(self, key, build):
+        body = self._bodies.get(key)
+        if body is None:
+            body = self._bodies[key] = json.dumps(build()).encode()
+        return body
+
+    def _country(self, name):
+        for country in COUNTRIES:
+            if country.casefold() == name.strip().casefold():
+                break
+        else:
+            return None
+        code = country[:2].upper()
+        return [{
+            'name': {'common': country, 'official': f'Republic of {country}'},
+            'capital': [f'{country} City'],
+            'population': 1000000 * len(country),
+            'flag': '🏳',
+            'region': 'Stubland',
+            'cca2': code,
+            'cca3': country[:3].upper(),
+            'altSpellings': [code],
+            'subregion': 'Western Stubland',
+            'area': 1000.0 * len(country),
+            'languages': {'stb': 'Stubbish'},
+            'currencies': {'STB': {'name': 'Stub dollar', 'symbol': '$'}},
+            'timezones': ['UTC'],
+            'borders': [],
+            'translations': {language: {'common': country} for language in ('deu', 'fra', 'jpn', 'spa')},
+        }]
+
+    def _universities(self, country):
+        return [
+            {
+                'name': f'University of {country} {i}',
+                'country': country,
+                'alpha_two_code': country[:2].upper(),
+                'state-province': None,
+                'domains': [f'u{i}.{country[:2].lower()}.edu'],
+                'web_pages': [f'http://www.u{i}.{country[:2].lower()}.edu/'],
+            }
+            for i in range(self.universities)
+        ]
+
+    def _activities(self, activity_type):
+        return [
+            {'activity': f'Stub {activity_type} activity {i}', 'availability': 0.5, 'type': activity_type,
+             'participants': i % 4 + 1, 'price': i % 5 / 10, 'accessibility': ACCESSIBILITY[i % len(ACCESSIBILITY)],
+             'duration': 'minutes', 'kidFriendly': True, 'link': '',
+             'key': str(1000000 + BORED_TYPES.index(activity_type) * 10000 + i)}
+            for i in range(self.activities)
+        ]
+
+    def respond(self, host, path, query):
+        """
+        Returns (status, body bytes) for one upstream request.
+        """
+        with self._rng_lock:
+            rng = random.Random(self._rng.random())
+        if (host, path) in RANDOM_ROUTES:
+            return 200, json.dumps(RANDOM_ROUTES[host, path](rng, query)).encode()
+
+        if host == 'restcountries.com' and path.startswith('/v3.1/name/'):
+            name = unquote(path[len('/v3.1/name/'):])
+            records = self._country(name)
+            if records is None:
+                return 404, b'{"status":404,"message":"Not Found"}'
+            # Like the real API, ?fields= trims each record to those fields.
+            fields = query.get('fields', [''])[0]
+            if fields:
+                wanted = fields.split(',')
+                records = [{key: value for key, value in record.items() if key in wanted} for record in records]
+            return 200, self._cached(('country', records[0]['name']['common'], fields), lambda: records)
+        if host == 'restcountries.com' and path == '/v3.1/all':
+            return 200, self._cached('countries', lambda: [self._country(name)[0] for name in COUNTRIES])
+
+        if host == 'universities.hipolabs.com' and path == '/search':
+            country = query.get('country', [None])[0]
+            countries = [country] if country else COUNTRIES
+            return 200, self._cached(
+                ('universities', country),
+                lambda: [record for name in countries for record in self._universities(name)],
+            )
+
+        if host == 'bored-api.appbrewery.com' and path == '/filter':
+            activity_type = query.get('type', [''])[0]
+            if activity_type not in BORED_TYPES:
+                return 404, b'{"error":"No activities found with the specified filters"}'
+            return 200, self._cached(('bored', activity_type), lambda: self._activities(activity_type))
+
+        return 404, b'{"error":"Unknown stub route"}'
+
+    def _handler_class(self):
+        stubs = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are written separately; without this, delayed
+            # ACKs add ~40 ms to every keep-alive response.
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                host, _, path = parts.path.lstrip('/').partition('/')
+                with stubs._rng_lock:
+                    stubs.requests[host] += 1
+                    delay = stubs.latency + (stubs._rng.uniform(0, stubs.jitter) if stubs.jitter else 0)
+                    failed = bool(stubs.error_rate) and stubs._rng.random() < stubs.error_rate
+                    if failed:
+                        stubs.errors[host] += 1
+
+                if delay:
+                    time.sleep(delay)
+                if failed:
+                    status, body = 503, b'{"error":"Injected stub failure"}'
+                else:
+                    status, body = stubs.respond(host, '/' + path, parse_qs(parts.query))
+
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
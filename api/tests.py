@@ -1,3 +1,1428 @@
-from django.test import TestCase
+"""
+Tests of the api app.
 
-# Create your tests here.
+Upstream services are patched out in every test, so the suite never calls the
+network.
+"""
+
+import asyncio
+import gzip
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent import futures
+from unittest import mock
+
+import requests
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from . import async_views, batch, response_cache
+from .middleware import DeadlineMiddleware
+from .models import University
+from .payloads import country_detail_payload, country_fields
+from .serializers import CountryDetailSerializer, CountryQuerySerializer
+from .services import activity_catalog, age_prediction_api, bored_api, circuit_breaker, country_data, country_index, country_universities_api, deadline, http_client, latency, metrics, quotes_api, rate_limit, single_flight, warmup
+from .services.cache import TTLCache
+
+FRANCE = [{
+    'name': {'common': 'France', 'official': 'French Republic'},
+    'capital': ['Paris'],
+    'population': 68000000,
+    'flag': '🇫🇷',
+    'region': 'Europe',
+}]
+
+FRANCE_BODY = {'name': 'France', 'capital': 'Paris', 'population': 68000000, 'flag': '🇫🇷', 'region': 'Europe'}
+
+
+def patch(test, target, **kwargs):
+    """
+    Starts a mock.patch for the duration of one test and returns the mock.
+    """
+    patcher = mock.patch(target, **kwargs)
+    test.addCleanup(patcher.stop)
+    return patcher.start()
+
+
+def isolate(test, cache):
+    """
+    Detaches a data cache from the node's shared tier and empties it around
+    one test.
+    """
+    patcher = mock.patch.object(cache, 'shared', None)
+    patcher.start()
+    cache.clear()
+    test.addCleanup(patcher.stop)
+    test.addCleanup(cache.clear)
+
+
+class ResponseCacheTests(SimpleTestCase):
+    def setUp(self):
+        response_cache.clear()
+        self.addCleanup(response_cache.clear)
+        self.country_data = patch(self, 'api.views.country_data', return_value=FRANCE)
+
+    def test_miss_and_hit_return_the_body(self):
+        miss = self.client.get('/api/country/', {'name': 'France'})
+        hit = self.client.get('/api/country/', {'name': 'France'})
+
+        self.assertEqual(miss.status_code, 200)
+        self.assertEqual(miss['X-Cache'], 'MISS')
+        self.assertEqual(miss.json(), FRANCE_BODY)
+        self.assertEqual(hit.status_code, 200)
+        self.assertEqual(hit['X-Cache'], 'HIT')
+        self.assertEqual(hit.content, miss.content)
+        self.country_data.assert_called_once()
+
+    def test_etag_is_the_digest_of_the_body(self):
+        response = self.client.get('/api/country/', {'name': 'France'})
+
+        self.assertEqual(response['ETag'], response_cache.make_etag(response.content, 'identity'))
+        self.assertIn('Last-Modified', response)
+
+    def test_matching_etag_returns_304(self):
+        etag = self.client.get('/api/country/', {'name': 'France'})['ETag']
+
+        response = self.client.get('/api/country/', {'name': 'France'}, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_other_etag_returns_the_body(self):
+        self.client.get('/api/country/', {'name': 'France'})
+
+        response = self.client.get('/api/country/', {'name': 'France'}, HTTP_IF_NONE_MATCH='"stale"')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), FRANCE_BODY)
+
+    def test_normalized_names_share_an_entry(self):
+        self.client.get('/api/country/', {'name': 'France'})
+
+        response = self.client.get('/api/country/', {'name': ' FRANCE '})
+
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.country_data.assert_called_once()
+
+
+class AgeBulkTests(SimpleTestCase):
+    def setUp(self):
+        isolate(self, age_prediction_api.cache)
+        self.fetch_many = patch(self, 'api.services.age_prediction_api._fetch_many')
+
+    def post(self, names):
+        return self.client.post('/api/age/bulk/', {'names': names}, content_type='application/json')
+
+    def test_names_are_deduplicated_and_fetched_in_chunks(self):
+        self.fetch_many.side_effect = lambda chunk: [{'name': name, 'age': 40, 'count': 1} for name in chunk]
+        names = [f'name{i}' for i in range(15)]
+
+        response = self.post(names + ['NAME0'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['name'] for item in response.json()], names)
+        self.assertEqual(self.fetch_many.call_count, 2)
+
+    def test_failed_chunk_returns_partial_results(self):
+        self.fetch_many.side_effect = [
+            [{'name': f'name{i}', 'age': 40, 'count': 1} for i in range(10)],
+            requests.exceptions.ConnectionError('rate limited'),
+        ]
+
+        response = self.post([f'name{i}' for i in range(25)])
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data[0], {'name': 'name0', 'predicted_age': 40})
+        self.assertEqual(data[10], {'name': 'name10', 'error': 'Fetching age data failed.'})
+        self.assertEqual(len([item for item in data if 'error' in item]), 15)
+        # The remaining chunk is not attempted once one failed.
+        self.assertEqual(self.fetch_many.call_count, 2)
+
+    def test_short_reply_answers_the_missing_names_as_unavailable(self):
+        self.fetch_many.return_value = [{'name': 'Chen', 'age': 40, 'count': 1}]
+
+        response = self.post(['Amina', 'Chen'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [
+            {'name': 'Amina', 'error': 'Fetching age data failed.'},
+            {'name': 'Chen', 'predicted_age': 40},
+        ])
+
+    def test_malformed_reply_returns_503(self):
+        self.fetch_many.return_value = {'error': 'Invalid name[] parameter'}
+
+        response = self.post(['Amina', 'Chen'])
+
+        self.assertEqual(response.status_code, 503)
+
+    def test_nothing_answered_returns_503(self):
+        self.fetch_many.side_effect = requests.exceptions.Timeout()
+
+        response = self.post(['Amina', 'Chen'])
+
+        self.assertEqual(response.status_code, 503)
+
+
+class AsyncThrottleTests(SimpleTestCase):
+    def test_shared_buckets_are_taken_off_the_event_loop(self):
+        limiter = rate_limit.RateLimiter('upstream.test', rate_limit.SQLiteBackend(':memory:'))
+        patch(self, 'api.services.rate_limit.get_limiter', return_value=limiter)
+        threads = []
+        patch(self, 'api.services.http_client.throttle', side_effect=lambda url, max_wait: threads.append(threading.get_ident()) or 0.0)
+
+        asyncio.run(http_client.athrottle('https://upstream.test/path'))
+
+        self.assertNotEqual(threads, [threading.get_ident()])
+
+    def test_memory_buckets_are_taken_inline(self):
+        limiter = rate_limit.RateLimiter('upstream.test', rate_limit.MemoryBackend())
+        patch(self, 'api.services.rate_limit.get_limiter', return_value=limiter)
+        threads = []
+        patch(self, 'api.services.http_client.throttle', side_effect=lambda url, max_wait: threads.append(threading.get_ident()) or 0.0)
+
+        asyncio.run(http_client.athrottle('https://upstream.test/path'))
+
+        self.assertEqual(threads, [threading.get_ident()])
+
+
+class AsyncSharedTierTests(SimpleTestCase):
+    def test_shared_tier_is_used_off_the_event_loop(self):
+        threads = []
+        shared = mock.Mock()
+        shared.get.side_effect = lambda key: threads.append(threading.get_ident()) or (False, None, 0.0)
+        shared.set.side_effect = lambda key, value, ttl: threads.append(threading.get_ident())
+        cache = TTLCache('test', shared=shared)
+
+        async def load():
+            return 'value'
+
+        value = asyncio.run(cache.aget_or_load('key', load))
+
+        self.assertEqual(value, 'value')
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(threading.get_ident(), threads)
+        shared.set.assert_called_once_with('key', 'value', cache.ttl)
+
+
+@override_settings(API_ADMIN_TOKEN='secret')
+class AdminEndpointTests(SimpleTestCase):
+    def test_stats_require_the_admin_token(self):
+        self.assertEqual(self.client.get('/api/stats/').status_code, 403)
+        self.assertEqual(self.client.get('/api/stats/', HTTP_X_ADMIN_TOKEN='wrong').status_code, 403)
+        self.assertEqual(self.client.get('/api/stats/', HTTP_X_ADMIN_TOKEN='secret').status_code, 200)
+
+    def test_invalidation_requires_the_admin_token(self):
+        self.assertEqual(self.client.delete('/api/cache/').status_code, 403)
+
+    @override_settings(API_ADMIN_TOKEN=None)
+    def test_unset_token_allows_no_header(self):
+        self.assertEqual(self.client.get('/api/stats/', HTTP_X_ADMIN_TOKEN='').status_code, 403)
+
+
+@override_settings(API_ADMIN_TOKEN='secret')
+class CacheInvalidationTests(SimpleTestCase):
+    def setUp(self):
+        isolate(self, country_data.cache)
+        response_cache.clear()
+        self.addCleanup(response_cache.clear)
+        self.country_data = patch(self, 'api.views.country_data', return_value=FRANCE)
+
+    def invalidate(self, **params):
+        query = '&'.join(f'{name}={value}' for name, value in params.items())
+        return self.client.delete(f'/api/cache/?{query}', HTTP_X_ADMIN_TOKEN='secret')
+
+    def test_country_invalidation_removes_its_entries(self):
+        country_data.cache.set('france', FRANCE)
+
+        response = self.invalidate(country='France', cache='country_data')
+
+        self.assertEqual(response.json(), {'invalidated': 1})
+        self.assertIsNone(country_data.cache.get('france'))
+
+    def test_every_invalidation_clears_rendered_responses(self):
+        for params in ({'country': 'France', 'cache': 'country_data'}, {'cache': 'country_data'}):
+            self.client.get('/api/country/', {'name': 'France'})
+
+            self.assertEqual(self.invalidate(**params).status_code, 200)
+
+            response = self.client.get('/api/country/', {'name': 'France'})
+            self.assertEqual(response['X-Cache'], 'MISS')
+
+
+class AsyncViewRenderingTests(SimpleTestCase):
+    def setUp(self):
+        response_cache.clear()
+        self.addCleanup(response_cache.clear)
+        patch(self, 'api.views.country_data', return_value=FRANCE)
+        patch(self, 'api.async_views.country_data_async', new=mock.AsyncMock(return_value=FRANCE))
+
+    def test_async_views_render_the_same_bytes(self):
+        sync = self.client.get('/api/country/', {'name': 'France'})
+        response_cache.clear()
+
+        request = RequestFactory().get('/api/country/', {'name': 'France'})
+        response = asyncio.run(async_views.get_country_data(request))
+
+        self.assertEqual(response.content, sync.content)
+        self.assertEqual(response['ETag'], sync['ETag'])
+        self.assertEqual(response['Content-Type'], sync['Content-Type'])
+
+
+def universities(country, count):
+    return [
+        {'name': f'University {i}', 'country': country, 'web_pages': [f'http://u{i}.example']}
+        for i in range(count)
+    ]
+
+
+class UniversitiesPaginationTests(TestCase):
+    def setUp(self):
+        isolate(self, country_universities_api.cache)
+        response_cache.clear()
+        self.addCleanup(response_cache.clear)
+        self.fetch_live = patch(self, 'api.services.country_universities_api.fetch_live', return_value=universities('Liveland', 5))
+        University.objects.bulk_create(
+            University(country_key='localland', **university) for university in universities('Localland', 5)
+        )
+
+    def pages(self, country):
+        names, cursor = [], None
+        while True:
+            params = {'country': country, 'limit': 2}
+            if cursor is not None:
+                params['cursor'] = cursor
+            data = self.client.get('/api/universities/', params).json()
+            names += [row['name'] for row in data['universities']]
+            cursor = data['next']
+            if cursor is None:
+                return names
+
+    def test_local_cursors_walk_every_page(self):
+        self.assertEqual(self.pages('Localland'), [f'University {i}' for i in range(5)])
+        self.fetch_live.assert_not_called()
+
+    def test_local_page_reads_one_page(self):
+        # exists(), the LIMIT/OFFSET page and the country name
+        with self.assertNumQueries(3):
+            data = self.client.get('/api/universities/', {'country': 'Localland', 'limit': 2}).json()
+
+        self.assertEqual(data['country'], 'Localland')
+        self.assertEqual(len(data['universities']), 2)
+
+    def test_live_fallback_cursors_walk_every_page(self):
+        self.assertEqual(self.pages('Liveland'), [f'University {i}' for i in range(5)])
+        self.fetch_live.assert_called_once()
+
+    def test_local_ndjson_stream_skips_the_cursor(self):
+        response = self.client.get('/api/universities/', {'country': 'Localland', 'stream': 'ndjson', 'cursor': 'bz0z'})
+
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['name'] for line in lines], ['University 3', 'University 4'])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/api/universities/', {'country': 'Localland', 'cursor': '!!'})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class SnapshotReloadTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.countries = os.path.join(directory.name, 'countries.json.gz')
+        self.activities = os.path.join(directory.name, 'activities.json.gz')
+        settings = override_settings(API_COUNTRY_DATASET=self.countries, API_ACTIVITY_DATASET=self.activities)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        for module, reset in ((country_index, country_index.reset_index), (activity_catalog, activity_catalog.reset_catalog)):
+            patch(self, f'{module.__name__}.RELOAD_CHECK_SECONDS', new=0)
+            reset()
+            self.addCleanup(reset)
+
+    def write(self, path, key, records):
+        with gzip.open(path, 'wt', encoding='utf-8') as snapshot:
+            json.dump({key: records}, snapshot)
+
+    def test_missing_country_snapshot_is_picked_up_once_written(self):
+        self.assertIsNone(country_index.get_index())
+
+        self.write(self.countries, 'countries', FRANCE)
+
+        self.assertEqual(country_index.lookup('france'), FRANCE)
+
+    def test_missing_activity_snapshot_is_picked_up_once_written(self):
+        self.assertIsNone(activity_catalog.get_catalog())
+
+        self.write(self.activities, 'activities', [{'key': '1', 'activity': 'Learn to juggle', 'type': 'education', 'participants': 1, 'price': 0, 'accessibility': 0.1}])
+
+        self.assertEqual(len(activity_catalog.get_catalog().records), 1)
+
+    def test_unchanged_snapshot_is_not_reread(self):
+        self.write(self.countries, 'countries', FRANCE)
+        index = country_index.get_index()
+
+        with mock.patch('api.services.country_index.load_snapshot') as load_snapshot:
+            self.assertIs(country_index.get_index(), index)
+
+        load_snapshot.assert_not_called()
+
+
+class QuotePoolTests(SimpleTestCase):
+    def test_malformed_records_are_skipped(self):
+        pool = quotes_api.QuotePool('test')
+
+        added = pool.add([{'q': 'Well begun is half done.', 'a': 'Aristotle'}, {'q': None, 'a': 'x'}, 'text', {'a': 'y'}])
+
+        self.assertEqual(added, 1)
+        self.assertEqual(pool.stats()['invalid'], 3)
+
+    def test_reply_other_than_a_list_is_an_upstream_error(self):
+        pool = quotes_api.QuotePool('test')
+
+        with self.assertRaises(requests.exceptions.RequestException):
+            pool.add({'error': 'Too many requests'})
+
+    def test_refresh_thread_survives_failed_refreshes(self):
+        pool = quotes_api.QuotePool('test', refresh_seconds=0)
+
+        class Stop(Exception):
+            pass
+
+        patch(self, 'api.services.quotes_api.time.sleep', side_effect=[None, None, None, Stop])
+        with mock.patch.object(pool, 'refresh', side_effect=[ValueError('bad JSON'), KeyError('q'), requests.exceptions.Timeout()]) as refresh:
+            with self.assertLogs('api.services.quotes_api', 'WARNING') as logs, self.assertRaises(Stop):
+                pool._run()
+
+        self.assertEqual(refresh.call_count, 3)
+        self.assertEqual(len(logs.records), 3)
+
+
+class BatchTests(SimpleTestCase):
+    def setUp(self):
+        self.country_data = patch(self, 'api.batch.country_data', return_value=FRANCE)
+        self.joke_buffer = patch(self, 'api.batch.joke_buffer')
+        self.joke_buffer.get.side_effect = requests.exceptions.ConnectionError()
+
+    def post(self, body):
+        return self.client.post('/api/batch/', body, content_type='application/json')
+
+    def test_items_keep_their_own_status_in_request_order(self):
+        response = self.post({'requests': [
+            {'endpoint': 'country', 'params': {'name': 'France'}},
+            {'endpoint': 'age', 'params': {}},
+            {'endpoint': 'joke'},
+        ]})
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([item['endpoint'] for item in results], ['country', 'age', 'joke'])
+        self.assertEqual([item['status'] for item in results], [200, 400, 503])
+        self.assertEqual(results[0]['data'], FRANCE_BODY)
+        self.assertEqual(results[2]['data'], {'error': 'Error fetching joke'})
+
+    def test_items_missing_the_deadline_get_504(self):
+        self.country_data.side_effect = lambda *args: time.sleep(0.5) or FRANCE
+
+        started = time.monotonic()
+        response = self.post({'requests': [{'endpoint': 'country', 'params': {'name': 'France'}}, {'endpoint': 'joke'}], 'timeout': 0.1})
+
+        self.assertLess(time.monotonic() - started, 0.4)
+        self.assertEqual([item['status'] for item in response.json()['results']], [504, 503])
+
+    @override_settings(API_BATCH={'MAX_ITEMS': 2})
+    def test_too_many_items_are_rejected(self):
+        response = self.post({'requests': [{'endpoint': 'joke'}] * 3})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_async_batch_matches_the_sync_results(self):
+        patch(self, 'api.batch.country_data_async', new=mock.AsyncMock(return_value=FRANCE))
+        items = [{'endpoint': 'country', 'params': {'name': 'France'}}, {'endpoint': 'age', 'params': {}}]
+
+        self.assertEqual(asyncio.run(batch.arun_batch(items)), batch.run_batch(items))
+
+
+class SyncHedgeTests(SimpleTestCase):
+    def setUp(self):
+        self.executor = futures.ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(self.executor.shutdown, wait=False)
+        patch(self, 'api.services.http_client._get_hedge_executor', return_value=self.executor)
+        patch(self, 'api.services.http_client._start_hedge', return_value=True)
+
+    def test_saturated_executor_does_not_delay_the_call(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        self.executor.submit(release.wait)
+        threads = []
+
+        def attempt():
+            threads.append(threading.get_ident())
+            return 'answer'
+
+        started = time.monotonic()
+        result = http_client._hedged('https://upstream.test/', attempt, 0.01, {})
+
+        self.assertEqual(result, 'answer')
+        self.assertEqual(threads, [threading.get_ident()])
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_hedge_answers_when_the_original_request_fails(self):
+        calls = []
+
+        def attempt():
+            calls.append(threading.get_ident())
+            if len(calls) == 1:
+                time.sleep(0.1)
+                raise requests.exceptions.Timeout()
+            return 'hedged answer'
+
+        result = http_client._hedged('https://upstream.test/', attempt, 0.01, {})
+
+        self.assertEqual(result, 'hedged answer')
+        self.assertEqual(len(calls), 2)
+        self.assertNotEqual(calls[1], threading.get_ident())
+
+    def test_no_hedge_after_a_fast_answer(self):
+        calls = []
+
+        result = http_client._hedged('https://upstream.test/', lambda: calls.append(1) or 'answer', 0.05, {})
+        time.sleep(0.1)
+
+        self.assertEqual(result, 'answer')
+        self.assertEqual(calls, [1])
+
+
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        self.flight = single_flight.SingleFlight('test')
+        self.release = threading.Event()
+        self.calls = []
+
+    def load(self):
+        # The first call times out under its caller's deadline once released;
+        # later calls answer.
+        self.calls.append(1)
+        if len(self.calls) == 1:
+            self.release.wait(5)
+            raise deadline.DeadlineExceeded('leader deadline')
+        return 'value'
+
+    def wait_for_calls(self, count):
+        for _ in range(500):
+            if len(self.calls) >= count:
+                return
+            time.sleep(0.01)
+        self.fail('the call never started')
+
+    def wait_for_followers(self, count):
+        for _ in range(500):
+            if self.flight.coalesced >= count:
+                return
+            time.sleep(0.01)
+        self.fail('followers never joined the call')
+
+    def test_concurrent_callers_share_one_call(self):
+        def load():
+            self.calls.append(1)
+            self.release.wait(5)
+            return 'value'
+
+        with futures.ThreadPoolExecutor(max_workers=5) as pool:
+            results = [pool.submit(self.flight.do, 'key', load) for _ in range(5)]
+            self.wait_for_calls(1)
+            self.wait_for_followers(4)
+            self.release.set()
+            values = [result.result(5) for result in results]
+
+        self.assertEqual(values, ['value'] * 5)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.flight.stats()['coalesced'], 4)
+        self.assertEqual(self.flight.stats()['in_flight'], 0)
+
+    def test_leaders_exception_reaches_every_follower(self):
+        error = requests.exceptions.ConnectionError('upstream down')
+
+        def load():
+            self.calls.append(1)
+            self.release.wait(5)
+            raise error
+
+        with futures.ThreadPoolExecutor(max_workers=3) as pool:
+            results = [pool.submit(self.flight.do, 'key', load) for _ in range(3)]
+            self.wait_for_calls(1)
+            self.wait_for_followers(2)
+            self.release.set()
+            for result in results:
+                self.assertIs(result.exception(5), error)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_different_keys_do_not_share_a_call(self):
+        self.assertEqual(self.flight.do('a', lambda: 'a'), 'a')
+        self.assertEqual(self.flight.do('b', lambda: 'b'), 'b')
+        self.assertEqual(self.flight.stats()['executed'], 2)
+
+    def test_async_cancelled_waiter_does_not_cancel_the_shared_call(self):
+        async def load():
+            self.calls.append(1)
+            await asyncio.sleep(0.05)
+            return 'value'
+
+        async def main():
+            first = asyncio.create_task(self.flight.ado('key', load))
+            second = asyncio.create_task(self.flight.ado('key', load))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await first
+            return await second
+
+        self.assertEqual(asyncio.run(main()), 'value')
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.flight.stats()['coalesced'], 1)
+
+    def test_follower_retries_a_call_the_leaders_deadline_cut_short(self):
+        def leader():
+            token = deadline.start(0.05)
+            try:
+                with self.assertRaises(deadline.DeadlineExceeded):
+                    self.flight.do('key', self.load)
+            finally:
+                deadline.stop(token)
+
+        with futures.ThreadPoolExecutor(max_workers=2) as pool:
+            leading = pool.submit(leader)
+            self.wait_for_calls(1)
+            following = pool.submit(self.flight.do, 'key', self.load)
+            self.wait_for_followers(1)
+            self.release.set()
+            leading.result(5)
+            self.assertEqual(following.result(5), 'value')
+        self.assertEqual(len(self.calls), 2)
+
+    def test_follower_without_time_left_shares_the_deadline_failure(self):
+        def follower():
+            token = deadline.start(0.01)
+            try:
+                return self.flight.do('key', self.load)
+            finally:
+                deadline.stop(token)
+
+        with futures.ThreadPoolExecutor(max_workers=2) as pool:
+            leading = pool.submit(self.flight.do, 'key', self.load)
+            self.wait_for_calls(1)
+            following = pool.submit(follower)
+            self.wait_for_followers(1)
+            time.sleep(0.02)
+            self.release.set()
+            with self.assertRaises(deadline.DeadlineExceeded):
+                leading.result(5)
+            with self.assertRaises(deadline.DeadlineExceeded):
+                following.result(5)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_async_follower_retries_a_call_the_leaders_deadline_cut_short(self):
+        async def load():
+            self.calls.append(1)
+            if len(self.calls) == 1:
+                await asyncio.sleep(0.05)
+                raise deadline.DeadlineExceeded('leader deadline')
+            return 'value'
+
+        async def leader():
+            token = deadline.start(0.05)
+            try:
+                return await self.flight.ado('key', load)
+            finally:
+                deadline.stop(token)
+
+        async def main():
+            leading = asyncio.create_task(leader())
+            await asyncio.sleep(0)
+            return await asyncio.gather(leading, self.flight.ado('key', load), return_exceptions=True)
+
+        led, followed = asyncio.run(main())
+        self.assertIsInstance(led, deadline.DeadlineExceeded)
+        self.assertEqual(followed, 'value')
+        self.assertEqual(len(self.calls), 2)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 100.0
+        clock = patch(self, 'api.services.circuit_breaker.time')
+        clock.monotonic.side_effect = lambda: self.now
+
+    def breaker(self, **options):
+        options.setdefault('min_calls', 4)
+        options.setdefault('open_seconds', 30)
+        return circuit_breaker.CircuitBreaker('upstream.test', **options)
+
+    def open(self, breaker):
+        for _ in range(breaker.min_calls):
+            breaker.record(0.1, failed=True)
+        self.assertEqual(breaker.state, circuit_breaker.OPEN)
+
+    def test_opens_at_the_failure_rate_once_min_calls_are_reached(self):
+        breaker = self.breaker(failure_rate=0.5)
+        for failed in (True, True, False):
+            breaker.record(0.1, failed=failed)
+        self.assertEqual(breaker.state, circuit_breaker.CLOSED)
+
+        breaker.record(0.1, failed=False)
+
+        self.assertEqual(breaker.state, circuit_breaker.OPEN)
+        self.assertEqual(breaker.opened, 1)
+
+    def test_stays_closed_below_the_failure_rate(self):
+        breaker = self.breaker(failure_rate=0.5)
+        for failed in (True, False, False, False, False):
+            breaker.record(0.1, failed=failed)
+
+        self.assertEqual(breaker.state, circuit_breaker.CLOSED)
+
+    def test_opens_at_the_slow_call_rate(self):
+        breaker = self.breaker(slow_call_seconds=1, slow_call_rate=0.75)
+        for elapsed in (2, 2, 0.1):
+            breaker.record(elapsed, failed=False)
+        self.assertEqual(breaker.state, circuit_breaker.CLOSED)
+
+        breaker.record(2, failed=False)
+
+        self.assertEqual(breaker.state, circuit_breaker.OPEN)
+
+    def test_calls_outside_the_window_do_not_count(self):
+        breaker = self.breaker(window=10)
+        for _ in range(3):
+            breaker.record(0.1, failed=True)
+        self.now += 11
+
+        breaker.record(0.1, failed=True)
+
+        self.assertEqual(breaker.state, circuit_breaker.CLOSED)
+        self.assertEqual(breaker.stats()['calls'], 1)
+
+    def test_open_breaker_rejects_calls_until_open_seconds_pass(self):
+        breaker = self.breaker()
+        self.open(breaker)
+
+        with self.assertRaises(circuit_breaker.CircuitOpenError):
+            breaker.before_call()
+        self.assertEqual(breaker.rejected, 1)
+
+        self.now += 30
+        breaker.before_call()
+        self.assertEqual(breaker.state, circuit_breaker.HALF_OPEN)
+
+    def test_half_open_admits_only_the_configured_probes(self):
+        breaker = self.breaker(half_open_probes=2)
+        self.open(breaker)
+        self.now += 30
+
+        breaker.before_call()
+        breaker.before_call()
+        with self.assertRaises(circuit_breaker.CircuitOpenError):
+            breaker.before_call()
+
+    def test_successful_probe_closes_the_breaker(self):
+        breaker = self.breaker()
+        self.open(breaker)
+        self.now += 30
+        breaker.before_call()
+
+        breaker.record(0.1, failed=False)
+
+        self.assertEqual(breaker.state, circuit_breaker.CLOSED)
+        self.assertEqual(breaker.stats()['calls'], 0)
+        breaker.before_call()
+
+    def test_failed_or_slow_probe_opens_the_breaker_again(self):
+        for failed, elapsed in ((True, 0.1), (False, 5)):
+            breaker = self.breaker(slow_call_seconds=3)
+            self.open(breaker)
+            self.now += 30
+            breaker.before_call()
+
+            breaker.record(elapsed, failed=failed)
+
+            self.assertEqual(breaker.state, circuit_breaker.OPEN)
+            self.assertEqual(breaker.opened, 2)
+            with self.assertRaises(circuit_breaker.CircuitOpenError):
+                breaker.before_call()
+
+    def test_cancelled_probe_releases_its_slot(self):
+        breaker = self.breaker()
+        self.open(breaker)
+        self.now += 30
+        patch(self, 'api.services.circuit_breaker.get_breaker', return_value=breaker)
+
+        with self.assertRaises(asyncio.CancelledError):
+            with http_client.guarded('https://upstream.test/'):
+                raise asyncio.CancelledError()
+
+        self.assertEqual(breaker.state, circuit_breaker.HALF_OPEN)
+        breaker.before_call()
+
+    def test_open_breaker_fails_fast_without_a_request(self):
+        breaker = self.breaker()
+        self.open(breaker)
+        patch(self, 'api.services.circuit_breaker.get_breaker', return_value=breaker)
+        session = patch(self, 'api.services.http_client.get_session')
+
+        with self.assertRaises(circuit_breaker.CircuitOpenError):
+            http_client.get('https://upstream.test/')
+        session.assert_not_called()
+
+    def test_views_answer_an_open_breaker_with_their_503_bodies(self):
+        rejected = circuit_breaker.CircuitOpenError('Circuit breaker for upstream.test is open')
+        patch(self, 'api.views.joke_buffer.get', side_effect=rejected)
+        patch(self, 'api.views.cat_buffer.get', side_effect=rejected)
+
+        for path, body in (('/api/joke/', {'error': 'Error fetching joke'}), ('/api/cat/', {'errror': 'Error fetching url'})):
+            response = self.client.get(path)
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.json(), body)
+
+
+class RateLimitTests(SimpleTestCase):
+    def setUp(self):
+        clock = patch(self, 'api.services.rate_limit.time')
+        clock.time.return_value = 1000.0
+
+    def limiter(self, backend=None, **options):
+        return rate_limit.RateLimiter('upstream.test', backend or rate_limit.MemoryBackend(), **options)
+
+    def test_new_bucket_starts_full(self):
+        state, result = rate_limit.take(None, 10.0, rate=1, burst=3, max_wait=0)
+
+        self.assertEqual(state, (2.0, 10.0))
+        self.assertEqual(result, (True, 0.0))
+
+    def test_tokens_refill_at_rate_up_to_burst(self):
+        self.assertEqual(rate_limit.take((0.0, 0.0), 2.0, rate=0.5, burst=3, max_wait=0), ((0.0, 2.0), (True, 0.0)))
+        self.assertEqual(rate_limit.take((0.0, 0.0), 100.0, rate=1, burst=3, max_wait=0), ((2.0, 100.0), (True, 0.0)))
+
+    def test_waiting_callers_queue_behind_each_other(self):
+        state, result = rate_limit.take((0.0, 0.0), 0.0, rate=1, burst=1, max_wait=5)
+        self.assertEqual(result, (True, 1.0))
+
+        state, result = rate_limit.take(state, 0.0, rate=1, burst=1, max_wait=5)
+        self.assertEqual(result, (True, 2.0))
+        self.assertEqual(state, (-2.0, 0.0))
+
+    def test_wait_beyond_max_wait_takes_nothing(self):
+        state, result = rate_limit.take((-1.0, 0.0), 0.0, rate=1, burst=1, max_wait=1)
+
+        self.assertEqual(result, (False, 2.0))
+        self.assertEqual(state, (-1.0, 0.0))
+
+    def test_clock_stepped_backwards_refills_nothing(self):
+        state, result = rate_limit.take((0.5, 10.0), 5.0, rate=1, burst=1, max_wait=0)
+
+        self.assertEqual(result, (False, 0.5))
+        self.assertEqual(state, (0.5, 5.0))
+
+    def test_sqlite_bucket_is_shared_between_connections(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'buckets.sqlite3')
+        first = self.limiter(rate_limit.SQLiteBackend(path), rate=0.01, burst=2, policy='fail')
+        second = self.limiter(rate_limit.SQLiteBackend(path), rate=0.01, burst=2, policy='fail')
+
+        self.assertEqual(first.reserve(), 0.0)
+        self.assertEqual(second.reserve(), 0.0)
+        with self.assertRaises(rate_limit.RateLimited):
+            first.reserve()
+        with self.assertRaises(rate_limit.RateLimited):
+            second.reserve()
+
+    def test_wait_policy_returns_the_delay_up_to_max_wait(self):
+        limiter = self.limiter(rate=1, burst=1, policy='wait', max_wait=1.5)
+
+        self.assertEqual(limiter.reserve(), 0.0)
+        self.assertEqual(limiter.reserve(), 1.0)
+        with self.assertRaises(rate_limit.RateLimited) as raised:
+            limiter.reserve()
+
+        self.assertEqual(raised.exception.retry_after, 2.0)
+        self.assertFalse(raised.exception.serve_stale)
+        self.assertEqual(limiter.stats()['granted'], 2)
+        self.assertEqual(limiter.stats()['waited'], 1)
+        self.assertEqual(limiter.stats()['rejected'], 1)
+
+    def test_caller_max_wait_cannot_exceed_the_policys(self):
+        limiter = self.limiter(rate=1, burst=1, policy='wait', max_wait=0.5)
+        limiter.reserve()
+
+        with self.assertRaises(rate_limit.RateLimited):
+            limiter.reserve(max_wait=10)
+
+    def test_caller_max_wait_shortens_the_policys(self):
+        limiter = self.limiter(rate=1, burst=1, policy='wait', max_wait=5)
+        limiter.reserve()
+
+        with self.assertRaises(rate_limit.RateLimited):
+            limiter.reserve(max_wait=0)
+        self.assertEqual(limiter.reserve(max_wait=2), 1.0)
+
+    def test_fail_policy_never_waits(self):
+        limiter = self.limiter(rate=1, burst=1, policy='fail', max_wait=5)
+        limiter.reserve()
+
+        with self.assertRaises(rate_limit.RateLimited) as raised:
+            limiter.reserve()
+        self.assertFalse(raised.exception.serve_stale)
+
+    def test_stale_policy_lets_caches_answer_with_expired_entries(self):
+        limiter = self.limiter(rate=1, burst=1, policy='stale')
+        limiter.reserve()
+        cache = TTLCache('test', ttl=0.01)
+        cache.set('key', 'old')
+        time.sleep(0.02)
+
+        value = cache.get_or_load('key', limiter.reserve)
+
+        self.assertEqual(value, 'old')
+        self.assertEqual(cache.stats()['stale_served'], 1)
+        with self.assertRaises(rate_limit.RateLimited):
+            cache.get_or_load('other', limiter.reserve)
+
+    def test_unknown_policy_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.limiter(policy='drop')
+
+
+class DeadlineTests(SimpleTestCase):
+    def setUp(self):
+        self.config = http_client.get_config()
+
+    def start(self, seconds):
+        token = deadline.start(seconds)
+        self.addCleanup(deadline.stop, token)
+
+    def test_header_budget_never_extends_seconds(self):
+        config = {'SECONDS': 10, 'HEADER': 'X-Request-Timeout'}
+
+        self.assertEqual(deadline.budget('2.5', config), 2.5)
+        self.assertEqual(deadline.budget('30', config), 10)
+        self.assertEqual(deadline.budget(None, config), 10)
+        for ignored in ('soon', '0', '-1'):
+            self.assertEqual(deadline.budget(ignored, config), 10)
+
+    def test_header_budget_applies_without_seconds(self):
+        config = {'SECONDS': None, 'HEADER': 'X-Request-Timeout'}
+
+        self.assertEqual(deadline.budget('2.5', config), 2.5)
+        self.assertIsNone(deadline.budget(None, config))
+
+    def test_middleware_starts_the_clients_shorter_deadline(self):
+        seen = []
+        middleware = DeadlineMiddleware(lambda request: seen.append(deadline.remaining()))
+
+        middleware(RequestFactory().get('/api/dog/', HTTP_X_REQUEST_TIMEOUT='2.5'))
+
+        self.assertTrue(0 < seen[0] <= 2.5)
+        self.assertIsNone(deadline.remaining())
+
+    def test_timeout_is_capped_by_the_time_left(self):
+        self.assertEqual(http_client.request_timeout('https://deadline.test/', 5, self.config), (5, False))
+
+        self.start(1)
+        timeout, capped = http_client.request_timeout('https://deadline.test/', 5, self.config)
+        self.assertTrue(capped)
+        self.assertTrue(all(0 < part <= 1 for part in timeout))
+
+        timeout, capped = http_client.request_timeout('https://deadline.test/', (0.5, 5), self.config)
+        self.assertTrue(capped)
+        self.assertEqual(timeout[0], 0.5)
+        self.assertTrue(0 < timeout[1] <= 1)
+
+        self.assertEqual(http_client.request_timeout('https://deadline.test/', 0.5, self.config), (0.5, False))
+
+    def test_passed_deadline_fails_without_a_request(self):
+        session = patch(self, 'api.services.http_client.get_session')
+        self.start(-1)
+
+        with self.assertRaises(deadline.DeadlineExceeded):
+            http_client.request_timeout('https://deadline.test/', 5, self.config)
+        with self.assertRaises(deadline.DeadlineExceeded):
+            http_client.get('https://deadline.test/')
+        session.assert_not_called()
+
+    def test_no_hedge_when_the_deadline_comes_first(self):
+        tracker = latency.LatencyTracker('deadline.test', min_samples=1, hedge=True)
+        tracker.record(0.5)
+        patch(self, 'api.services.latency.get_tracker', return_value=tracker)
+
+        self.assertEqual(http_client.hedge_delay('https://deadline.test/'), 0.5)
+        self.start(0.4)
+        self.assertIsNone(http_client.hedge_delay('https://deadline.test/'))
+
+
+class LatencyTrackerTests(SimpleTestCase):
+    def tracker(self, samples, **options):
+        tracker = latency.LatencyTracker('latency.test', min_samples=5, **options)
+        for seconds in samples:
+            tracker.record(seconds)
+        return tracker
+
+    def test_configured_timeout_until_min_samples(self):
+        self.assertEqual(self.tracker([0.1] * 4).timeout(5), 5)
+
+    def test_timeout_is_p99_times_the_factor(self):
+        tracker = self.tracker([0.2] * 99 + [0.4], timeout_factor=2)
+
+        self.assertEqual(tracker.quantile(0.99), 0.4)
+        self.assertEqual(tracker.timeout(5), 0.8)
+        self.assertEqual(tracker.timeout((3.05, 5)), (3.05, 0.8))
+
+    def test_timeout_has_a_floor_and_a_ceiling(self):
+        self.assertEqual(self.tracker([0.05] * 10, min_timeout=0.5).timeout(5), 0.5)
+        self.assertEqual(self.tracker([4] * 10).timeout(5), 5)
+
+    def test_hedges_stay_within_the_hedge_ratio(self):
+        tracker = self.tracker([0.1] * 10, hedge=True, hedge_ratio=0.1)
+        for _ in range(20):
+            self.assertEqual(tracker.hedge_delay(), 0.1)
+
+        allowed = [tracker.allow_hedge() for _ in range(5)]
+
+        self.assertEqual(allowed, [True, True, False, False, False])
+        self.assertEqual(tracker.stats()['hedged'], 2)
+
+    def test_hedging_off_gives_no_delay(self):
+        tracker = self.tracker([0.1] * 10)
+
+        self.assertIsNone(tracker.hedge_delay())
+        self.assertEqual(tracker.calls, 0)
+
+
+class WarmupTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = TTLCache('warm.test', ttl=60)
+        self.loaded = []
+
+        @self.cache.refresher
+        def reload(key):
+            self.loaded.append(key)
+            if key == 'peru':
+                raise requests.exceptions.ConnectionError('upstream down')
+            return key.upper()
+
+        patch(self, 'api.services.warmup.refreshable_caches', return_value=[self.cache])
+        patch(self, 'api.services.country_index.get_index')
+
+    @override_settings(API_WARMUP={'KEYS': {'warm.test': ['France', 'Spain', 'Peru', 'france']}})
+    def test_warm_up_loads_the_configured_keys(self):
+        self.cache.set('spain', 'SPAIN')
+
+        with self.assertLogs('api.services.warmup', 'WARNING'):
+            summary = warmup.warm_up()
+
+        self.assertEqual(summary, {'warm.test': {'keys': 3, 'loaded': 1, 'cached': 1, 'failed': 1}})
+        self.assertEqual(sorted(self.loaded), ['france', 'peru'])
+        self.assertEqual(self.cache.get('france'), 'FRANCE')
+        self.assertEqual(warmup.stats()['last_warm_up']['caches'], summary)
+
+    def test_hot_keys_need_min_hits_and_decay_without_demand(self):
+        scheduler = warmup.RefreshScheduler(min_hits=1, hot_keys=2)
+        for key, hits in (('a', 2), ('b', 1), ('c', 5)):
+            for _ in range(hits):
+                self.cache.get(key)
+
+        # Threshold: min_hits / (1 - DECAY) = 2 lookups of decayed demand.
+        self.assertEqual(scheduler._hot(self.cache), ['c', 'a'])
+        self.assertEqual(scheduler._hot(self.cache), ['c'])
+        self.assertEqual(scheduler._hot(self.cache), [])
+
+        for _ in range(3):
+            scheduler._hot(self.cache)
+        self.assertEqual(scheduler.stats()['tracked'], {'warm.test': 1})
+
+    def test_hot_keys_are_capped(self):
+        scheduler = warmup.RefreshScheduler(min_hits=1, hot_keys=1)
+        for key in ('a', 'a', 'a', 'b', 'b'):
+            self.cache.get(key)
+
+        self.assertEqual(scheduler._hot(self.cache), ['a'])
+
+    def test_refresh_pass_reloads_entries_about_to_expire(self):
+        scheduler = warmup.RefreshScheduler(interval=30, refresh=True, min_hits=1)
+        for _ in range(2):
+            self.cache.get('france')
+
+        self.assertEqual(scheduler.run_once(), 1)
+        self.assertEqual(self.loaded, ['france'])
+
+    def test_start_runs_one_thread_per_process(self):
+        patch(self, 'api.services.warmup._started_pid', new=None)
+        thread = patch(self, 'api.services.warmup.threading.Thread')
+        register = patch(self, 'api.services.warmup.os.register_at_fork')
+
+        warmup.start()
+        warmup.start()
+
+        thread.return_value.start.assert_called_once_with()
+        register.assert_called_once_with(after_in_child=warmup._start_in_child)
+
+    def test_forked_worker_starts_its_own_thread_without_the_parents_lock(self):
+        patch(self, 'api.services.warmup._started_pid', new=os.getpid() + 1)
+        patch(self, 'api.services.warmup._start_lock', new=threading.Lock())
+        patch(self, 'api.services.warmup.scheduler', new=warmup.RefreshScheduler())
+        thread = patch(self, 'api.services.warmup.threading.Thread')
+        # A thread of the parent held the lock when it forked.
+        warmup._start_lock.acquire()
+
+        warmup._start_in_child()
+        warmup.start()
+
+        thread.return_value.start.assert_called_once_with()
+        self.assertEqual(warmup._started_pid, os.getpid())
+
+
+class ServerTimingTests(SimpleTestCase):
+    def setUp(self):
+        response_cache.clear()
+        self.addCleanup(response_cache.clear)
+        patch(self, 'api.views.country_data', return_value=FRANCE)
+
+    def test_responses_carry_the_documented_phases(self):
+        response = self.client.get('/api/country/', {'name': 'France'})
+
+        phases = [part.split(';dur=') for part in response['Server-Timing'].split(', ')]
+        self.assertEqual([name for name, _ in phases], ['validate', 'upstream', 'shape', 'render', 'app', 'total'])
+        self.assertTrue(all(float(ms) >= 0 for _, ms in phases))
+
+    def test_log_line_only_at_info(self):
+        with self.assertLogs('api.timing', 'INFO') as logs:
+            self.client.get('/api/country/', {'name': 'France'})
+
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual((entry['path'], entry['status']), ('/api/country/', 200))
+        self.assertIn('upstream_ms', entry)
+
+        timing_logger = logging.getLogger('api.timing')
+        self.addCleanup(timing_logger.setLevel, timing_logger.level)
+        timing_logger.setLevel(logging.WARNING)
+        info = patch(self, 'api.middleware.logger.info')
+        self.client.get('/api/country/', {'name': 'France'})
+        info.assert_not_called()
+
+
+def serializer_country_detail(country_info):
+    # The /api/country/ body as it was built before the projections.
+    record = country_info[0]
+    serializer = CountryDetailSerializer(data={
+        'name': record['name']['common'],
+        'capital': record['capital'][0],
+        'population': record['population'],
+        'flag': record['flag'],
+        'region': record['region'],
+    })
+    serializer.is_valid(raise_exception=True)
+    return dict(serializer.data)
+
+
+class CountryDetailParityTests(SimpleTestCase):
+    def variants(self):
+        record = FRANCE[0]
+        yield FRANCE
+        for name, value in (
+            ('capital', ['  Paris  ']),
+            ('capital', ['']),
+            ('capital', ['   ']),
+            ('capital', [None]),
+            ('capital', []),
+            ('capital', [7]),
+            ('capital', [True]),
+            ('capital', [['Paris']]),
+            ('capital', ['Pa\x00ris']),
+            ('flag', None),
+            ('region', ' Europe\n'),
+            ('population', '68000000'),
+            ('population', 68000000.0),
+            ('population', '68000000.00'),
+            ('population', 68000000.5),
+            ('population', True),
+            ('population', None),
+            ('population', 'many'),
+            ('name', {'common': ' France '}),
+            ('name', {'common': ''}),
+        ):
+            yield [{**record, name: value}]
+        yield [{key: value for key, value in record.items() if key != 'region'}]
+
+    def test_projection_matches_the_serializer_round_trip(self):
+        for country_info in self.variants():
+            with self.subTest(country_info=country_info):
+                try:
+                    expected = serializer_country_detail(country_info)
+                except Exception:
+                    with self.assertRaises(Exception):
+                        country_detail_payload(country_info)
+                else:
+                    self.assertEqual(country_detail_payload(country_info), expected)
+
+    def test_invalid_upstream_record_answers_503(self):
+        response_cache.clear()
+        self.addCleanup(response_cache.clear)
+        patch(self, 'api.views.country_data', return_value=[{**FRANCE[0], 'capital': ['  ']}])
+
+        response = self.client.get('/api/country/', {'name': 'France'})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json(), {'error': 'Failed to fetch data'})
+
+
+def activity(key, activity_type, participants, price, accessibility='Minor challenges'):
+    return {
+        'key': key,
+        'activity': f'Activity {key}',
+        'type': activity_type,
+        'participants': participants,
+        'price': price,
+        'accessibility': accessibility,
+    }
+
+
+ACTIVITIES = [
+    activity('a', 'education', 1, 0.0, 'Few to no challenges'),
+    activity('b', 'education', 2, 0.3),
+    activity('c', 'music', 3, 0.1, 'Few to no challenges'),
+    activity('d', 'social', 5, 0.5),
+    activity('e', 'music', 1, 0.8),
+    activity('f', 'education', 4, 0.2),
+]
+
+
+class ActivityCatalogTests(SimpleTestCase):
+    def setUp(self):
+        self.catalog = activity_catalog.ActivityCatalog(ACTIVITIES)
+
+    def keys(self, *args, **filters):
+        return [record['key'] for record in self.catalog.find(*args, **filters)]
+
+    def test_multiple_types_keep_catalog_order(self):
+        self.assertEqual(self.keys(['Music', 'education']), ['a', 'b', 'c', 'e', 'f'])
+        self.assertEqual(self.keys(['unknown']), [])
+
+    def test_participants_range(self):
+        everything = ['education', 'music', 'social']
+
+        self.assertEqual(self.keys(everything, min_participants=2, max_participants=4), ['b', 'c', 'f'])
+        self.assertEqual(self.keys(everything, max_participants=1), ['a', 'e'])
+        self.assertEqual(self.keys(everything, min_participants=4), ['d', 'f'])
+        # The participants index drives the scan; the type is still checked.
+        self.assertEqual(self.keys(['education'], min_participants=3, max_participants=3), [])
+        self.assertEqual(self.keys(['music'], min_participants=3, max_participants=3), ['c'])
+
+    def test_price_range(self):
+        self.assertEqual(self.keys(['education', 'music'], min_price=0.1, max_price=0.3), ['b', 'c', 'f'])
+        self.assertEqual(self.keys(['education', 'music'], max_price=0), ['a'])
+
+    def test_accessibility_is_case_insensitive(self):
+        self.assertEqual(self.keys(['education', 'music'], accessibility='few to no CHALLENGES'), ['a', 'c'])
+
+    def test_limit_and_sample(self):
+        self.assertEqual(self.keys(['education'], limit=2), ['a', 'b'])
+
+        sampled = self.keys(['education'], sample=2)
+        self.assertEqual(len(set(sampled)), 2)
+        self.assertTrue(set(sampled) <= {'a', 'b', 'f'})
+        self.assertEqual(len(self.keys(['education'], sample=5, limit=1)), 1)
+        self.assertEqual(len(self.keys(['education'], sample=5)), 3)
+
+
+class BoredLiveTests(SimpleTestCase):
+    def setUp(self):
+        isolate(self, bored_api.cache)
+        patch(self, 'api.services.activity_catalog.get_catalog', return_value=None)
+        self.get = patch(self, 'api.services.http_client.get')
+
+    def reply(self, body):
+        self.get.return_value = mock.Mock(json=mock.Mock(return_value=body))
+
+    def test_live_records_are_filtered_like_the_catalog(self):
+        self.reply([record for record in ACTIVITIES if record['type'] == 'education'])
+
+        records = bored_api.find_activities(['education'], min_participants=2)
+
+        self.assertEqual([record['key'] for record in records], ['b', 'f'])
+        self.get.assert_called_once_with(bored_api.URL, params={'type': 'education'})
+
+    def test_unexpected_reply_raises_invalid_reply_and_is_not_cached(self):
+        for body in ({'error': 'Unknown type'}, ['education'], None):
+            with self.subTest(body=body):
+                self.reply(body)
+                with self.assertRaises(bored_api.InvalidReply):
+                    bored_api.find_activities(['education'])
+        self.assertEqual(self.get.call_count, 3)
+        self.assertTrue(issubclass(bored_api.InvalidReply, requests.exceptions.RequestException))
+
+    def test_unexpected_async_reply_raises_invalid_reply(self):
+        patch(self, 'api.services.http_client.aget_json', new=mock.AsyncMock(return_value={'error': 'Unknown type'}))
+
+        with self.assertRaises(bored_api.InvalidReply):
+            asyncio.run(bored_api.find_activities_async(['education']))
+
+    def test_unexpected_reply_answers_503(self):
+        self.reply({'error': 'Unknown type'})
+
+        response = self.client.get('/api/bored/', {'type': 'education'})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json(), {'error': 'Failed to fetch advice'})
+
+
+class CountryFieldsTests(SimpleTestCase):
+    def setUp(self):
+        isolate(self, country_data.cache)
+        response_cache.clear()
+        self.addCleanup(response_cache.clear)
+        patch(self, 'api.services.country_index.lookup', return_value=None)
+        record = {**FRANCE[0], 'area': 551695, 'tld': ['.fr']}
+        self.get = patch(self, 'api.services.http_client.get')
+        self.get.return_value = mock.Mock(json=mock.Mock(return_value=[record]))
+
+    def test_field_order_shares_one_response_and_one_upstream_call(self):
+        first = self.client.get('/api/country/', {'name': 'France', 'fields': 'tld,area'})
+        second = self.client.get('/api/country/', {'name': 'France', 'fields': 'area, tld,area'})
+
+        self.assertEqual((first['X-Cache'], second['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(list(first.json()), ['name', 'capital', 'population', 'flag', 'region', 'area', 'tld'])
+        self.get.assert_called_once_with(
+            f'{country_data.BASE_URL}France',
+            params={'fields': 'area,capital,flag,name,population,region,tld'},
+        )
+
+    def test_data_cache_is_shared_across_field_orders(self):
+        for fields in (['tld', 'area'], ['area', 'tld']):
+            query = CountryQuerySerializer(data={'name': 'France', 'fields': ','.join(fields)})
+            query.is_valid(raise_exception=True)
+            self.assertEqual(query.validated_data['fields'], ['area', 'tld'])
+            country_data.country_data('France', country_fields(query.validated_data['fields']))
+
+        self.assertEqual(self.get.call_count, 1)
+
+    def test_field_case_still_matters(self):
+        self.client.get('/api/country/', {'name': 'France', 'fields': 'area'})
+
+        self.assertEqual(self.client.get('/api/country/', {'name': 'France', 'fields': 'AREA'}).status_code, 400)
+
+
+METRICS = {'ENABLED': True, 'DIR': None, 'FLUSH_SECONDS': 5, 'TOKEN': 'scrape'}
+
+
+@override_settings(API_ADMIN_TOKEN='secret', API_METRICS=METRICS)
+class MetricsEndpointTests(SimpleTestCase):
+    def test_metrics_require_a_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_X_ADMIN_TOKEN='scrape').status_code, 403)
+
+    def test_scrape_and_admin_tokens_are_accepted(self):
+        for headers in ({'HTTP_AUTHORIZATION': 'Bearer scrape'}, {'HTTP_X_ADMIN_TOKEN': 'secret'}):
+            response = self.client.get('/metrics', **headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+            self.assertIn(b'# TYPE api_requests_total counter', response.content)
+
+    @override_settings(API_ADMIN_TOKEN=None, API_METRICS=dict(METRICS, TOKEN=None))
+    def test_unset_tokens_allow_no_header(self):
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer None').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+
+
+class MetricsRenderTests(SimpleTestCase):
+    def setUp(self):
+        for name in ('_counters', '_gauges', '_histograms'):
+            patch(self, f'api.services.metrics.{name}', new={})
+        patch(self, 'api.services.metrics._pid', new=os.getpid())
+        patch(self, 'api.services.metrics._collect', return_value=({}, {}))
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def record(self):
+        metrics.inc('api_upstream_calls_total', (('host', 'metrics.test'), ('outcome', 'ok')), 2)
+        metrics.add_gauge('api_upstream_in_flight', (('host', 'metrics.test'),))
+        metrics.observe('api_upstream_duration_seconds', (('host', 'metrics.test'),), 0.02)
+        metrics.observe('api_upstream_duration_seconds', (('host', 'metrics.test'),), 3)
+
+    def test_render_writes_the_text_format(self):
+        self.record()
+
+        with override_settings(API_METRICS=METRICS):
+            lines = metrics.render().splitlines()
+
+        self.assertIn('# TYPE api_upstream_duration_seconds histogram', lines)
+        self.assertIn('api_upstream_calls_total{host="metrics.test",outcome="ok"} 2', lines)
+        self.assertIn('api_upstream_in_flight{host="metrics.test"} 1', lines)
+        for line in (
+            'api_upstream_duration_seconds_bucket{host="metrics.test",le="0.01"} 0',
+            'api_upstream_duration_seconds_bucket{host="metrics.test",le="0.025"} 1',
+            'api_upstream_duration_seconds_bucket{host="metrics.test",le="2.5"} 1',
+            'api_upstream_duration_seconds_bucket{host="metrics.test",le="5.0"} 2',
+            'api_upstream_duration_seconds_bucket{host="metrics.test",le="+Inf"} 2',
+            'api_upstream_duration_seconds_sum{host="metrics.test"} 3.02',
+            'api_upstream_duration_seconds_count{host="metrics.test"} 2',
+        ):
+            self.assertIn(line, lines)
+
+    def test_label_values_are_escaped(self):
+        metrics.inc('api_requests_total', (('endpoint', 'a"b\\c\nd'),))
+
+        with override_settings(API_METRICS=METRICS):
+            self.assertIn('api_requests_total{endpoint="a\\"b\\\\c\\nd"} 1', metrics.render().splitlines())
+
+    def test_workers_are_merged_and_exited_workers_keep_only_totals(self):
+        self.record()
+        other = {
+            'counters': [['api_upstream_calls_total', [['host', 'metrics.test'], ['outcome', 'ok']], 3]],
+            'gauges': [['api_upstream_in_flight', [['host', 'metrics.test']], 4]],
+            'histograms': [['api_upstream_duration_seconds', [['host', 'metrics.test']], [1] + [0] * (len(metrics.BUCKETS) - 1) + [0.001, 1]]],
+        }
+        for pid in (111, 222):
+            with open(os.path.join(self.directory.name, f'metrics-{pid}.json'), 'w') as f:
+                json.dump(dict(other, pid=pid), f)
+        patch(self, 'api.services.metrics._alive', side_effect=lambda pid: pid == 111)
+
+        with override_settings(API_METRICS=dict(METRICS, DIR=self.directory.name)):
+            lines = metrics.render().splitlines()
+
+        self.assertIn('api_upstream_calls_total{host="metrics.test",outcome="ok"} 8', lines)
+        self.assertIn('api_upstream_in_flight{host="metrics.test"} 5', lines)
+        self.assertIn('api_upstream_duration_seconds_bucket{host="metrics.test",le="0.005"} 2', lines)
+        self.assertIn('api_upstream_duration_seconds_count{host="metrics.test"} 4', lines)
+        self.assertTrue(os.path.exists(os.path.join(self.directory.name, f'metrics-{os.getpid()}.json')))
+
+
+class SyncUniversitiesTests(TestCase):
+    def sync(self, names, **options):
+        records = [{'name': name, 'country': 'Peru', 'web_pages': [f'http://{name.lower()}.example']} for name in names]
+        with mock.patch('api.services.http_client.get') as get:
+            get.return_value = mock.Mock(json=mock.Mock(return_value=records))
+            call_command('sync_universities', stdout=io.StringIO(), **options)
+
+    def local_names(self):
+        return [row['name'] for row in country_universities_api.local_queryset('peru')]
+
+    def test_incremental_sync_keeps_upstream_order(self):
+        self.sync(['Alpha', 'Gamma'])
+        self.sync(['Alpha', 'Beta', 'Gamma', 'Delta'])
+
+        self.assertEqual(self.local_names(), ['Alpha', 'Beta', 'Gamma', 'Delta'])
+
+    def test_moved_and_removed_universities_follow_the_upstream(self):
+        self.sync(['Alpha', 'Beta', 'Gamma'])
+        self.sync(['Gamma', 'Alpha'], country='Peru')
+
+        self.assertEqual(self.local_names(), ['Gamma', 'Alpha'])
+        self.assertEqual(University.objects.count(), 2)
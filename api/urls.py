@@ -1,15 +1,41 @@
-from django.urls import path, include
+from django.conf import settings
+from django.urls import path
 from . import views
 
-urlpatterns = [
-    path('dog/', views.random_dog),
-    path('cat/', views.get_cat_image),
-    path('joke/', views.get_random_joke),
-    path('advice/', views.get_random_advice),
-    path('age/', views.get_age_prediction),
-    path('universities/', views.get_country_universities),
-    path('universities/pro/', views.get_pro_country_universities),
-    path('bored/', views.get_boredom_advice),
-    path('quotes/', views.QuotesAPIView.as_view()),
-    path('country/', views.get_country_data)
-]
\ No newline at end of file
+if settings.API_ASYNC_VIEWS:
+    from . import async_views
+
+    urlpatterns = [
+        path('dog/', async_views.random_dog),
+        path('cat/', async_views.get_cat_image),
+        path('joke/', async_views.get_random_joke),
+        path('advice/', async_views.get_random_advice),
+        path('age/', async_views.get_age_prediction),
+        path('age/bulk/', async_views.get_bulk_age_prediction),
+        path('universities/', async_views.get_country_universities),
+        path('universities/pro/', async_views.get_pro_country_universities),
+        path('bored/', async_views.get_boredom_advice),
+        path('quotes/', async_views.get_quotes),
+        path('country/', async_views.get_country_data),
+        path('batch/', async_views.batch_requests),
+    ]
+else:
+    urlpatterns = [
+        path('dog/', views.random_dog),
+        path('cat/', views.get_cat_image),
+        path('joke/', views.get_random_joke),
+        path('advice/', views.get_random_advice),
+        path('age/', views.get_age_prediction),
+        path('age/bulk/', views.get_bulk_age_prediction),
+        path('universities/', views.get_country_universities),
+        path('universities/pro/', views.get_pro_country_universities),
+        path('bored/', views.get_boredom_advice),
+        path('quotes/', views.QuotesAPIView.as_view()),
+        path('country/', views.get_country_data),
+        path('batch/', views.batch_requests),
+    ]
+
+urlpatterns += [
+    path('stats/', views.service_stats),
+    path('cache/', views.invalidate_cache),
+]
@@ -10,51 +10,58 @@ JSON responses with appropriate status codes and error handling.
 """
 
 import requests
-from django.shortcuts import render
-from rest_framework.decorators import api_view
+from django.http import HttpResponse, HttpResponseForbidden
+from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status, views
-from .services.dog_api import dog_api
+from .services.dog_api import dog_buffer
 from .services.country_data import country_data
-from .services.cat_api import cat_image
-from .services.advice_api import advice_api
-from .services.joke_api import joke_api
-from.services.age_prediction_api import age_prediction_api
-from.services.bored_api import bored_api
-from.services.country_universities_api import country_universities_api
-from.services.quotes_api import quotes_api
-from .serializers import CountryDetailSerializer, CountryQuerySerializer, AgeQuerySerializer, CountryUniversitiesQuerySerializer,CountryUniversitiesSerializer, BoredQuerySerializer, BoredSerialier,QuotesSerializer
-import json
+from .services.cat_api import cat_buffer
+from .services.advice_api import advice_buffer
+from .services.joke_api import joke_buffer
+from.services.age_prediction_api import age_prediction_api, age_prediction_bulk
+from.services.bored_api import find_activities
+from.services.country_universities_api import country_universities_api, universities_source
+from.services.quotes_api import quote_pool
+from .services import http_client
+from .services import cache as service_cache
+from .services import prefetch
+from .services import country_index
+from .services import activity_catalog
+from .services import circuit_breaker
+from .services import rate_limit
+from .services import latency
+from .services import warmup
+from .services import metrics
+from .serializers import CountryQuerySerializer, AgeQuerySerializer, AgeBulkSerializer, UniversitiesPageQuerySerializer, BoredQuerySerializer, QuotesQuerySerializer, CacheInvalidateQuerySerializer, BatchRequestSerializer
+from .payloads import country_fields, country_detail_payload, cat_image_payload, joke_payload, advice_payload, age_prediction_payload, age_bulk_payload, universities_payload, university_row, university_rows, bored_payload, quotes_payload
+from . import batch
+from . import pagination
+from . import response_cache
+from .response_cache import cache_response
+from .permissions import IsAdminOrToken, may_scrape
 
 # Create your views here.
 @api_view(['GET'])
 def random_dog(request):
     try:
-        image_url = dog_api()
+        image_url = dog_buffer.get()
         return Response({'image_url':image_url}, status=status.HTTP_200_OK)
     except Exception:
         return Response({'error':'Failed to fetch Dog'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
     
+@cache_response(ttl=3600, normalize=('name',), unordered=('fields',))
 @api_view(['GET'])
 def get_country_data(request):
     query = CountryQuerySerializer(data=request.query_params)
     query.is_valid(raise_exception=True)
 
     country_name = query.validated_data['name']
+    fields = query.validated_data.get('fields', ())
     
     try:
-        country_info = country_data(country_name)
-
-        data = {
-            'name':country_info[0]['name']['common'],
-            'capital': country_info[0]['capital'][0],
-            'population': country_info[0]['population'],
-            'flag': country_info[0]['flag'],
-            'region': country_info[0]['region']
-        }
-        serializer = CountryDetailSerializer(data=data)
-        serializer.is_valid(raise_exception=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        country_info = country_data(country_name, country_fields(fields))
+        return Response(country_detail_payload(country_info, fields), status=status.HTTP_200_OK)
     
     except Exception:
         return Response({'error':'Failed to fetch data'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
@@ -62,12 +69,7 @@ def get_country_data(request):
 @api_view(['GET'])
 def get_cat_image(request):
     try:
-        image = cat_image()[0]
-        image_data = {
-            'image_url':image['url'],
-            'width':image['width'],
-            'height':image['height'],
-        }
+        image_data = cat_image_payload(cat_buffer.get())
         return Response(data=image_data, status=status.HTTP_200_OK)
     except requests.exceptions.RequestException:
         return Response({'errror':'Error fetching url'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
@@ -75,11 +77,7 @@ def get_cat_image(request):
 @api_view(['GET'])
 def get_random_joke(request):
     try:
-        joke = joke_api()
-        joke_data = {
-            'setup':joke['setup'],
-            'punchline':joke['punchline']
-            }
+        joke_data = joke_payload(joke_buffer.get())
         return Response(data=joke_data, status=status.HTTP_200_OK)
     
     except requests.exceptions.RequestException:
@@ -88,10 +86,7 @@ def get_random_joke(request):
 @api_view(['GET'])
 def get_random_advice(request):
     try:
-        advice = advice_api()
-        advice_data = {
-            'advice':advice['slip']['advice']
-        }
+        advice_data = advice_payload(advice_buffer.get())
         return Response(data=advice_data, status=status.HTTP_200_OK)
     
     except requests.exceptions.RequestException:
@@ -104,56 +99,76 @@ def get_age_prediction(request):
     name = query.validated_data['name']
 
     try:
-        age_prediction = age_prediction_api(name)
-        age_prediction_data = {
-            'name': age_prediction['name'],
-            'predicted_age': age_prediction.get('age')
-        }
+        age_prediction_data = age_prediction_payload(age_prediction_api(name))
         return Response(data=age_prediction_data, status=status.HTTP_200_OK)
     
     except requests.exceptions.RequestException:
         return Response({'error':'Fetching age data failed.'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+@api_view(['POST'])
+def get_bulk_age_prediction(request):
+    """
+    Predicts the ages of many names in one request.
+
+    Request Body:
+        {"names": ["Michael", "Amina", "michael"]}
+
+    Returns:
+        Response: A JSON list with one {'name', 'predicted_age'} item per
+                  distinct name, in first-seen order. Names that could not be
+                  fetched within the rate limit and deadline get
+                  {'name', 'error'}; 503 only when no name could be answered.
+    """
+    payload = AgeBulkSerializer(data=request.data)
+    payload.is_valid(raise_exception=True)
+
+    try:
+        predictions = age_prediction_bulk(payload.validated_data['names'])
+        data = age_bulk_payload(predictions)
+        return Response(data=data, status=status.HTTP_200_OK)
+
+    except requests.exceptions.RequestException:
+        return Response({'error':'Fetching age data failed.'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
     
+@cache_response(ttl=3600, normalize=('country',))
 @api_view(['GET'])
 def get_country_universities(request):
-    query = CountryUniversitiesQuerySerializer(data=request.query_params)
+    query = UniversitiesPageQuerySerializer(data=request.query_params)
     query.is_valid(raise_exception=True)
-    country = query.validated_data['country']
+    options = query.validated_data
+    country = options['country']
 
     try:
-        country_universities = country_universities_api(country=country)
-
-        data_list = []
-        for i in  country_universities:
-            
-            data_dict = {
-                'name': i['name'],
-                'website': i['web_pages'][0]
-                }
-            
-            data_list.append(data_dict)
-        data = {
-                'country': country_universities[0]['country'],
-                'universities': data_list
-            }
+        if options.get('stream'):
+            source = universities_source(country)
+            return pagination.streaming_response(source, options, university_row, country)
+        if pagination.is_paginated(options):
+            data = pagination.paginated_payload(universities_source(country), options, university_rows, country)
+        else:
+            data = universities_payload(country_universities_api(country=country))
 
-        
         return Response(data=data, status=status.HTTP_200_OK)
     except requests.exceptions.RequestException:
         return Response({'error':'Failed to fetch data'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
+@cache_response(ttl=3600, normalize=('country',))
 @api_view(['GET'])
 def get_pro_country_universities(request):
-    query = CountryUniversitiesQuerySerializer(data=request.query_params)
+    query = UniversitiesPageQuerySerializer(data=request.query_params)
     query.is_valid(raise_exception=True)
-    country = query.validated_data['country']
+    options = query.validated_data
+    country = options['country']
 
     try:
-        country_universities = country_universities_api(country=country)
+        if options.get('stream'):
+            source = universities_source(country)
+            return pagination.streaming_response(source, options, university_row, country)
+        if pagination.is_paginated(options):
+            data = pagination.paginated_payload(universities_source(country), options, university_rows, country)
+        else:
+            data = universities_payload(country_universities_api(country=country))
 
-        serializer = CountryUniversitiesSerializer(instance=country_universities)
-        
-        return Response(data=serializer.data, status=status.HTTP_200_OK)
+        return Response(data=data, status=status.HTTP_200_OK)
     except requests.exceptions.RequestException:
         return Response({'error':'Failed to fetch data'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
     
@@ -161,13 +176,10 @@ def get_pro_country_universities(request):
 def get_boredom_advice(request):
     query = BoredQuerySerializer(data=request.query_params)
     query.is_valid(raise_exception=True)
-    boredom_advice_type = query.validated_data['type']
 
     try:
-        boredom_advice = bored_api(activity_type=boredom_advice_type)
-        serializer = BoredSerialier(instance=boredom_advice, many=True)
-
-        return Response(data=serializer.data, status=status.HTTP_200_OK)
+        boredom_advice = find_activities(**query.validated_data)
+        return Response(data=bored_payload(boredom_advice), status=status.HTTP_200_OK)
     
     except requests.exceptions.RequestException:
         return Response({'error':'Failed to fetch advice'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
@@ -175,12 +187,128 @@ def get_boredom_advice(request):
 class QuotesAPIView(views.APIView):
 
     def get(self, request):
+        query = QuotesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
 
         try:
-            quotes = quotes_api()
-            serializer = QuotesSerializer(instance=quotes, many=True)
-
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            quotes = quote_pool.get(query.validated_data['count'])
+            return Response(quotes_payload(quotes), status=status.HTTP_200_OK)
         
         except requests.exceptions.RequestException:
-            return Response({'error':'Service failure'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
\ No newline at end of file
+            return Response({'error':'Service failure'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+@api_view(['GET'])
+@permission_classes([IsAdminOrToken])
+def service_stats(request):
+    """
+    Reports runtime statistics of the service layer. Staff users and requests
+    with the admin token only (see api/permissions.py).
+
+    Returns:
+        Response: JSON with:
+                  - 'http_pools': Per-host connection pool usage of the shared
+                    HTTP client (see http_client.pool_stats)
+                  - 'caches': Hit/miss/eviction counters of every response cache
+                  - 'buffers': Depth and refill rate of every prefetch buffer
+                  - 'country_index': Size and hit counters of the local country index
+                  - 'activity_catalog': Size and query count of the local
+                    activity catalog
+                  - 'quote_pool': Size, refresh and budget counters of the
+                    quote pool
+                  - 'breakers': State and windowed counters of every upstream
+                    circuit breaker
+                  - 'rate_limits': Granted, waited and rejected calls of every
+                    upstream rate limit used by this worker
+                  - 'upstream_latency': Latency quantiles and hedge counters
+                    of every upstream host (see latency.LatencyTracker.stats)
+                  - 'warmup': This worker's last cache warm-up and the
+                    refresh-ahead scheduler counters (see warmup.stats)
+    """
+    stats = {
+        'http_pools': http_client.pool_stats(),
+        'caches': [cache.stats() for cache in service_cache.all_caches()],
+        'buffers': [buffer.stats() for buffer in prefetch.all_buffers()],
+        'country_index': country_index.stats(),
+        'activity_catalog': activity_catalog.stats(),
+        'quote_pool': quote_pool.stats(),
+        'breakers': [breaker.stats() for breaker in circuit_breaker.all_breakers()],
+        'rate_limits': [limiter.stats() for limiter in rate_limit.all_limiters()],
+        'upstream_latency': [tracker.stats() for tracker in latency.all_trackers()],
+        'warmup': warmup.stats(),
+    }
+    return Response(data=stats, status=status.HTTP_200_OK)
+
+
+def prometheus_metrics(request):
+    """
+    Exposes request, upstream, service, cache and breaker metrics in the
+    Prometheus text format, merged across worker processes when
+    API_METRICS['DIR'] is set.
+
+    A plain Django view, so scrapes skip DRF's content negotiation. Only staff
+    users, the admin token and the API_METRICS['TOKEN'] bearer token may read
+    it (see api/permissions.py).
+    """
+    if not may_scrape(request):
+        return HttpResponseForbidden('Admin token or metrics bearer token required.\n', content_type='text/plain')
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@api_view(['DELETE'])
+@permission_classes([IsAdminOrToken])
+def invalidate_cache(request):
+    """
+    Invalidates response cache entries in the worker that serves the request.
+    Staff users and requests with the admin token only (see api/permissions.py).
+
+    Query Parameters:
+        country (str, optional): Remove only this country's entries.
+        cache (str, optional): Restrict invalidation to one named cache.
+
+    Rendered responses (see api/response_cache.py) are keyed by a digest of
+    the whole request and built from the data caches, so every invalidation
+    (one country, one cache or all of them) also drops them all.
+
+    Returns:
+        Response: JSON with 'invalidated', the number of entries removed (or of
+                  caches cleared when no country is given).
+    """
+    query = CacheInvalidateQuerySerializer(data=request.query_params)
+    query.is_valid(raise_exception=True)
+
+    invalidated = service_cache.invalidate(
+        key=query.validated_data.get('country'),
+        name=query.validated_data.get('cache'),
+    )
+    response_cache.clear()
+    return Response(data={'invalidated': invalidated}, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+def batch_requests(request):
+    """
+    Runs several endpoint lookups concurrently in one request.
+
+    Request Body:
+        {
+            "requests": [
+                {"endpoint": "country", "params": {"name": "Nigeria"}},
+                {"endpoint": "joke"}
+            ],
+            "timeout": 3
+        }
+
+    Returns:
+        Response: JSON with 'results', one {'endpoint', 'status', 'data'} item per
+                  sub-request in request order. 'data' and 'status' are what the
+                  single endpoint would return; 504 marks items that missed the
+                  global deadline.
+    """
+    payload = BatchRequestSerializer(data=request.data)
+    payload.is_valid(raise_exception=True)
+
+    results = batch.run_batch(
+        payload.validated_data['requests'],
+        timeout=payload.validated_data.get('timeout'),
+    )
+    return Response(data={'results': results}, status=status.HTTP_200_OK)
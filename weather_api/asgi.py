@@ -12,5 +12,13 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'weather_api.settings')
+# Serve the native async views from api/async_views.py under ASGI.
+os.environ.setdefault('API_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
+
+# Warm the response caches and keep hot entries fresh in every worker
+# (see api/services/warmup.py).
+from api.services import warmup  # noqa: E402
+
+warmup.start()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.ServerTimingMiddleware',
+    'api.middleware.DeadlineMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -122,3 +126,228 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Shared HTTP client used by api/services
+# Pool sizes should be at least the number of threads per gunicorn worker.
+
+API_HTTP_CLIENT = {
+    'POOL_CONNECTIONS': 10,
+    'POOL_MAXSIZE': 10,
+    'POOL_BLOCK': False,
+    'MAX_RETRIES': 2,
+    'BACKOFF_FACTOR': 0.3,
+    'TIMEOUT': 5,
+    'HOSTS': {},
+    # Set by the loadtest command to route upstream calls to local stubs
+    'UPSTREAM_BASE_URL': os.environ.get('API_UPSTREAM_BASE_URL'),
+}
+
+
+# In-process response caches for slowly changing upstreams (see api/services/cache.py)
+# TTL is in seconds. SHARED puts the node-local shared tier behind the in-process
+# one, whose entries then live at most HOT_TTL seconds.
+
+API_CACHES = {
+    'country_data': {'MAXSIZE': 512, 'TTL': 24 * 60 * 60, 'SHARED': True, 'HOT_TTL': 5 * 60},
+    'country_universities_api': {'MAXSIZE': 128, 'TTL': 24 * 60 * 60, 'SHARED': True, 'HOT_TTL': 5 * 60},
+    'age_prediction_api': {'MAXSIZE': 10000, 'TTL': 7 * 24 * 60 * 60, 'SHARED': True, 'HOT_TTL': 60 * 60},
+}
+
+
+# Node-local tier shared by every worker behind the API_CACHES entries with
+# SHARED on (see api/services/shared_cache.py). A separate file from
+# db.sqlite3, so cache writes never wait on the universities table.
+
+API_SHARED_CACHE = {
+    'PATH': os.environ.get('API_SHARED_CACHE_PATH', str(BASE_DIR / 'shared_cache.sqlite3')),
+    'MAXSIZE': 100000,
+    'COMPRESS_MIN_BYTES': 512,
+}
+
+
+# Cache warm-up and refresh-ahead of the most requested keys (see
+# api/services/warmup.py). Before switching traffic to a deploy, run:
+# python manage.py warm_caches
+# Set API_WARMUP_ON_START=1 to also warm each worker in the background as it
+# starts; it is off by default, so startup makes no upstream calls.
+
+API_WARMUP = {
+    'KEYS': {
+        'country_universities_api': ['United States', 'United Kingdom', 'Germany', 'France', 'India', 'Japan'],
+    },
+    'HOT_KEYS': 50,
+    'CONCURRENCY': 4,
+    'ON_START': os.environ.get('API_WARMUP_ON_START') == '1',
+    'REFRESH': True,
+    'REFRESH_INTERVAL': 30,
+    'REFRESH_AHEAD': 0.1,
+}
+
+
+# Route api/ to the native async views (api/async_views.py) instead of the DRF
+# sync views. weather_api/asgi.py enables this; WSGI keeps the sync views.
+
+API_ASYNC_VIEWS = os.environ.get('API_ASYNC_VIEWS') == '1'
+
+
+# Shared secret for /api/stats/ and /api/cache/, sent as "X-Admin-Token: <token>"
+# (see api/permissions.py). Unset, only staff users may call them.
+
+API_ADMIN_TOKEN = os.environ.get('API_ADMIN_TOKEN')
+
+
+# Batch endpoint (/api/batch/, see api/batch.py)
+
+API_BATCH = {
+    'MAX_ITEMS': 20,
+    'MAX_WORKERS': 16,
+    'TIMEOUT': 5,
+}
+
+
+# Prefetch buffers for the random-content endpoints (see api/services/prefetch.py)
+
+API_PREFETCH = {
+    'dog_api': {'CAPACITY': 20, 'LOW_WATER': 5, 'ON_EMPTY': 'fetch'},
+    'cat_image': {'CAPACITY': 20, 'LOW_WATER': 5, 'ON_EMPTY': 'fetch'},
+    'joke_api': {'CAPACITY': 20, 'LOW_WATER': 5, 'ON_EMPTY': 'fetch'},
+    'advice_api': {'CAPACITY': 10, 'LOW_WATER': 3, 'ON_EMPTY': 'fetch'},
+}
+
+
+# Quote pool behind /api/quotes/ (see api/services/quotes_api.py). zenquotes
+# allows about 5 requests per 30 seconds per IP; one bulk call returns 50 quotes.
+
+API_QUOTE_POOL = {
+    'CAPACITY': 1000,
+    'REFRESH_SECONDS': 120,
+    'BUDGET': 5,
+    'WINDOW_SECONDS': 30,
+}
+
+
+# Per-upstream-host token buckets shared by every worker on the node (see
+# api/services/rate_limit.py). Hosts without an entry are not limited.
+
+API_RATE_LIMITS = {
+    'PATH': os.environ.get('API_RATE_LIMIT_PATH', str(BASE_DIR / 'rate_limits.sqlite3')),
+    'HOSTS': {
+        # About 5 requests per 30 seconds per IP
+        'zenquotes.io': {'RATE': 5 / 30, 'BURST': 5, 'POLICY': 'fail'},
+        'api.agify.io': {'RATE': 1, 'BURST': 10, 'POLICY': 'wait', 'MAX_WAIT': 2},
+        'restcountries.com': {'RATE': 10, 'BURST': 20, 'POLICY': 'stale'},
+    },
+}
+
+
+# Local REST Countries snapshot answering /api/country/ without the network.
+# Refresh it with: python manage.py snapshot_countries
+
+API_COUNTRY_DATASET = BASE_DIR / 'api' / 'data' / 'countries.json.gz'
+
+
+# Local Bored API activity catalog answering /api/bored/ without the network.
+# Refresh it with: python manage.py snapshot_activities. An empty
+# API_ACTIVITY_DATASET env variable turns it off (live lookups).
+
+API_ACTIVITY_DATASET = os.environ.get('API_ACTIVITY_DATASET', str(BASE_DIR / 'api' / 'data' / 'activities.json.gz'))
+
+
+# Answer the universities endpoints from the local University table.
+# Load it with: python manage.py sync_universities
+
+API_UNIVERSITIES_LOCAL = os.environ.get('API_UNIVERSITIES_LOCAL', '1') == '1'
+
+
+# Per-upstream-host circuit breakers (see api/services/circuit_breaker.py)
+
+API_CIRCUIT_BREAKER = {
+    'WINDOW': 30,
+    'MIN_CALLS': 10,
+    'FAILURE_RATE': 0.5,
+    'SLOW_CALL_SECONDS': 3,
+    'SLOW_CALL_RATE': 0.8,
+    'OPEN_SECONDS': 30,
+    'HALF_OPEN_PROBES': 1,
+    'HOSTS': {},
+}
+
+
+# Per-request deadline capping upstream timeouts (see api/services/deadline.py).
+# Clients may ask for a shorter one with an X-Request-Timeout header (seconds).
+
+API_REQUEST_DEADLINE = {
+    'SECONDS': 10,
+    'HEADER': 'X-Request-Timeout',
+}
+
+
+# Adaptive per-host timeouts and hedged requests (see api/services/latency.py)
+
+API_UPSTREAM_LATENCY = {
+    'TIMEOUT_QUANTILE': 0.99,
+    'TIMEOUT_FACTOR': 2,
+    'MIN_TIMEOUT': 0.5,
+    'HEDGE_QUANTILE': 0.95,
+    'HEDGE_RATIO': 0.1,
+    'HOSTS': {
+        'restcountries.com': {'HEDGE': True},
+        'api.agify.io': {'HEDGE': True},
+    },
+}
+
+
+# Rendered-response cache; views opt in with @cache_response (see api/response_cache.py)
+
+API_RESPONSE_CACHE = {
+    'ENABLED': True,
+    'MAXSIZE': 1024,
+    'COMPRESS': True,
+    'COMPRESS_MIN_BYTES': 1024,
+    'CONDITIONAL': True,
+}
+
+
+# Prometheus metrics at /metrics (see api/services/metrics.py). Under gunicorn,
+# point API_METRICS_DIR at a directory shared by the workers (and empty it on
+# deploy) so every scrape sees all workers. Scrapers authenticate with
+# "Authorization: Bearer <API_METRICS_TOKEN>" (or the admin token).
+
+API_METRICS = {
+    'ENABLED': True,
+    'DIR': os.environ.get('API_METRICS_DIR'),
+    'FLUSH_SECONDS': 5,
+    'TOKEN': os.environ.get('API_METRICS_TOKEN'),
+}
+
+
+# Sampled request profiling (see api/middleware.py). Send the header
+# "X-Profile: <API_PROFILE_TOKEN>" to profile one request on demand.
+
+API_PROFILING = {
+    'SAMPLE_EVERY': int(os.environ.get('API_PROFILE_SAMPLE_EVERY', '0')),
+    'HEADER': 'X-Profile',
+    'TOKEN': os.environ.get('API_PROFILE_TOKEN'),
+    'ENGINE': 'cprofile',
+    'OUTPUT_DIR': BASE_DIR / 'profiles',
+}
+
+
+# One JSON line per request with its phase timings (see ServerTimingMiddleware),
+# logged at INFO. Off by default; set API_TIMING_LOG_LEVEL=INFO to turn it on.
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.timing': {
+            'handlers': ['console'],
+            'level': os.environ.get('API_TIMING_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
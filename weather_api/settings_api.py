@@ -0,0 +1,57 @@
+"""
+API-only Django settings for weather_api project.
+
+Every endpoint under api/ returns JSON and none of them use the admin, users,
+sessions, messages, CSRF tokens, clickjacking headers or templates. This
+profile extends settings.py without them, so a worker imports less at boot
+and runs fewer middleware per request:
+    - INSTALLED_APPS: only api and rest_framework (no /admin/)
+    - MIDDLEWARE: metrics, Server-Timing, deadline, security and common
+      middleware
+    - TEMPLATES: none; DRF renders JSON only (no browsable API)
+    - REST_FRAMEWORK: no authentication, permission or throttle classes, and
+      request.user is None (/api/stats/ and /api/cache/ then need
+      API_ADMIN_TOKEN)
+    - USE_I18N: off; error messages stay in English
+
+Select it with DJANGO_SETTINGS_MODULE or --settings:
+    DJANGO_SETTINGS_MODULE=weather_api.settings_api gunicorn weather_api.wsgi
+    python manage.py loadtest --settings weather_api.settings_api
+
+Compare its boot and per-request cost with the default profile with:
+    python manage.py benchmark_startup
+"""
+
+from .settings import *  # noqa: F401,F403
+
+
+INSTALLED_APPS = [
+    'api',
+    'rest_framework',
+]
+
+MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.ServerTimingMiddleware',
+    'api.middleware.DeadlineMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+TEMPLATES = []
+
+AUTH_PASSWORD_VALIDATORS = []
+
+USE_I18N = False
+
+
+# Without django.contrib.auth, DRF must not build AnonymousUser instances.
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+    'DEFAULT_AUTHENTICATION_CLASSES': [],
+    'DEFAULT_PERMISSION_CLASSES': [],
+    'DEFAULT_THROTTLE_CLASSES': [],
+    'UNAUTHENTICATED_USER': None,
+    'UNAUTHENTICATED_TOKEN': None,
+}
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'weather_api.settings')
 
 application = get_wsgi_application()
+
+# Warm the response caches and keep hot entries fresh in every worker
+# (see api/services/warmup.py).
+from api.services import warmup  # noqa: E402
+
+warmup.start()